@@ -0,0 +1,83 @@
+"""存档包基准测试: 导出到目录 与 导出为存档包(不同线程数) 的耗时、体积和内存峰值, 以及导入耗时
+
+存档包导入两次: 第一次写入全部游戏存档, 第二次(覆盖)时本地已有的游戏存档直接跳过.
+
+用法: python benchmarks/bench_archive.py [--saves 200 2000] [--workers 1 4]
+"""
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from save_store import SaveStore
+
+
+def make_store(base_dir, count):
+    """生成有 count 个存档的存储, 每 4 个存档共用一份游戏存档"""
+    os.makedirs(base_dir)
+    store = SaveStore(base_dir)
+    screenshot = Image.effect_noise((320, 180), 40).convert("RGB")
+    for i in range(count):
+        rng = random.Random(i // 4)
+        body = "".join(f"[{j}]={rng.randint(0, 999)}," for j in range(2000))
+        game_data = zlib.compress(f"return {{['round']={i // 4},{body}}}".encode())
+        path = store.encode_screenshot(f"auto_{i:06d}", screenshot)
+        store.commit(f"auto_{i:06d}", game_data, path, auto=True)
+    return store
+
+
+def measure(func):
+    """返回 (结果, ms, 内存峰值 MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def run(counts, workers_list):
+    for count in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = make_store(os.path.join(tmp, "src"), count)
+            names = store.catalog.names()
+
+            dest = os.path.join(tmp, "export_dir")
+            _, dir_ms, dir_peak = measure(lambda: store.export(names, dest))
+            print(f"{count:6d} 个存档: 导出到目录 {dir_ms:8.1f} ms, {dir_size(dest) / 1024 / 1024:6.1f} MB, "
+                  f"内存峰值 {dir_peak:5.1f} MB")
+
+            archive = os.path.join(tmp, "saves.smartsl")
+            for workers in workers_list:
+                _, ms, peak = measure(lambda: store.export_archive(names, archive, workers))
+                print(f"        存档包 {workers:2d} 线程 {ms:8.1f} ms, {os.path.getsize(archive) / 1024 / 1024:6.1f} MB, "
+                      f"内存峰值 {peak:5.1f} MB")
+            store.close()
+
+            os.makedirs(os.path.join(tmp, "dst"))
+            target = SaveStore(os.path.join(tmp, "dst"))
+            _, first_ms, _ = measure(lambda: target.import_archive(archive))
+            _, again_ms, _ = measure(lambda: target.import_archive(archive, overwrite=True))
+            target.close()
+            print(f"        导入 {first_ms:8.1f} ms | 再次导入(跳过已有游戏存档) {again_ms:8.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--saves', type=int, nargs='+', default=[200, 2000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+    run(args.saves, args.workers)
@@ -0,0 +1,87 @@
+"""截图基准测试
+
+1. 像素缓冲区到 PIL 图片: 旧版每次新建缓冲区并解码为 RGBA 再转换为 RGB,
+   新版从缓冲池借出缓冲区并一次解码为 RGB (GetDIBits 用 memmove 模拟)
+2. 使用 FakeCaptureBackend 在没有游戏窗口的环境下运行完整的存档流程:
+   截图 -> 编码截图和缩略图 -> 写入存档备份和索引
+
+用法: python benchmarks/bench_capture.py [--sizes 1920x1080 2560x1440] [--saves 20]
+"""
+import os
+import sys
+import time
+import ctypes
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from capture import BufferPool, FakeCaptureBackend
+from save_store import SaveStore
+
+ROUNDS = 10
+
+
+def bench_decode(size):
+    """返回 (旧版 ms, 新版 ms)"""
+    length = size[0] * size[1] * 4
+    source = ctypes.create_string_buffer(os.urandom(1024) * (length // 1024), length)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        buffer = ctypes.create_string_buffer(length)
+        ctypes.memmove(buffer, source, length)
+        Image.frombuffer('RGBA', size, buffer, 'raw', 'BGRA', 0, 1).convert('RGB')
+    old_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+
+    pool = BufferPool()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        buffer = pool.acquire(length)
+        ctypes.memmove(buffer, source, length)
+        Image.frombuffer('RGB', size, buffer, 'raw', 'BGRX', 0, 1)
+        pool.release(buffer)
+    new_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+    return old_ms, new_ms
+
+
+def bench_pipeline(size, saves):
+    """返回每个存档的 (截图 ms, 编码 ms, 提交 ms)"""
+    game_data = os.urandom(64 * 1024)
+    backend = FakeCaptureBackend(size=size)
+    hwnd = backend.find_window("Balatro")
+    backend.capture(hwnd)  # 生成背景不计入耗时
+    capture_ms = encode_ms = commit_ms = 0.0
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SaveStore(tmp)
+        for i in range(saves):
+            start = time.perf_counter()
+            screenshot = backend.capture(hwnd, alpha=store.screenshot_policy.keeps_alpha)
+            captured = time.perf_counter()
+            path = store.encode_screenshot(f"auto_{i:05d}", screenshot)
+            encoded = time.perf_counter()
+            store.commit(f"auto_{i:05d}", game_data, path, auto=True, run="bench")
+            committed = time.perf_counter()
+            capture_ms += (captured - start) * 1000
+            encode_ms += (encoded - captured) * 1000
+            commit_ms += (committed - encoded) * 1000
+        store.close()
+    return capture_ms / saves, encode_ms / saves, commit_ms / saves
+
+
+def run(sizes, saves):
+    for size in sizes:
+        old_ms, new_ms = bench_decode(size)
+        capture_ms, encode_ms, commit_ms = bench_pipeline(size, saves)
+        print(f"{size[0]}x{size[1]}: 缓冲区转图片 旧版 {old_ms:6.1f} ms / 新版 {new_ms:6.1f} ms | "
+              f"完整存档 截图 {capture_ms:6.1f} ms, 编码 {encode_ms:6.1f} ms, 提交 {commit_ms:6.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=["1920x1080", "2560x1440"])
+    parser.add_argument('--saves', type=int, default=20)
+    args = parser.parse_args()
+    run([tuple(int(v) for v in s.split("x")) for s in args.sizes], args.saves)
@@ -0,0 +1,47 @@
+"""截图编码基准测试: 各存储策略的编码耗时和每个存档的字节数
+
+用法: python benchmarks/bench_codec.py [--width 2560 --height 1440] [--rounds 3]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import fake_screenshot
+from screenshot_codec import ScreenshotPolicy
+
+POLICIES = [
+    ("png 原样(旧版)", ScreenshotPolicy("png", compress_level=6, keep_alpha=True)),
+    ("png level1(默认)", ScreenshotPolicy("png")),
+    ("png level6", ScreenshotPolicy("png", compress_level=6)),
+    ("webp q85 m0", ScreenshotPolicy("webp")),
+    ("webp q85 m4", ScreenshotPolicy("webp", quality=85, compress_level=4)),
+    ("webp q85 m4 1080p", ScreenshotPolicy("webp", quality=85, compress_level=4, max_size=(1920, 1080))),
+    ("jpeg q85", ScreenshotPolicy("jpeg", quality=85)),
+    ("jpeg q85 1080p", ScreenshotPolicy("jpeg", quality=85, max_size=(1920, 1080))),
+]
+
+
+def run(width, height, rounds):
+    # 截图时窗口被放大25%
+    width, height = int(width * 1.25), int(height * 1.25)
+    screenshot = fake_screenshot(width, height)
+    print(f"截图 {width}x{height} RGBA")
+    for label, policy in POLICIES:
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            data = policy.encode_bytes(policy.prepare(screenshot))
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:20s} 编码 {min(timings):8.1f} ms  {len(data) / 1024:9.1f} KB/存档")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=2560)
+    parser.add_argument('--height', type=int, default=1440)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    run(args.width, args.height, args.rounds)
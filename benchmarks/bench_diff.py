@@ -0,0 +1,86 @@
+"""存档比较基准测试
+
+在一局连续的自动存档(每次只有少量改动)上依次比较相邻的存档:
+1. 完整解析两个存档为嵌套字典后逐层比较
+2. 子表哈希树: 第一次比较(需要建立哈希树)
+3. 子表哈希树: 哈希树已缓存(从索引库读取)
+
+用法: python benchmarks/bench_diff.py [--saves 40] [--jokers 150] [--cards 500]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import fake_game_table, mutate
+from jkr_decoder import LuaTableReader
+from save_diff import build_index, diff_tables, dump_index, load_index
+
+
+def full_diff(a, b, path=()):
+    """完整解析后的逐层比较, 结果与 diff_tables 相同"""
+    changes = []
+    for key in sorted(a.keys() | b.keys(), key=lambda k: (1, 0, k) if isinstance(k, str) else (0, k, "")):
+        old, new = a.get(key), b.get(key)
+        if isinstance(old, dict) and isinstance(new, dict):
+            changes.extend(full_diff(old, new, path + (key,)))
+        elif old != new or type(old) is not type(new):
+            changes.append((path + (key,), old, new))
+    return changes
+
+
+def fake_timeline(count, jokers, cards, seed=0):
+    rng = random.Random(seed)
+    text = fake_game_table(rng, jokers, cards)
+    raws = []
+    for _ in range(count):
+        raws.append(text.encode())
+        text = mutate(text, rng)
+    return raws
+
+
+def per_pair(func, pairs):
+    start = time.perf_counter()
+    results = [func(a, b) for a, b in pairs]
+    return results, (time.perf_counter() - start) * 1000 / len(pairs)
+
+
+def run(count, jokers, cards):
+    raws = fake_timeline(count, jokers, cards)
+    pairs = list(zip(range(count - 1), range(1, count)))
+    print(f"{count} 个存档, 每个 {len(raws[0]) / 1024:.0f} KB (解压后), {len(pairs)} 次比较")
+
+    expected, full_ms = per_pair(
+        lambda i, j: full_diff(LuaTableReader(raws[i]).read_table(), LuaTableReader(raws[j]).read_table()), pairs)
+
+    indexes = {}
+
+    def cold(i, j):
+        # 时间线上每个存档的哈希树只建立一次
+        for k in (i, j):
+            if k not in indexes:
+                indexes[k] = build_index(raws[k])
+        return diff_tables(raws[i], raws[j], indexes[i], indexes[j])
+
+    cold_results, cold_ms = per_pair(cold, pairs)
+    stored = dict((k, dump_index(index)) for k, index in indexes.items())
+    cached_results, cached_ms = per_pair(
+        lambda i, j: diff_tables(raws[i], raws[j], load_index(stored[i]), load_index(stored[j])), pairs)
+    assert cold_results == expected and cached_results == expected
+
+    index_kb = sum(len(data) for data in stored.values()) / len(stored) / 1024
+    print(f"完整解析后比较 {full_ms:8.2f} ms/次")
+    print(f"哈希树(首次)   {cold_ms:8.2f} ms/次")
+    print(f"哈希树(已缓存) {cached_ms:8.2f} ms/次 ({full_ms / cached_ms:.1f}x), 每个存档的哈希树 {index_kb:.1f} KB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--saves', type=int, default=40)
+    parser.add_argument('--jokers', type=int, default=150)
+    parser.add_argument('--cards', type=int, default=500)
+    args = parser.parse_args()
+    run(args.saves, args.jokers, args.cards)
@@ -0,0 +1,126 @@
+"""画廊基准测试: 在合成存档库上对比画廊一页缩略图的加载耗时
+
+1. 每个存档读取和解码一个小缩略图文件
+2. 从联系表拼接(不缓存解码后的联系表)
+3. 从联系表拼接, 依次翻页(缓存解码后的联系表, 与界面相同)
+
+并测量第一次生成全部联系表、保存一个新存档后的增量更新, 以及删除部分存档后合并联系表的耗时.
+不创建 PhotoImage, 可以在没有图形界面的环境运行.
+
+用法: python benchmarks/bench_gallery.py [--saves 10000] [--pages 50]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from corpus import build_corpus
+from contact_sheets import SHEET_BACKGROUND, TILE_SIZE
+from preview_cache import PreviewCache
+from thumbnails import SMALL_SIZE, thumbnail_path
+
+# 与界面相同: 每页 5x3 个缩略图, 联系表缓存 48MB
+PAGE_COLUMNS = 5
+PAGE_SIZE = 15
+CACHE_MB = 48
+
+
+def make_small_thumbnails(store, records):
+    """为合成存档库生成小缩略图, 内容相同的截图只缩放一次"""
+    thumbs = {}
+    os.makedirs(store.thumbs_dir, exist_ok=True)
+    for record in records:
+        data = thumbs.get(record["screenshot_hash"])
+        if data is None:
+            path = thumbnail_path(store.thumbs_dir, record["name"], SMALL_SIZE)
+            with Image.open(record["screenshot"]) as image:
+                image = image.convert("RGB")
+            image.thumbnail(SMALL_SIZE, Image.Resampling.LANCZOS)
+            image.save(path, format="PNG", compress_level=1)
+            with open(path, 'rb') as f:
+                data = thumbs[record["screenshot_hash"]] = f.read()
+        with open(thumbnail_path(store.thumbs_dir, record["name"], SMALL_SIZE), 'wb') as f:
+            f.write(data)
+
+
+def page_from_files(store, names):
+    tile_width, tile_height = TILE_SIZE
+    page = Image.new("RGB", (PAGE_COLUMNS * tile_width, -(-len(names) // PAGE_COLUMNS) * tile_height),
+                     SHEET_BACKGROUND)
+    for index, name in enumerate(names):
+        with Image.open(thumbnail_path(store.thumbs_dir, name, SMALL_SIZE)) as image:
+            image = image.convert("RGB")
+        page.paste(image, ((index % PAGE_COLUMNS) * tile_width, (index // PAGE_COLUMNS) * tile_height))
+    return page
+
+
+def per_page(func, pages):
+    start = time.perf_counter()
+    for names in pages:
+        func(names)
+    return (time.perf_counter() - start) * 1000 / len(pages)
+
+
+def run(count, page_count):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        store = build_corpus(tmp, count)
+        records = store.catalog.records()
+        make_small_thumbnails(store, records)
+        print(f"{count} 个存档, 生成存档库 {time.perf_counter() - start:.1f} s")
+
+        sheets = store.contact_sheets
+        start = time.perf_counter()
+        added, written = sheets.update()
+        build_s = time.perf_counter() - start
+        sheet_bytes = sum(os.path.getsize(os.path.join(sheets.sheets_dir, f)) for f in os.listdir(sheets.sheets_dir))
+        print(f"生成联系表       {build_s:8.2f} s   {written} 张, 每张 {build_s * 1000 / written:.0f} ms, "
+              f"共 {sheet_bytes / 1024 / 1024:.1f} MB")
+
+        # 与界面默认的列表相同: 按时间从新到旧
+        names = [r["name"] for r in sorted(records, key=lambda r: r["timestamp"], reverse=True)]
+        pages = [names[i:i + PAGE_SIZE] for i in range(0, len(names), PAGE_SIZE)]
+        rng = random.Random(0)
+        random_pages = [pages[rng.randrange(len(pages))] for _ in range(page_count)]
+        sequential_pages = pages[:page_count]
+
+        files_ms = per_page(lambda page: page_from_files(store, page), random_pages)
+        sheets_ms = per_page(lambda page: sheets.render_page(page, PAGE_COLUMNS), random_pages)
+        cache = PreviewCache(CACHE_MB * 1024 * 1024)
+        cached_ms = per_page(lambda page: sheets.render_page(page, PAGE_COLUMNS, cache), sequential_pages)
+        decoded = sum(len(set(loc[:2] for loc in sheets.locate(page).values() if loc)) for page in random_pages)
+        print(f"逐个读取缩略图   {files_ms:8.2f} ms/页 ({PAGE_SIZE} 个文件)")
+        print(f"联系表           {sheets_ms:8.2f} ms/页 (平均解码 {decoded / len(random_pages):.1f} 张)")
+        print(f"联系表依次翻页   {cached_ms:8.2f} ms/页 (缓存 {CACHE_MB} MB)")
+
+        # 保存一个新存档后的增量更新: 只重写最后一张联系表
+        record = dict(records[-1], name="bench_new", timestamp="2099-01-01 00:00:00")
+        store.catalog.put(record)
+        make_small_thumbnails(store, [record])
+        start = time.perf_counter()
+        sheets.update()
+        print(f"新存档增量更新   {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+        # 删除六成存档后合并稀疏的联系表
+        removed = rng.sample(names, len(names) * 6 // 10)
+        store.catalog.delete(removed)
+        before = len(store.catalog.atlas_sheets())
+        start = time.perf_counter()
+        _, merged = sheets.update()
+        print(f"删除后合并       {(time.perf_counter() - start) * 1000:8.2f} ms   "
+              f"重写 {merged} 张, {before} -> {len(store.catalog.atlas_sheets())} 张")
+        store.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--saves', type=int, default=10000)
+    parser.add_argument('--pages', type=int, default=50)
+    args = parser.parse_args()
+    run(args.saves, args.pages)
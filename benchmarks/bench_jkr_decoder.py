@@ -0,0 +1,43 @@
+"""存档解码基准测试: 按需提取对局信息 与 完整解析 的吞吐量
+
+用法: python benchmarks/bench_jkr_decoder.py [--cards 200 1000 4000] [--rounds 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import fake_game_table
+from jkr_decoder import decode_table, read_metadata
+from snapshot_chain import compress_jkr
+
+
+def measure(func, data, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(data)
+    return (time.perf_counter() - start) / rounds
+
+
+def run(card_counts, rounds):
+    for cards in card_counts:
+        # 后期存档: 牌组膨胀、小丑牌较多
+        raw = fake_game_table(random.Random(cards), 30, cards).encode()
+        data = compress_jkr(raw)
+        mb = len(raw) / 1024 / 1024
+        lazy = measure(read_metadata, data, rounds)
+        full = measure(decode_table, data, rounds)
+        print(f"{cards:5d} 张牌, 解压后 {len(raw) / 1024:8.1f} KB: "
+              f"提取对局信息 {lazy * 1000:7.2f} ms ({mb / lazy:6.1f} MB/s) | "
+              f"完整解析 {full * 1000:7.2f} ms ({mb / full:6.1f} MB/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cards', type=int, nargs='+', default=[200, 1000, 4000])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args.cards, args.rounds)
@@ -0,0 +1,90 @@
+"""截图哈希基准测试
+
+1. 计算一张截图的感知哈希的耗时
+2. 在 N 个哈希中查找相似存档: 逐个计算汉明距离 与 NumPy 向量化索引 的耗时对比
+3. 判断自动存档是否与上一个几乎相同(游戏存档增量比较)的耗时
+
+用法: python benchmarks/bench_phash.py [--sizes 10000 50000] [--frame 1920x1080]
+"""
+import os
+import sys
+import time
+import zlib
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from perceptual_hash import HashIndex, hamming, image_hash
+from save_store import SaveStore
+
+ROUNDS = 20
+
+
+def bench_hash(frame_size):
+    image = Image.effect_noise(frame_size, 40).convert("RGB")
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        image_hash(image)
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def bench_query(count):
+    """返回 (逐个比较 ms, 建立索引 ms, 索引查询 ms)"""
+    rng = random.Random(0)
+    items = [(f"auto_{i:06d}", rng.getrandbits(64)) for i in range(count)]
+    target = items[count // 2][1]
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        sorted((hamming(value, target), name) for name, value in items)[:10]
+    loop_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+
+    start = time.perf_counter()
+    index = HashIndex(items)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        index.query(target, limit=10, max_distance=20)
+    query_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+    return loop_ms, build_ms, query_ms
+
+
+def bench_similar_check():
+    """返回 (相同存档 ms, 不同存档 ms)"""
+    rng = random.Random(0)
+    raw = ("return {" + "".join(f"[{i}]={rng.randint(0, 999)}," for i in range(20000)) + "}").encode()
+    previous = zlib.compress(raw)
+    nearly_same = zlib.compress(raw.replace(b"[5]=", b"[5]=1", 1))
+    changed = zlib.compress(raw[::-1])
+    store = SaveStore.__new__(SaveStore)
+    store.similar_hash_distance = 4
+    store.last_auto_saves = {"1": (previous, 0)}
+    results = []
+    for game_data in (nearly_same, changed):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            store.is_similar_auto_save(game_data, 0, "1")
+        results.append((time.perf_counter() - start) * 1000 / ROUNDS)
+    return results
+
+
+def run(sizes, frame_size):
+    print(f"{frame_size[0]}x{frame_size[1]} 截图哈希: {bench_hash(frame_size):.2f} ms")
+    same_ms, changed_ms = bench_similar_check()
+    print(f"自动存档去重判断: 几乎相同 {same_ms:.2f} ms / 不同 {changed_ms:.2f} ms")
+    for count in sizes:
+        loop_ms, build_ms, query_ms = bench_query(count)
+        print(f"{count:6d} 个哈希: 逐个比较 {loop_ms:8.2f} ms | 建立索引 {build_ms:7.2f} ms | "
+              f"索引查询 {query_ms:6.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--frame', default="1920x1080")
+    args = parser.parse_args()
+    run(args.sizes, tuple(int(v) for v in args.frame.split("x")))
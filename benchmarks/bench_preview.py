@@ -0,0 +1,153 @@
+"""预览延迟基准测试: 选中存档到得到可显示图像的耗时
+
+1. 对比旧方式(解码完整截图 + LANCZOS 缩放) 与 直接解码预览缩略图
+2. 模拟按住方向键连续切换存档(按键重复频率): 每一步都同步解码 与 预览缓存 + 后台预取相邻存档,
+   统计在下一次按键前显示出预览的比例和缓存占用的内存
+
+不创建 PhotoImage, 可以在没有图形界面的环境运行.
+
+用法: python benchmarks/bench_preview.py [--width 2560 --height 1440] [--rounds 20] [--scrub 120] [--rate 30]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from corpus import fake_screenshot
+from preview_cache import PreviewCache, PreviewLoader
+from thumbnails import PREVIEW_SIZE, get_thumbnail, make_thumbnails, thumbnail_path
+
+
+def old_preview(screenshot_path):
+    img = Image.open(screenshot_path)
+    img_width, img_height = img.size
+    frame_width, frame_height = PREVIEW_SIZE
+    scale = frame_width / img_width
+    new_width, new_height = int(img_width * scale), int(img_height * scale)
+    if new_height > frame_height:
+        scale = frame_height / img_height
+        new_width, new_height = int(img_width * scale), int(img_height * scale)
+    return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+
+def new_preview(screenshot_path, thumbs_dir):
+    thumb_path = get_thumbnail(screenshot_path, "bench", thumbs_dir, PREVIEW_SIZE)
+    with Image.open(thumb_path) as img:
+        img.load()
+        return img
+
+
+def measure(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1]
+
+
+def load_thumbnail(thumbs_dir, name):
+    with Image.open(thumbnail_path(thumbs_dir, name, PREVIEW_SIZE)) as img:
+        img.load()
+        return img
+
+
+def scrub_sync(thumbs_dir, names, step_s):
+    """每一步在主线程同步解码, 返回 (按时显示的比例, 主线程每步耗时 p50 ms)"""
+    on_time = 0
+    blocked = []
+    for name in names:
+        step_start = time.perf_counter()
+        load_thumbnail(thumbs_dir, name)
+        elapsed = time.perf_counter() - step_start
+        blocked.append(elapsed * 1000)
+        if elapsed <= step_s:
+            on_time += 1
+            time.sleep(step_s - elapsed)
+    return on_time / len(names), sorted(blocked)[len(blocked) // 2]
+
+
+def scrub_cached(thumbs_dir, names, step_s, prefetch, budget_mb):
+    """缓存 + 后台预取, 返回 (按时显示的比例, 主线程每步耗时 p50 ms, 缓存占用 MB, 取消的解码数)"""
+    shown = threading.Event()
+    wanted = [None]
+
+    def on_loaded(name, image):
+        if name == wanted[0]:
+            shown.set()
+
+    loader = PreviewLoader(lambda name: load_thumbnail(thumbs_dir, name), on_loaded,
+                           PreviewCache(budget_mb * 1024 * 1024))
+    on_time = 0
+    blocked = []
+    for i, name in enumerate(names):
+        step_start = time.perf_counter()
+        wanted[0] = name
+        shown.clear()
+        image = loader.request(name, names[i + 1:i + 1 + prefetch] + names[max(0, i - 1):i])
+        blocked.append((time.perf_counter() - step_start) * 1000)
+        if image is not None or shown.wait(step_s - (time.perf_counter() - step_start)):
+            on_time += 1
+        remaining = step_s - (time.perf_counter() - step_start)
+        if remaining > 0:
+            time.sleep(remaining)
+    used_mb = loader.cache.used_bytes / 1024 / 1024
+    loader.stop()
+    return on_time / len(names), sorted(blocked)[len(blocked) // 2], used_mb, loader.cancelled
+
+
+def run_scrub(count, rate, prefetch, budget_mb):
+    step_s = 1.0 / rate
+    with tempfile.TemporaryDirectory() as tmp:
+        names = [f"auto_{i:04d}" for i in range(count)]
+        for i, name in enumerate(names):
+            # 预览尺寸的缩略图, 每个存档画面不同
+            image = fake_screenshot(PREVIEW_SIZE[0], PREVIEW_SIZE[0] * 9 // 16, seed=i).convert("RGB")
+            make_thumbnails(image, name, tmp, sizes=(PREVIEW_SIZE,))
+        print(f"\n按住方向键连续切换 {count} 个存档, 每秒 {rate} 次:")
+        ratio, blocked_ms = scrub_sync(tmp, names, step_s)
+        print(f"  同步解码:          按时显示 {ratio:6.1%}  主线程每步 {blocked_ms:6.2f} ms")
+        ratio, blocked_ms, used_mb, cancelled = scrub_cached(tmp, names, step_s, prefetch, budget_mb)
+        print(f"  缓存 + 预取 {prefetch} 个:   按时显示 {ratio:6.1%}  主线程每步 {blocked_ms:6.2f} ms  "
+              f"缓存 {used_mb:.1f}/{budget_mb} MB  取消解码 {cancelled} 次")
+
+
+def run(width, height, rounds):
+    # 截图时窗口被放大25%
+    width, height = int(width * 1.25), int(height * 1.25)
+    with tempfile.TemporaryDirectory() as tmp:
+        screenshot = fake_screenshot(width, height)
+        screenshot_path = os.path.join(tmp, "bench.png")
+        screenshot.save(screenshot_path)
+        thumbs_dir = os.path.join(tmp, "thumbs")
+
+        start = time.perf_counter()
+        make_thumbnails(screenshot, "bench", thumbs_dir)
+        make_ms = (time.perf_counter() - start) * 1000
+
+        old_p50, old_p95 = measure(lambda: old_preview(screenshot_path), rounds)
+        new_p50, new_p95 = measure(lambda: new_preview(screenshot_path, thumbs_dir), rounds)
+        print(f"截图 {width}x{height}, 保存时生成缩略图 {make_ms:.1f} ms")
+        print(f"旧方式 完整解码+缩放: p50 {old_p50:7.2f} ms  p95 {old_p95:7.2f} ms")
+        print(f"新方式 解码缩略图:    p50 {new_p50:7.2f} ms  p95 {new_p95:7.2f} ms  ({old_p50 / new_p50:.1f}x)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--width', type=int, default=2560)
+    parser.add_argument('--height', type=int, default=1440)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--scrub', type=int, default=120, help="连续切换的存档数")
+    parser.add_argument('--rate', type=int, default=30, help="按键重复频率(次/秒)")
+    parser.add_argument('--prefetch', type=int, default=3)
+    parser.add_argument('--budget', type=int, default=64, help="预览缓存大小(MB)")
+    args = parser.parse_args()
+    run(args.width, args.height, args.rounds)
+    run_scrub(args.scrub, args.rate, args.prefetch, args.budget)
@@ -0,0 +1,76 @@
+"""读取存档基准测试: 旧版 两次复制 与 原子替换(复制/reflink/硬链接) 及撤销的耗时对比
+
+旧版先用 copy2 备份当前存档, 再把备份文件复制到游戏存档路径.
+新版把当前存档硬链接到日志目录, 新内容写入临时文件并 fsync 后用 os.replace 替换.
+
+用法: python benchmarks/bench_restore.py [--sizes 200000 2000000] [--rounds 20]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from safe_restore import RestoreJournal, replace_atomic
+
+
+def bench_old(tmp, game_path, backups, rounds):
+    current_backup = os.path.join(tmp, "current_backup.txt")
+    start = time.perf_counter()
+    for i in range(rounds):
+        shutil.copy2(game_path, current_backup)
+        shutil.copy2(backups[i % len(backups)], game_path)
+    return (time.perf_counter() - start) * 1000 / rounds
+
+
+def bench_new(tmp, game_path, backups, rounds, mode):
+    """返回 (读取 ms, 撤销 ms), 不支持该方式时返回None"""
+    journal = RestoreJournal(os.path.join(tmp, f"journal_{mode}"))
+    try:
+        replace_atomic(game_path, source=backups[0], mode=mode)
+    except OSError:
+        return None
+    start = time.perf_counter()
+    for i in range(rounds):
+        journal.record(game_path, "bench")
+        replace_atomic(game_path, source=backups[i % len(backups)], mode=mode)
+    restore_ms = (time.perf_counter() - start) * 1000 / rounds
+    undo_rounds = len(journal.entries())
+    start = time.perf_counter()
+    for _ in range(undo_rounds):
+        journal.undo(mode)
+    undo_ms = (time.perf_counter() - start) * 1000 / undo_rounds
+    return restore_ms, undo_ms
+
+
+def run(sizes, rounds):
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            backups = []
+            for i in range(2):
+                path = os.path.join(tmp, f"backup_{i}.jkr")
+                with open(path, 'wb') as f:
+                    f.write(os.urandom(size))
+                backups.append(path)
+            game_path = os.path.join(tmp, "save.jkr")
+            shutil.copy2(backups[0], game_path)
+
+            line = f"{size / 1024:8.0f} KB: 旧版 {bench_old(tmp, game_path, backups, rounds):7.2f} ms"
+            for mode in ("copy", "reflink", "hardlink"):
+                result = bench_new(tmp, game_path, backups, rounds, mode)
+                if result is None:
+                    line += f" | {mode} 不支持"
+                else:
+                    line += f" | {mode} {result[0]:7.2f} ms (撤销 {result[1]:6.2f} ms)"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200000, 2000000])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.rounds)
@@ -0,0 +1,96 @@
+"""存档列表基准测试: 首次绘制耗时和过滤时每次按键的延迟
+
+有图形界面时测量虚拟列表从创建到完成首次绘制的时间, 并与 tk.Listbox 逐条插入对比;
+没有图形界面时只测量索引建立和过滤查询.
+
+用法: python benchmarks/bench_save_list.py [--sizes 1000 10000 50000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import fake_entries
+from virtual_list import SORT_BY_NAME, SORT_BY_TIME, SaveListIndex
+
+
+def measure_ms(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_index(entries):
+    index = SaveListIndex()
+    build_ms = measure_ms(lambda: index.reset(entries))
+    # 模拟逐字输入过滤条件
+    typed = "auto_2024010"
+    timings = []
+    for i in range(1, len(typed) + 1):
+        timings.append(measure_ms(lambda: index.query(typed[:i], SORT_BY_TIME)))
+    resort_ms = measure_ms(lambda: index.query("", SORT_BY_NAME, descending=False))
+    return build_ms, max(timings), resort_ms
+
+
+def bench_paint(entries):
+    import tkinter as tk
+    from virtual_list import FilterableSaveList
+    root = tk.Tk()
+    root.geometry("200x600")
+    try:
+        start = time.perf_counter()
+        save_list = FilterableSaveList(root)
+        save_list.pack(fill=tk.BOTH, expand=True)
+        save_list.reset(entries)
+        root.update()
+        virtual_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        typed = "auto_2024010"
+        for i in range(1, len(typed) + 1):
+            start = time.perf_counter()
+            save_list.filter_var.set(typed[:i])
+            root.update()
+            timings.append((time.perf_counter() - start) * 1000)
+        save_list.destroy()
+
+        start = time.perf_counter()
+        listbox = tk.Listbox(root)
+        listbox.pack(fill=tk.BOTH, expand=True)
+        for name, _ in entries:
+            listbox.insert(tk.END, name)
+        root.update()
+        listbox_ms = (time.perf_counter() - start) * 1000
+    finally:
+        root.destroy()
+    return virtual_ms, max(timings), listbox_ms
+
+
+def run(sizes):
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        has_display = True
+    except Exception:
+        has_display = False
+        print("没有图形界面, 只测量索引和过滤")
+
+    for size in sizes:
+        entries = fake_entries(size)
+        build_ms, filter_ms, resort_ms = bench_index(entries)
+        line = (f"{size:6d} 个存档: 建立索引 {build_ms:7.2f} ms | 过滤按键最大 {filter_ms:6.2f} ms | "
+                f"切换排序 {resort_ms:6.2f} ms")
+        if has_display:
+            virtual_ms, key_ms, listbox_ms = bench_paint(entries)
+            line += (f" | 虚拟列表首次绘制 {virtual_ms:7.1f} ms (Listbox 逐条插入 {listbox_ms:7.1f} ms)"
+                     f" | 界面过滤按键最大 {key_ms:6.1f} ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+    run(args.sizes)
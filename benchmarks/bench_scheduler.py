@@ -0,0 +1,106 @@
+"""后台任务调度基准测试
+
+1. 调度开销: 触发到任务开始运行的延迟
+2. 定时精度: 周期任务实际运行时间与预定时间的偏差
+3. 超时保护: 任务耗时超过周期时, 用 root.after 式的重复定时(每次到期都启动一次)
+   与调度器(上一次没结束时跳过)同时运行的任务数
+
+用法: python benchmarks/bench_scheduler.py [--rounds 200]
+"""
+import os
+import sys
+import time
+import threading
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_scheduler import JobScheduler
+
+
+def p50(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def bench_dispatch(rounds):
+    scheduler = JobScheduler()
+    started = threading.Event()
+    scheduler.add("noop", started.set)
+    delays = []
+    for _ in range(rounds):
+        started.clear()
+        start = time.perf_counter()
+        scheduler.trigger("noop")
+        started.wait()
+        delays.append((time.perf_counter() - start) * 1000)
+    scheduler.stop()
+    return p50(delays), max(delays)
+
+
+def bench_timer(interval=0.02, runs=50):
+    scheduler = JobScheduler()
+    times = []
+    done = threading.Event()
+
+    def tick():
+        times.append(time.monotonic())
+        if len(times) >= runs:
+            done.set()
+
+    start = time.monotonic()
+    scheduler.add("tick", tick, interval)
+    done.wait()
+    scheduler.stop()
+    drift = [(t - start - interval * (i + 1)) * 1000 for i, t in enumerate(times)]
+    return p50([abs(d) for d in drift]), drift[-1]
+
+
+def bench_overrun(duration=0.05, interval=0.02, total=0.5):
+    """返回 (重复定时的最大并发数, 调度器的最大并发数, 调度器跳过的次数)"""
+    state = {"running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(duration)
+        with lock:
+            state["running"] -= 1
+
+    # 每次到期都在新线程中启动, 不检查上一次是否结束
+    threads = []
+    deadline = time.monotonic() + total
+    while time.monotonic() < deadline:
+        thread = threading.Thread(target=slow)
+        thread.start()
+        threads.append(thread)
+        time.sleep(interval)
+    for thread in threads:
+        thread.join()
+    naive_peak = state["peak"]
+
+    state["peak"] = 0
+    scheduler = JobScheduler(workers=4)
+    scheduler.add("slow", slow, interval, delay=0)
+    time.sleep(total)
+    skipped = scheduler.stats()["slow"]["skipped"]
+    scheduler.stop()
+    return naive_peak, state["peak"], skipped
+
+
+def run(rounds):
+    median, worst = bench_dispatch(rounds)
+    print(f"触发到开始运行: P50 {median:.3f} ms / 最大 {worst:.3f} ms")
+    median, last = bench_timer()
+    print(f"定时偏差: P50 {median:.2f} ms, 第50次累计 {last:+.2f} ms")
+    naive, scheduled, skipped = bench_overrun()
+    print(f"任务耗时超过周期: 重复定时最多 {naive} 个同时运行 | 调度器最多 {scheduled} 个, 跳过 {skipped} 次")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+    run(args.rounds)
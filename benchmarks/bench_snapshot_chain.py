@@ -0,0 +1,56 @@
+"""快照链基准测试: 存储占用、追加耗时和最坏情况下的恢复延迟
+
+用法: python benchmarks/bench_snapshot_chain.py [--snapshots 64] [--jokers 20] [--cards 400]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import fake_game_table, mutate
+from snapshot_chain import SnapshotChainStore, compress_jkr
+
+
+def run(snapshots, jokers, cards, intervals):
+    rng = random.Random(0)
+    base = fake_game_table(rng, jokers, cards)
+    texts = [base]
+    for _ in range(snapshots - 1):
+        texts.append(mutate(texts[-1], rng))
+    saves = [compress_jkr(t.encode()) for t in texts]
+    full_bytes = sum(len(s) for s in saves)
+    print(f"快照数 {snapshots}, 单个存档 {len(saves[0])} 字节(解压 {len(texts[0])} 字节), 完整副本共 {full_bytes} 字节")
+
+    for interval in intervals:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SnapshotChainStore(tmp, interval)
+            start = time.perf_counter()
+            for data in saves:
+                store.append("run", data)
+            append_ms = (time.perf_counter() - start) * 1000 / snapshots
+            stored = store.stats()["stored_bytes"]
+
+            # 最坏情况: 关键帧之后第 interval-1 个快照
+            worst = min(interval, snapshots) - 1
+            timings = []
+            for _ in range(20):
+                start = time.perf_counter()
+                store.read_jkr("run", worst)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"关键帧间隔 {interval:3d}: 存储 {stored:9d} 字节 ({full_bytes / stored:6.1f}x), "
+                  f"追加 {append_ms:6.2f} ms/个, 最坏恢复 p50 {timings[10]:6.2f} ms / max {timings[-1]:6.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--snapshots', type=int, default=64)
+    parser.add_argument('--jokers', type=int, default=20)
+    parser.add_argument('--cards', type=int, default=400)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    run(args.snapshots, args.jokers, args.cards, args.intervals)
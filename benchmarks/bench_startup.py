@@ -0,0 +1,113 @@
+"""启动基准测试: 导入耗时、窗口首次绘制耗时和存档列表加载完成耗时
+
+导入耗时在新的解释器进程中测量(取多次最小值), 同时检查启动时是否导入了 PIL.
+有图形界面时创建完整的主窗口; 没有图形界面时只测量打开存储和分批建立列表索引.
+
+用法: python benchmarks/bench_startup.py [--sizes 1000 10000 50000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from corpus import fake_entries
+from save_store import SaveStore
+from virtual_list import SaveListIndex
+
+IMPORT_SCRIPT = ("import sys, time; start = time.perf_counter(); import save_loader; "
+                 "print(time.perf_counter() - start, 'PIL' in sys.modules)")
+
+
+def measure_import(rounds=5):
+    """返回 (最小导入耗时 ms, 是否导入了 PIL)"""
+    best = None
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.split()
+        elapsed = float(output[0]) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output[1] == "True"
+
+
+def make_base_dir(tmp, count):
+    """生成有 count 条存档信息的存档目录"""
+    with open(os.path.join(tmp, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump({"game_save_path": os.path.join(tmp, "save.jkr")}, f)
+    store = SaveStore(tmp)
+    with store.catalog.conn:
+        store.catalog.conn.executemany(
+            "INSERT INTO saves (name, timestamp, data) VALUES (?, ?, ?)",
+            [(name, timestamp, json.dumps({"name": name, "timestamp": timestamp, "auto": True}))
+             for name, timestamp in fake_entries(count)])
+    store.close()
+
+
+def bench_headless(tmp, chunk):
+    start = time.perf_counter()
+    store = SaveStore(tmp)
+    open_ms = (time.perf_counter() - start) * 1000
+    entries = store.catalog.entries()
+    index = SaveListIndex()
+    for i in range(0, len(entries), chunk):
+        index.extend(entries[i:i + chunk])
+        index.query("")
+    loaded_ms = (time.perf_counter() - start) * 1000
+    store.close()
+    return open_ms, loaded_ms
+
+
+def bench_window(tmp):
+    """返回 (首次绘制 ms, 列表加载完成 ms)"""
+    from save_loader import SaveManager
+    times = {}
+
+    class BenchManager(SaveManager):
+        def on_list_loaded(self):
+            super().on_list_loaded()
+            times["loaded"] = time.perf_counter()
+            self.root.after(0, self.root.quit)
+
+    start = time.perf_counter()
+    app = BenchManager(tmp)
+    app.root.bind("<Expose>", lambda e: times.setdefault("paint", time.perf_counter()), add="+")
+    app.run()
+    app.on_close()
+    app.store.close()
+    return (times["paint"] - start) * 1000, (times["loaded"] - start) * 1000
+
+
+def run(sizes, chunk):
+    import_ms, pil_loaded = measure_import()
+    print(f"导入 save_loader: {import_ms:.1f} ms (启动时{'导入了' if pil_loaded else '没有导入'} PIL)")
+
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        has_display = True
+    except Exception:
+        has_display = False
+        print("没有图形界面, 只测量打开存储和分批建立列表索引")
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_base_dir(tmp, size)
+            open_ms, loaded_ms = bench_headless(tmp, chunk)
+            line = f"{size:6d} 个存档: 打开存储 {open_ms:7.1f} ms | 列表索引完成 {loaded_ms:7.1f} ms"
+            if has_display:
+                paint_ms, window_loaded_ms = bench_window(tmp)
+                line += f" | 窗口首次绘制 {paint_ms:7.1f} ms | 窗口列表完成 {window_loaded_ms:7.1f} ms"
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--chunk', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.sizes, args.chunk)
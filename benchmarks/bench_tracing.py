@@ -0,0 +1,42 @@
+"""耗时记录基准测试: 每个计时段在关闭和打开记录时的开销, 以及汇总统计的耗时
+
+用法: python benchmarks/bench_tracing.py [--spans 100000]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracing import Tracer
+
+
+def bench_spans(tracer, count):
+    """返回每个计时段的平均耗时(微秒), 已减去空循环的耗时"""
+    start = time.perf_counter()
+    for _ in range(count):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        with tracer.span("bench.step"):
+            pass
+    return (time.perf_counter() - start - empty) * 1e6 / count
+
+
+def run(count):
+    disabled = Tracer(enabled=False)
+    enabled = Tracer(enabled=True)
+    print(f"关闭记录: 每个计时段 {bench_spans(disabled, count):.3f} us")
+    print(f"打开记录: 每个计时段 {bench_spans(enabled, count):.3f} us")
+    start = time.perf_counter()
+    enabled.stats()
+    print(f"汇总 {len(enabled.records)} 条记录(环形缓冲区容量): {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spans', type=int, default=100000)
+    args = parser.parse_args()
+    run(args.spans)
@@ -0,0 +1,81 @@
+"""删除存档基准测试: 旧版逐个删除文件 与 移入回收站(一次索引事务) 的耗时对比
+
+旧版对每个存档检查并删除存档、截图和 JSON 三个文件, 再重新扫描存档目录.
+新版删除只更新索引, 文件由回收站清理在后台分批删除(这里单独计时, 不阻塞界面).
+
+用法: python benchmarks/bench_trash.py [--sizes 100 500 2000]
+"""
+import os
+import sys
+import time
+import zlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_store import SaveStore
+
+
+def make_files(directory, count):
+    """生成旧版布局的存档文件, 返回名称列表"""
+    names = [f"auto_{i:06d}" for i in range(count)]
+    for name in names:
+        for ext in (".jkr", ".png", ".json"):
+            with open(os.path.join(directory, name + ext), 'wb') as f:
+                f.write(b"x" * 1024)
+    return names
+
+
+def bench_old(tmp, count):
+    directory = os.path.join(tmp, "old")
+    os.makedirs(directory)
+    names = make_files(directory, count)
+    start = time.perf_counter()
+    for name in names:
+        for ext in (".jkr", ".png", ".json"):
+            path = os.path.join(directory, name + ext)
+            if os.path.exists(path):
+                os.remove(path)
+    # 旧版删除后重新扫描存档列表
+    sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_new(tmp, count):
+    """返回 (移入回收站 ms, 后台彻底删除 ms)"""
+    base_dir = os.path.join(tmp, "new")
+    os.makedirs(base_dir)
+    game_path = os.path.join(base_dir, "save.jkr")
+    store = SaveStore(base_dir)
+    store.game_save_path = game_path
+    names = [f"auto_{i:06d}" for i in range(count)]
+    for i, name in enumerate(names):
+        with open(game_path, 'wb') as f:
+            f.write(zlib.compress(f"return {{['seed']='{i}'}}".encode()))
+        store.save(name)
+
+    start = time.perf_counter()
+    store.delete(names)
+    trash_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    store.purge([r["name"] for r in store.trashed()])
+    purge_ms = (time.perf_counter() - start) * 1000
+    store.close()
+    return trash_ms, purge_ms
+
+
+def run(sizes):
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            old_ms = bench_old(tmp, count)
+            trash_ms, purge_ms = bench_new(tmp, count)
+        print(f"{count:6d} 个存档: 旧版 {old_ms:8.1f} ms | 移入回收站 {trash_ms:7.1f} ms "
+              f"(后台彻底删除 {purge_ms:8.1f} ms)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 2000])
+    args = parser.parse_args()
+    run(args.sizes)
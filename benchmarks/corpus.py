@@ -0,0 +1,171 @@
+"""基准测试用的合成存档库
+
+生成结构接近真实数据的游戏存档(raw deflate 压缩的 Lua 表)、截图(PNG)和存档信息,
+存档按局分组: 每局的自动存档在上一次的基础上做少量改动, 另有约一成手动存档.
+大量存档时直接批量写入 blob 和索引, 不逐个调用 SaveStore.commit.
+
+也可以单独运行, 生成一个可以用图形界面或命令行打开的存档目录:
+
+用法: python benchmarks/corpus.py 目标目录 [--saves 1000] [--screenshot-size 320x180]
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from jkr_decoder import read_metadata
+from save_store import SaveStore, TIMESTAMP_FORMAT
+from snapshot_chain import compress_jkr
+
+CORPUS_SIZES = (100, 1000, 10000, 50000)
+SAVES_PER_RUN = 40
+SCREENSHOT_SIZE = (320, 180)
+# 不同画面的数量, 截图从中循环取用, 避免生成大量存档时花时间编码图片
+DISTINCT_FRAMES = 32
+SEED_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ123456789'
+
+
+def fake_entries(count, seed=0):
+    """生成 count 个 (名称, 时间), 约九成为自动存档"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    entries = []
+    for i in range(count):
+        saved_at = start + timedelta(seconds=i * 37)
+        if rng.random() < 0.9:
+            name = saved_at.strftime("auto_%Y%m%d_%H%M%S")
+        else:
+            name = f"boss_{rng.choice(['ante', 'run', 'seed'])}_{i}"
+        entries.append((name, saved_at.strftime(TIMESTAMP_FORMAT)))
+    return entries
+
+
+def fake_game_table(rng, jokers, cards=52):
+    """生成结构接近游戏存档的 Lua 表文本"""
+    parts = ['return {["GAME"]={["dollars"]=', str(rng.randint(0, 200)),
+             ',["round"]=', str(rng.randint(1, 30)),
+             ',["round_resets"]={["ante"]=', str(rng.randint(1, 8)), '}',
+             ',["pseudorandom"]={["seed"]="', ''.join(rng.choice(SEED_CHARS) for _ in range(8)), '"}},',
+             '["cardAreas"]={["jokers"]={["cards"]={']
+    for i in range(jokers):
+        parts.append(f'[{i + 1}]={{["save_fields"]={{["center"]="j_joker_{rng.randint(1, 150)}"}},'
+                     f'["ability"]={{["mult"]={rng.randint(0, 50)},["extra"]={rng.random():.6f}}}}},')
+    parts.append('}},["deck"]={["cards"]={')
+    for i in range(cards):
+        parts.append(f'[{i + 1}]={{["base"]={{["value"]="{rng.randint(2, 14)}",["suit"]="{rng.choice("SHDC")}"}},'
+                     f'["ability"]={{["bonus"]={rng.randint(0, 30)}}},["sort_id"]={rng.randint(1, 10 ** 6)}}},')
+    parts.append('}}}}')
+    return ''.join(parts)
+
+
+def mutate(text, rng):
+    """模拟两次自动存档之间的少量变化(金钱、手牌、回合)"""
+    text = text.replace('["dollars"]=', f'["dollars"]={rng.randint(0, 9)}', 1)
+    text = text.replace('["sort_id"]=', f'["sort_id"]={rng.randint(0, 9)}', 1)
+    return text.replace('["round"]=', f'["round"]={rng.randint(0, 9)}', 1)
+
+
+def fake_screenshot(width, height, seed=0):
+    """生成带有色块和噪点的截图, 压缩难度接近游戏画面"""
+    rng = random.Random(seed)
+    img = Image.new('RGBA', (width, height), (30, 60, 50, 255))
+    draw = ImageDraw.Draw(img)
+    for _ in range(300):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(20, max(21, width // 6)), rng.randrange(20, max(21, height // 4))
+        draw.rectangle((x, y, x + w, y + h),
+                       fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256), 255))
+    noise = Image.effect_noise((width, height), 40).convert('RGBA')
+    return Image.blend(img, noise, 0.15)
+
+
+def fake_game_saves(count, seed=0, jokers=5, cards=52):
+    """依次产出 count 个压缩后的游戏存档, 同一局内每次在上一次的基础上小幅改动"""
+    rng = random.Random(seed)
+    text = None
+    for i in range(count):
+        if i % SAVES_PER_RUN == 0:
+            text = fake_game_table(rng, jokers, cards)
+        else:
+            text = mutate(text, rng)
+        yield compress_jkr(text.encode())
+
+
+def build_corpus(base_dir, count, seed=0, screenshot_size=SCREENSHOT_SIZE, frames=DISTINCT_FRAMES):
+    """在 base_dir 下生成有 count 个存档的存档目录, 返回 SaveStore
+
+    config.json 中的游戏存档路径指向 base_dir/save.jkr(内容为最后一个存档).
+    结果与逐个 commit 相同: 游戏存档按哈希去重、截图为 PNG 并有校验和、索引中有对局信息
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    game_save_path = os.path.join(base_dir, "save.jkr")
+    with open(os.path.join(base_dir, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump({"game_save_path": game_save_path, "screenshot_format": "png"}, f)
+    store = SaveStore(base_dir)
+
+    pngs = []
+    for i in range(min(frames, count)):
+        path = os.path.join(base_dir, "frame.png")
+        fake_screenshot(*screenshot_size, seed=seed + i).convert('RGB').save(path, compress_level=1)
+        with open(path, 'rb') as f:
+            png = f.read()
+        pngs.append((png, hashlib.sha256(png).hexdigest()))
+        os.remove(path)
+
+    rng = random.Random(seed)
+    records = []
+    blob_sizes = {}
+    metas = {}
+    run = 0
+    for i, ((name, timestamp), game_data) in enumerate(zip(fake_entries(count, seed),
+                                                           fake_game_saves(count, seed))):
+        if i % SAVES_PER_RUN == 0:
+            run += 1
+        digest = hashlib.sha256(game_data).hexdigest()
+        blob_path = store.blob_store.path_for(digest)
+        if digest not in metas:
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                with open(blob_path, 'wb') as f:
+                    f.write(game_data)
+            metas[digest] = read_metadata(game_data)
+        blob_sizes[digest] = len(game_data)
+
+        png, png_hash = pngs[rng.randrange(len(pngs))]
+        screenshot_path = os.path.join(store.screenshots_dir, f"{name}.png")
+        with open(screenshot_path, 'wb') as f:
+            f.write(png)
+        record = {"name": name, "timestamp": timestamp, "screenshot": screenshot_path,
+                  "auto": name.startswith("auto_"), "size": len(game_data) + len(png),
+                  "meta": metas[digest], "game_save": blob_path, "game_save_hash": digest,
+                  "screenshot_hash": png_hash}
+        if record["auto"]:
+            record["run"] = f"run_{run}_{metas[digest].get('seed', '')}"
+        records.append(record)
+
+    store.catalog.put_many(records, blob_sizes)
+    with open(game_save_path, 'wb') as f:
+        f.write(game_data)
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dest')
+    parser.add_argument('--saves', type=int, default=1000)
+    parser.add_argument('--screenshot-size', default="x".join(map(str, SCREENSHOT_SIZE)))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    corpus = build_corpus(args.dest, args.saves, args.seed,
+                          tuple(int(v) for v in args.screenshot_size.split("x")))
+    corpus.close()
+    print(f"已在 {args.dest} 生成 {args.saves} 个存档, 耗时 {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,231 @@
+"""基准测试套件: 在不同规模的合成存档库上测量主要操作, 结果可以保存为 JSON 并与之前的版本对比
+
+- list: 打开存储、分批建立列表索引(与界面加载存档列表相同)、过滤、读取全部存档信息
+- preview: 旧方式(解码完整截图并缩放)、第一次预览(生成缩略图)、之后的预览(解码缩略图)
+- save: 保存存档(编码截图、写入 blob 和索引)的吞吐量
+- restore: 读取存档和撤销读取
+- delete: 批量移入回收站和彻底删除
+
+不需要图形界面, 可以在 Linux 上运行.
+
+用法: python benchmarks/suite.py [--sizes 100 1000 10000 50000] [--only list preview]
+                                 [--output 结果.json] [--compare 旧结果.json]
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image
+
+from corpus import build_corpus, fake_screenshot
+from save_store import SaveStore
+from thumbnails import PREVIEW_SIZE, get_thumbnail
+from virtual_list import SaveListIndex
+
+DEFAULT_SIZES = (100, 1000, 10000)
+LIST_CHUNK = 2000
+SAMPLES = 30
+REPEAT = 3
+# 预览测试使用的截图尺寸(1080p 窗口放大25%), 只写入取样的存档
+PREVIEW_SCREENSHOT_SIZE = (2400, 1350)
+# 变化超过这个比例(耗时还要超过 NOISE_MS)时在对比中标出
+REGRESSION_THRESHOLD = 0.10
+NOISE_MS = 0.5
+
+
+def timed(func):
+    """返回 (结果, 耗时 ms)"""
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def best_of(func, repeat=REPEAT):
+    """重复运行取最短耗时, 返回 (最后一次的结果, 耗时 ms)"""
+    runs = [timed(func) for _ in range(repeat)]
+    return runs[-1][0], min(ms for _, ms in runs)
+
+
+def p50(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def sample_names(store, count=SAMPLES):
+    """在全部存档中均匀取样"""
+    names = store.catalog.names()
+    step = max(1, len(names) // count)
+    return names[::step][:count]
+
+
+def bench_list(base_dir, store):
+    open_ms = None
+    for _ in range(REPEAT):
+        store.close()
+        store, ms = timed(lambda: SaveStore(base_dir))
+        open_ms = ms if open_ms is None else min(open_ms, ms)
+
+    def load():
+        entries = store.catalog.entries()
+        index = SaveListIndex()
+        for i in range(0, len(entries), LIST_CHUNK):
+            index.extend(entries[i:i + LIST_CHUNK])
+        index.query("")
+        return index
+
+    index, load_ms = best_of(load)
+    _, filter_ms = best_of(lambda: index.query("auto_2024010"))
+    _, records_ms = best_of(store.catalog.records)
+    return store, [("open", open_ms, "ms"), ("list_load", load_ms, "ms"),
+                   ("filter", filter_ms, "ms"), ("records", records_ms, "ms")]
+
+
+def bench_preview(base_dir, store):
+    def old_preview(path):
+        with Image.open(path) as img:
+            img.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)
+            return img
+
+    def new_preview(name, path):
+        thumb_path = get_thumbnail(path, name, store.thumbs_dir, PREVIEW_SIZE)
+        with Image.open(thumb_path) as img:
+            img.load()
+            return img
+
+    # 存档库中的截图很小, 取样的存档换成实际尺寸的截图
+    frame = fake_screenshot(*PREVIEW_SCREENSHOT_SIZE).convert('RGB')
+    old, first, cached = [], [], []
+    for name in sample_names(store):
+        path = store.get(name)["screenshot"]
+        frame.save(path, compress_level=1)
+        old.append(timed(lambda: old_preview(path))[1])
+        first.append(timed(lambda: new_preview(name, path))[1])
+        cached.append(timed(lambda: new_preview(name, path))[1])
+    return store, [("full_decode_p50", p50(old), "ms"), ("first_preview_p50", p50(first), "ms"),
+                   ("cached_preview_p50", p50(cached), "ms")]
+
+
+def bench_save(base_dir, store, count=20):
+    screenshot = fake_screenshot(640, 360).convert('RGB')
+    game_data = store.read_game_save()
+    commits = []
+    start = time.perf_counter()
+    for i in range(count):
+        name = f"bench_save_{i:03d}"
+        path = store.encode_screenshot(name, screenshot)
+        commits.append(timed(lambda: store.commit(name, game_data, path, auto=True, run="bench"))[1])
+    elapsed = time.perf_counter() - start
+    store.delete([f"bench_save_{i:03d}" for i in range(count)])
+    return store, [("saves_per_s", count / elapsed, "1/s"), ("commit_p50", p50(commits), "ms")]
+
+
+def bench_restore(base_dir, store):
+    restores, undos = [], []
+    for name in sample_names(store):
+        restores.append(timed(lambda: store.restore(name))[1])
+    for _ in range(min(len(restores), store.restore_journal.size)):
+        undos.append(timed(store.undo_restore)[1])
+    return store, [("restore_p50", p50(restores), "ms"), ("undo_p50", p50(undos), "ms")]
+
+
+def bench_delete(base_dir, store):
+    # 删除一成存档, 至少10个
+    names = store.catalog.names()
+    names = names[::10] if len(names) >= 100 else names[:10]
+    _, trash_ms = timed(lambda: store.delete(names))
+    _, undelete_ms = timed(lambda: store.undelete(names))
+    store.delete(names)
+    _, purge_ms = timed(lambda: store.purge(names))
+    return store, [("trash", trash_ms, "ms"), ("undelete", undelete_ms, "ms"),
+                   ("purge", purge_ms, "ms"), ("purge_per_save", purge_ms / len(names), "ms")]
+
+
+BENCHMARKS = {
+    "list": bench_list,
+    "preview": bench_preview,
+    "save": bench_save,
+    "restore": bench_restore,
+    "delete": bench_delete,
+}
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, only):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            base_dir = os.path.join(tmp, "corpus")
+            store, build_ms = timed(lambda: build_corpus(base_dir, size))
+            print(f"{size} 个存档 (生成存档库 {build_ms / 1000:.1f} s)")
+            for name, bench in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                store, metrics = bench(base_dir, store)
+                for metric, value, unit in metrics:
+                    results.append({"benchmark": name, "size": size, "metric": metric,
+                                    "value": round(value, 4), "unit": unit})
+                print(f"  {name:8s} " + " | ".join(f"{metric} {value:.2f} {unit}" for metric, value, unit in metrics))
+            store.close()
+    return {
+        "version": git_version(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old, new):
+    """打印与旧结果的对比, 返回变差的指标数量"""
+    old_values = dict(((r["benchmark"], r["size"], r["metric"]), r) for r in old["results"])
+    print(f"\n与 {old.get('version')} ({old.get('time')}) 对比:")
+    regressions = 0
+    for result in new["results"]:
+        previous = old_values.get((result["benchmark"], result["size"], result["metric"]))
+        if not previous or not previous["value"]:
+            continue
+        change = result["value"] / previous["value"] - 1
+        # 吞吐量越大越好, 耗时越小越好
+        if result["unit"] == "ms" and abs(result["value"] - previous["value"]) < NOISE_MS:
+            worse = better = False
+        elif result["unit"] == "1/s":
+            worse, better = change < -REGRESSION_THRESHOLD, change > REGRESSION_THRESHOLD
+        else:
+            worse, better = change > REGRESSION_THRESHOLD, change < -REGRESSION_THRESHOLD
+        regressions += worse
+        mark = " 变差" if worse else (" 改善" if better else "")
+        print(f"  {result['benchmark']:8s} {result['size']:6d} {result['metric']:20s} "
+              f"{previous['value']:10.2f} -> {result['value']:10.2f} {result['unit']:3s} ({change:+.0%}){mark}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="只运行指定的测试")
+    parser.add_argument('--output', help="把结果保存为 JSON")
+    parser.add_argument('--compare', help="与之前保存的 JSON 结果对比, 有指标变差时返回1")
+    args = parser.parse_args()
+    report = run(args.sizes, args.only)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            sys.exit(1 if compare(json.load(f), report) else 0)
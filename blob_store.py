@@ -0,0 +1,115 @@
+import os
+import re
+import hashlib
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+# 旧版本的引用计数表, 引用关系现在记录在存档索引中
+LEGACY_REFS_FILE = "refs.json"
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def hash_file(path):
+    """计算文件内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_digest(value):
+    """是否为小写十六进制的 sha256, 外部传入的哈希拼接为路径前必须先检查"""
+    return isinstance(value, str) and DIGEST_PATTERN.fullmatch(value) is not None
+
+
+class BlobStore:
+    """按内容哈希存储游戏存档备份, 相同内容只保存一份
+
+    哪些存档引用了哪些 blob 记录在存档索引中, 与存档信息在同一个事务中更新, 这里只管理文件.
+    从写入文件到写入索引, 以及从检查引用到删除文件, 调用方都要持有 lock,
+    否则可能删除刚被新存档引用的文件
+    """
+
+    def __init__(self, root, suffix=".jkr"):
+        self.root = root
+        self.suffix = suffix
+        self.lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest):
+        """返回哈希对应的blob路径"""
+        return os.path.join(self.root, digest[:2], digest + self.suffix)
+
+    def has(self, digest):
+        """blob 是否已存在"""
+        return os.path.exists(self.path_for(digest))
+
+    def put_bytes(self, data):
+        """按内容存入数据, 返回哈希"""
+        return self.put_many([data])[0]
+
+    def put_many(self, datas):
+        """按内容存入多份数据, 内容已存在时不会发生任何写入, 返回哈希列表"""
+        digests = []
+        with self.lock:
+            for data in datas:
+                digest = hashlib.sha256(data).hexdigest()
+                blob_path = self.path_for(digest)
+                if not os.path.exists(blob_path):
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    tmp_path = blob_path + ".tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, blob_path)
+                digests.append(digest)
+        return digests
+
+    def put_file(self, path):
+        """按内容存入文件, 返回哈希"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        return self.put_bytes(data)
+
+    def adopt(self, digest, path):
+        """把已校验过哈希的文件移入存储, 内容已存在时删除该文件, 返回文件大小"""
+        size = os.path.getsize(path)
+        with self.lock:
+            blob_path = self.path_for(digest)
+            if os.path.exists(blob_path):
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(path, blob_path)
+        return size
+
+    def remove_many(self, digests):
+        """删除已不再被引用的blob, 返回删除的文件数"""
+        removed = 0
+        with self.lock:
+            for digest in digests:
+                blob_path = self.path_for(digest)
+                if os.path.exists(blob_path):
+                    os.remove(blob_path)
+                    removed += 1
+        return removed
+
+    def digests(self):
+        """磁盘上全部 blob 的哈希"""
+        found = []
+        for folder in os.listdir(self.root):
+            folder_path = os.path.join(self.root, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for file_name in os.listdir(folder_path):
+                digest = file_name[:-len(self.suffix)]
+                if file_name.endswith(self.suffix) and is_digest(digest):
+                    found.append(digest)
+        return found
+
+    def remove_legacy_refs(self):
+        """删除旧版本的引用计数表(引用关系已从存档索引重建)"""
+        try:
+            os.remove(os.path.join(self.root, LEGACY_REFS_FILE))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,311 @@
+import ctypes
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from ctypes import byref, create_unicode_buffer, create_string_buffer, Structure, sizeof
+from ctypes.wintypes import (BOOL, HWND, RECT, DWORD, LPARAM, UINT, POINT, WORD, LONG, ATOM)
+
+from tracing import tracer
+
+# 窗口截图只支持 Windows, 其他平台上可以导入模块并使用 FakeCaptureBackend
+windll = getattr(ctypes, "windll", None)
+WINFUNCTYPE = getattr(ctypes, "WINFUNCTYPE", None)
+
+# 缓存的截图尺寸数量, 窗口大小改变后旧尺寸的位图和缓冲区会被释放
+MAX_CACHED_SIZES = 2
+# 截图时窗口放大的比例
+ENLARGE_RATIO = 0.25
+
+HWND_TOPMOST = -1
+HWND_NOTOPMOST = -2
+SWP_SHOWWINDOW = 0x0040
+DIB_RGB_COLORS = 0
+BI_RGB = 0
+
+class BITMAPINFOHEADER(Structure):
+    _fields_ = [
+        ("biSize", DWORD),
+        ("biWidth", LONG),
+        ("biHeight", LONG),
+        ("biPlanes", WORD),
+        ("biBitCount", WORD),
+        ("biCompression", DWORD),
+        ("biSizeImage", DWORD),
+        ("biXPelsPerMeter", LONG),
+        ("biYPelsPerMeter", LONG),
+        ("biClrUsed", DWORD),
+        ("biClrImportant", DWORD)
+    ]
+
+class BITMAPINFO(Structure):
+    _fields_ = [
+        ("bmiHeader", BITMAPINFOHEADER),
+        ("bmiColors", DWORD * 3)
+    ]
+
+class WINDOWPLACEMENT(Structure):
+    _fields_ = [
+        ("length", UINT),
+        ("flags", UINT),
+        ("showCmd", UINT),
+        ("ptMinPosition", POINT),
+        ("ptMaxPosition", POINT),
+        ("rcNormalPosition", RECT)
+    ]
+
+class WINDOWINFO(Structure):
+    _fields_ = [
+        ("cbSize", DWORD),
+        ("rcWindow", RECT),
+        ("rcClient", RECT),
+        ("dwStyle", DWORD),
+        ("dwExStyle", DWORD),
+        ("dwWindowStatus", DWORD),
+        ("cxWindowBorders", WORD),
+        ("cyWindowBorders", WORD),
+        ("atomWindowType", ATOM),
+        ("wCreatorVersion", WORD)
+    ]
+
+class CaptureError(Exception):
+    pass
+
+def capture_supported():
+    """当前平台是否支持窗口截图"""
+    return windll is not None
+
+
+class BufferPool:
+    """按字节数复用的像素缓冲区
+
+    acquire() 借出缓冲区, 用完后 release() 归还. 只保留最近使用的
+    max_sizes 种大小, 每种大小最多保留 per_size 个空闲缓冲区
+    """
+
+    def __init__(self, max_sizes=MAX_CACHED_SIZES, per_size=2):
+        self.max_sizes = max_sizes
+        self.per_size = per_size
+        self._free = OrderedDict()  # 字节数 -> [空闲缓冲区]
+        self._lock = threading.Lock()
+        self.allocated = 0
+
+    def acquire(self, size):
+        with self._lock:
+            free = self._free.get(size)
+            if free is not None:
+                self._free.move_to_end(size)
+                if free:
+                    return free.pop()
+            self.allocated += 1
+        return create_string_buffer(size)
+
+    def release(self, buffer):
+        size = len(buffer)
+        with self._lock:
+            free = self._free.setdefault(size, [])
+            self._free.move_to_end(size)
+            if len(free) < self.per_size:
+                free.append(buffer)
+            while len(self._free) > self.max_sizes:
+                self._free.popitem(last=False)
+
+
+class CaptureBackend(ABC):
+    """截图后端接口
+
+    find_window(标题) 返回窗口句柄, 找不到时返回0; capture(句柄, alpha) 返回 PIL 图片,
+    alpha 为 False 时直接得到 RGB 图片; list_windows() 返回可见窗口的标题
+    """
+
+    @abstractmethod
+    def find_window(self, title):
+        pass
+
+    @abstractmethod
+    def list_windows(self):
+        pass
+
+    @abstractmethod
+    def capture(self, hwnd, alpha=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class Win32CaptureBackend(CaptureBackend):
+    """使用 PrintWindow 的窗口截图
+
+    内存DC只创建一次, 位图按截图尺寸缓存, 像素缓冲区从缓冲池借出,
+    连续截图时不再重复创建和销毁 GDI 对象. 像素由 GetDIBits 直接写入缓冲区,
+    PIL 从缓冲区一次解码为目标格式(BGRX -> RGB), 不经过中间的 RGBA 图片
+    """
+
+    def __init__(self):
+        if windll is None:
+            raise CaptureError("窗口截图只支持 Windows")
+        self.buffers = BufferPool()
+        self._lock = threading.Lock()
+        self._mem_dc = None
+        self._bitmaps = OrderedDict()  # (宽, 高) -> 位图
+
+    def find_window(self, title):
+        return windll.user32.FindWindowW(None, title)
+
+    def list_windows(self):
+        """使用 ctypes 实现的窗口列表获取功能"""
+        result = []
+        
+        def enum_windows_proc(hwnd, lParam):
+            if windll.user32.IsWindowVisible(hwnd):
+                length = windll.user32.GetWindowTextLengthW(hwnd)
+                if length:
+                    buff = create_unicode_buffer(length + 1)
+                    windll.user32.GetWindowTextW(hwnd, buff, length + 1)
+                    result.append(buff.value)
+            return True
+        
+        WNDENUMPROC = WINFUNCTYPE(BOOL, HWND, LPARAM)
+        enum_proc = WNDENUMPROC(enum_windows_proc)
+        windll.user32.EnumWindows(enum_proc, 0)
+        
+        return sorted(result)
+
+    def _bitmap(self, hwnd_dc, size):
+        """返回选入内存DC的指定尺寸位图, 需要持有 self._lock"""
+        if self._mem_dc is None:
+            self._mem_dc = windll.gdi32.CreateCompatibleDC(hwnd_dc)
+        bitmap = self._bitmaps.get(size)
+        if bitmap is None:
+            bitmap = windll.gdi32.CreateCompatibleBitmap(hwnd_dc, size[0], size[1])
+            self._bitmaps[size] = bitmap
+        self._bitmaps.move_to_end(size)
+        windll.gdi32.SelectObject(self._mem_dc, bitmap)
+        # 先选入新位图再释放旧尺寸的位图, 选入DC中的位图不能删除
+        while len(self._bitmaps) > MAX_CACHED_SIZES:
+            _, old_bitmap = self._bitmaps.popitem(last=False)
+            windll.gdi32.DeleteObject(old_bitmap)
+        return bitmap
+
+    def capture(self, hwnd, alpha=False):
+        from PIL import Image
+        # 获取窗口位置和大小
+        rect = RECT()
+        windll.user32.GetWindowRect(hwnd, byref(rect))
+        
+        # 计算尺寸增加
+        width = rect.right - rect.left
+        height = rect.bottom - rect.top
+        size = (width + int(width * ENLARGE_RATIO), height + int(height * ENLARGE_RATIO))
+        
+        # 保存当前窗口位置
+        placement = WINDOWPLACEMENT()
+        placement.length = sizeof(WINDOWPLACEMENT)
+        windll.user32.GetWindowPlacement(hwnd, byref(placement))
+        
+        try:
+            # 设置窗口位置
+            with tracer.span("capture.resize_window"):
+                windll.user32.SetWindowPos(hwnd, HWND_TOPMOST, rect.left, rect.top,
+                                           size[0], size[1], SWP_SHOWWINDOW)
+            hwnd_dc = windll.user32.GetWindowDC(hwnd)
+            try:
+                with self._lock:
+                    bitmap = self._bitmap(hwnd_dc, size)
+                    
+                    # 截图
+                    with tracer.span("capture.print_window"):
+                        if windll.user32.PrintWindow(hwnd, self._mem_dc, 3) == 0:
+                            raise CaptureError("PrintWindow failed")
+                    
+                    bmp_info = BITMAPINFO()
+                    bmp_info.bmiHeader.biSize = sizeof(BITMAPINFOHEADER)
+                    bmp_info.bmiHeader.biWidth = size[0]
+                    bmp_info.bmiHeader.biHeight = -size[1]
+                    bmp_info.bmiHeader.biPlanes = 1
+                    bmp_info.bmiHeader.biBitCount = 32
+                    bmp_info.bmiHeader.biCompression = BI_RGB
+                    
+                    buffer = self.buffers.acquire(size[0] * size[1] * 4)
+                    try:
+                        with tracer.span("capture.get_dibits"):
+                            windll.gdi32.GetDIBits(self._mem_dc, bitmap, 0, size[1], buffer,
+                                                   byref(bmp_info), DIB_RGB_COLORS)
+                        # 解码时已复制像素, 缓冲区可以立即归还
+                        with tracer.span("capture.decode"):
+                            if alpha:
+                                img = Image.frombuffer('RGBA', size, buffer, 'raw', 'BGRA', 0, 1)
+                            else:
+                                img = Image.frombuffer('RGB', size, buffer, 'raw', 'BGRX', 0, 1)
+                    finally:
+                        self.buffers.release(buffer)
+            finally:
+                windll.user32.ReleaseDC(hwnd, hwnd_dc)
+            return img
+        except Exception as e:
+            raise CaptureError(f"截图失败: {str(e)}")
+        finally:
+            # 恢复窗口位置
+            try:
+                with tracer.span("capture.restore_window"):
+                    windll.user32.SetWindowPos(hwnd, HWND_NOTOPMOST, rect.left, rect.top,
+                                               width, height, SWP_SHOWWINDOW)
+                    windll.user32.SetWindowPlacement(hwnd, byref(placement))
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            while self._bitmaps:
+                windll.gdi32.DeleteObject(self._bitmaps.popitem()[1])
+            if self._mem_dc is not None:
+                windll.gdi32.DeleteDC(self._mem_dc)
+                self._mem_dc = None
+
+
+class FakeCaptureBackend(CaptureBackend):
+    """在内存中生成画面的截图后端, 用于没有游戏窗口时测试和基准测试
+
+    每次截图在固定的背景上画出位置不同的色块, 模拟游戏画面的局部变化
+    """
+
+    def __init__(self, windows=("Balatro",), size=(1920, 1080)):
+        self.windows = list(windows)
+        self.size = tuple(size)
+        self.frames = 0
+        self._background = None
+
+    def find_window(self, title):
+        return self.windows.index(title) + 1 if title in self.windows else 0
+
+    def list_windows(self):
+        return sorted(self.windows)
+
+    def capture(self, hwnd, alpha=False):
+        from PIL import Image, ImageDraw
+        if not 0 < hwnd <= len(self.windows):
+            raise CaptureError(f"截图失败: 无效的窗口 {hwnd}")
+        if self._background is None:
+            gradient = Image.linear_gradient('L').resize(self.size)
+            noise = Image.effect_noise(self.size, 24)
+            self._background = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.ROTATE_180)))
+        img = self._background.copy()
+        draw = ImageDraw.Draw(img)
+        width, height = self.size
+        card_w, card_h = width // 12, height // 5
+        for i in range(8):
+            x = (self.frames * 37 + i * card_w * 3 // 2) % (width - card_w)
+            y = height // 2 + (i % 2) * card_h // 3
+            draw.rectangle((x, y, x + card_w, y + card_h), fill=(40 * i % 256, 200, 255 - 30 * i % 256),
+                           outline=(0, 0, 0), width=4)
+        self.frames += 1
+        return img.convert('RGBA') if alpha else img
+
+
+def create_backend(name="auto"):
+    """按名称创建截图后端: win32, fake, 或 auto(Windows 上为 win32)"""
+    if name == "fake":
+        return FakeCaptureBackend()
+    if name == "win32" or capture_supported():
+        return Win32CaptureBackend()
+    raise CaptureError("窗口截图只支持 Windows")
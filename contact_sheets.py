@@ -0,0 +1,209 @@
+import os
+
+from thumbnails import SMALL_SIZE
+
+# 每张联系表 8x8 个小缩略图(1536x1152), 画廊一页通常只需要读取和解码一张
+SHEET_COLUMNS = 8
+SHEET_ROWS = 8
+SHEET_TILES = SHEET_COLUMNS * SHEET_ROWS
+TILE_SIZE = SMALL_SIZE
+# JPEG 解码比 WebP 和 PNG 都快, 格子的大小是 16 的倍数, 缩略图不会跨越压缩块
+SHEET_FORMAT = "JPEG"
+SHEET_QUALITY = 85
+SHEET_EXTENSION = ".jpg"
+SHEET_BACKGROUND = (32, 32, 32)
+# 仍在使用的位置不超过这个比例的相邻联系表合并为一张
+MERGE_RATIO = 0.5
+
+
+def sheet_path(sheets_dir, sheet, generation):
+    """联系表文件路径, 每次重写都使用新的版本号, 正在读取旧版本的画廊不受影响"""
+    return os.path.join(sheets_dir, f"sheet_{sheet:05d}_{generation}{SHEET_EXTENSION}")
+
+
+def slot_box(slot, width, height):
+    """位置 slot 上宽 width 高 height 的缩略图在联系表中的区域"""
+    x = (slot % SHEET_COLUMNS) * TILE_SIZE[0]
+    y = (slot // SHEET_COLUMNS) * TILE_SIZE[1]
+    return x, y, x + width, y + height
+
+
+class ContactSheets:
+    """画廊使用的缩略图联系表
+
+    把许多存档的小缩略图按时间顺序拼接到少数几张图片中, 每个缩略图的联系表和位置
+    记录在索引中, 画廊一页只需要读取一两张联系表而不是每个存档一个文件.
+    新存档追加到最后一张联系表, 删除的存档只从索引中移除, 大部分位置不再使用的相邻
+    联系表在之后的更新中合并. thumbnail(name) 返回存档小缩略图的路径, 没有截图时返回None
+    """
+
+    def __init__(self, catalog, sheets_dir, thumbnail):
+        self.catalog = catalog
+        self.sheets_dir = sheets_dir
+        self.thumbnail = thumbnail
+
+    def update(self, limit=None, wait_idle=None):
+        """合并稀疏的联系表并加入最多 limit 个新存档, 返回 (加入的数量, 重写的联系表数)
+
+        每重写一张联系表后调用 wait_idle 等待用户操作结束
+        """
+        os.makedirs(self.sheets_dir, exist_ok=True)
+        rewritten = self._merge(wait_idle)
+        added = 0
+        while limit is None or added < limit:
+            names = self.catalog.names_without_tiles(SHEET_TILES if limit is None else min(SHEET_TILES,
+                                                                                            limit - added))
+            if not names:
+                break
+            processed, written = self._append(names)
+            added += processed
+            rewritten += written
+            if wait_idle:
+                wait_idle()
+        return added, rewritten
+
+    def rebuild(self):
+        """删除全部联系表后重新生成, 返回加入的数量"""
+        self.catalog.drop_atlas_sheets()
+        if os.path.isdir(self.sheets_dir):
+            for file_name in os.listdir(self.sheets_dir):
+                if file_name.startswith("sheet_"):
+                    os.remove(os.path.join(self.sheets_dir, file_name))
+        return self.update()[0]
+
+    def locate(self, names):
+        """存档缩略图的位置 {名称: (联系表, 版本, 位置, 宽, 高) 或None}"""
+        return self.catalog.atlas_tiles(names)
+
+    def load_sheet(self, sheet, generation):
+        """读取并解码一张联系表"""
+        from PIL import Image
+        with Image.open(sheet_path(self.sheets_dir, sheet, generation)) as image:
+            return image.convert("RGB")
+
+    def render_page(self, names, columns, cache=None, cell_height=None):
+        """把一页存档的缩略图按 columns 列拼成一张图片, 缩略图在格子中居中
+
+        每行高 cell_height(默认与缩略图相同, 多出的部分留给名称). 同一张联系表只解码一次,
+        cache 为解码后联系表的缓存(键为 (联系表, 版本)). 还没有加入联系表或没有截图的存档留空
+        """
+        from PIL import Image
+        tile_width, tile_height = TILE_SIZE
+        cell_height = cell_height or tile_height
+        rows = max(1, -(-len(names) // columns))
+        page = Image.new("RGB", (columns * tile_width, rows * cell_height), SHEET_BACKGROUND)
+        by_sheet = {}
+        locations = self.locate(names)
+        for index, name in enumerate(names):
+            location = locations.get(name)
+            if location:
+                by_sheet.setdefault(location[:2], []).append((index, location))
+        for key, tiles in by_sheet.items():
+            image = cache.get(key) if cache is not None else None
+            if image is None:
+                try:
+                    image = self.load_sheet(*key)
+                except OSError:
+                    # 联系表刚被重写或已损坏, 更新后再显示
+                    continue
+                if cache is not None:
+                    cache.put(key, image)
+            for index, (_, _, slot, width, height) in tiles:
+                x = (index % columns) * tile_width + (tile_width - width) // 2
+                y = (index // columns) * cell_height + (tile_height - height) // 2
+                page.paste(image.crop(slot_box(slot, width, height)), (x, y))
+        return page
+
+    def _compose(self, names):
+        """从小缩略图依次拼出一张联系表, 返回 (图片, [(名称, 位置, 宽, 高)], 没有截图的存档)
+
+        总是从缩略图重新拼接而不是修改已有的联系表, 联系表多次重写也不会累积压缩损失
+        """
+        from PIL import Image
+        image = Image.new("RGB", (SHEET_COLUMNS * TILE_SIZE[0], SHEET_ROWS * TILE_SIZE[1]), SHEET_BACKGROUND)
+        tiles = []
+        blank = []
+        for name in names:
+            try:
+                path = self.thumbnail(name)
+                if path is None:
+                    blank.append(name)
+                    continue
+                with Image.open(path) as thumbnail:
+                    thumbnail = thumbnail.convert("RGB")
+            except OSError:
+                blank.append(name)
+                continue
+            # 旧版本生成的缩略图可能比格子大
+            if thumbnail.width > TILE_SIZE[0] or thumbnail.height > TILE_SIZE[1]:
+                thumbnail.thumbnail(TILE_SIZE, Image.Resampling.LANCZOS)
+            image.paste(thumbnail, slot_box(len(tiles), thumbnail.width, thumbnail.height)[:2])
+            tiles.append((name, len(tiles), thumbnail.width, thumbnail.height))
+        return image, tiles, blank
+
+    def _write(self, sheet, generation, names, removed_sheets=()):
+        """把 names 的缩略图写为联系表的新版本并更新索引, 返回写入的缩略图数"""
+        image, tiles, blank = self._compose(names)
+        if blank:
+            self.catalog.put_blank_tiles(blank)
+        if not tiles and not removed_sheets and generation < 0:
+            return 0
+        path = sheet_path(self.sheets_dir, sheet, generation + 1)
+        tmp_path = path + ".tmp"
+        image.save(tmp_path, format=SHEET_FORMAT, quality=SHEET_QUALITY)
+        os.replace(tmp_path, path)
+        self.catalog.put_atlas_sheet(sheet, generation + 1, len(tiles), tiles, removed_sheets)
+        return len(tiles)
+
+    def _remove(self, sheet, generation):
+        try:
+            os.remove(sheet_path(self.sheets_dir, sheet, generation))
+        except OSError:
+            pass
+
+    def _append(self, names):
+        """把存档追加到最后一张联系表(已满时新建一张), 返回 (处理的存档数, 是否重写了联系表)
+
+        最后一张联系表中已删除存档的位置同时被回收
+        """
+        sheets = self.catalog.atlas_sheets()
+        if sheets and sheets[-1][3] < SHEET_TILES:
+            sheet, generation = sheets[-1][:2]
+            existing = [row[0] for row in self.catalog.sheet_tiles(sheet)]
+        else:
+            sheet = sheets[-1][0] + 1 if sheets else 0
+            generation, existing = -1, []
+        names = names[:SHEET_TILES - len(existing)]
+        written = self._write(sheet, generation, existing + names)
+        if generation >= 0:
+            self._remove(sheet, generation)
+        return len(names), bool(written or generation >= 0)
+
+    def _merge(self, wait_idle=None):
+        """删除空的联系表, 合并相邻的稀疏联系表, 返回重写的联系表数"""
+        sheets = self.catalog.atlas_sheets()[:-1]  # 最后一张还在追加
+        runs = []
+        run = []
+        for sheet, generation, slots, live in sheets:
+            if live == 0:
+                self.catalog.drop_atlas_sheets([sheet])
+                self._remove(sheet, generation)
+                continue
+            if live > SHEET_TILES * MERGE_RATIO or sum(item[3] for item in run) + live > SHEET_TILES:
+                runs.append(run)
+                run = []
+            if live <= SHEET_TILES * MERGE_RATIO:
+                run.append((sheet, generation, slots, live))
+        runs.append(run)
+        rewritten = 0
+        for run in runs:
+            if len(run) < 2:
+                continue
+            names = [row[0] for sheet, _, _, _ in run for row in self.catalog.sheet_tiles(sheet)]
+            self._write(run[0][0], run[0][1], names, [sheet for sheet, _, _, _ in run[1:]])
+            for sheet, generation, _, _ in run:
+                self._remove(sheet, generation)
+            rewritten += 1
+            if wait_idle:
+                wait_idle()
+        return rewritten
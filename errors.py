@@ -0,0 +1,3 @@
+class SaveStoreError(Exception):
+    """存档操作失败, 消息可以直接显示给用户"""
+    pass
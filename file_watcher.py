@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import struct
+import select
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+
+POLL_INTERVAL = 1.0  # 秒
+DEBOUNCE = 2.0  # 秒
+MIN_INTERVAL = 60.0  # 秒
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def file_digest(path):
+    """计算文件内容哈希, 文件不存在时返回None"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _as_paths(paths):
+    """单个路径或路径列表, 统一为去重的路径列表"""
+    if isinstance(paths, (str, bytes, os.PathLike)):
+        paths = [paths]
+    return list(dict.fromkeys(paths))
+
+
+class FileWatcher(ABC):
+    """文件监视器接口: 任一文件可能发生变化时在监视线程中调用 callback(path)
+
+    一个监视器(一个线程)同时监视多个文件
+    """
+
+    def __init__(self, paths, callback):
+        self.paths = _as_paths(paths)
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @abstractmethod
+    def _run(self):
+        pass
+
+
+class PollingWatcher(FileWatcher):
+    """按固定间隔检查各文件的修改时间和大小"""
+
+    def __init__(self, paths, callback, interval=POLL_INTERVAL):
+        super().__init__(paths, callback)
+        self.interval = interval
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _run(self):
+        last = dict((path, self._stat(path)) for path in self.paths)
+        while not self._stop.wait(self.interval):
+            for path in self.paths:
+                current = self._stat(path)
+                if current != last[path]:
+                    last[path] = current
+                    self.callback(path)
+
+
+class InotifyWatcher(FileWatcher):
+    """Linux 下使用 inotify 监视文件所在目录, 没有变化时不占用CPU
+
+    所有目录共用一个 inotify 实例, 事件按 (目录, 文件名) 对应回文件路径
+    """
+
+    def __init__(self, paths, callback):
+        super().__init__(paths, callback)
+        import ctypes
+        self._libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # 监视目录而不是文件, 这样文件被替换后仍能收到事件
+        self._targets = {}
+        directories = {}
+        for path in self.paths:
+            directory = os.path.dirname(os.path.abspath(path))
+            if directory not in directories:
+                wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory),
+                                                  IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY)
+                if wd < 0:
+                    os.close(self._fd)
+                    raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+                directories[directory] = wd
+            self._targets[(directories[directory], os.fsencode(os.path.basename(path)))] = path
+        self._wake_r, self._wake_w = os.pipe()
+
+    def stop(self):
+        self._stop.set()
+        os.write(self._wake_w, b"x")
+        super().stop()
+        os.close(self._fd)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _run(self):
+        while not self._stop.is_set():
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._fd not in readable:
+                continue
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            changed = []
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                path = self._targets.get((wd, name))
+                if path and path not in changed:
+                    changed.append(path)
+            for path in changed:
+                self.callback(path)
+
+
+def create_watcher(paths, callback, poll_interval=POLL_INTERVAL):
+    """选择当前平台可用的监视器, Linux 使用 inotify, 其余使用轮询"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths, callback)
+        except OSError:
+            pass
+    return PollingWatcher(paths, callback, poll_interval)
+
+
+class ChangeMonitor:
+    """监视多个游戏存档, 某个文件内容真正变化时调用 on_change(path, digest)
+
+    所有文件共用一个监视器和一个检查线程. 每个文件的连续写入分别合并:
+    最后一次写入后安静 debounce 秒才检查内容, 同一文件两次回调之间至少间隔
+    min_interval 秒. 内容哈希与该文件上一次相同时不回调
+    """
+
+    def __init__(self, paths, on_change, debounce=DEBOUNCE, min_interval=MIN_INTERVAL,
+                 watcher_factory=create_watcher):
+        self.paths = _as_paths(paths)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.last_digests = dict((path, file_digest(path)) for path in self.paths)
+        self._last_fire = dict.fromkeys(self.paths, 0.0)
+        # 有未处理写入的文件: 路径 -> 最后一次写入的时间
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._watcher = watcher_factory(self.paths, self._on_event)
+        self._thread = threading.Thread(target=self._run, name="change-monitor", daemon=True)
+
+    def start(self):
+        self._watcher.start()
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._watcher.stop()
+        self._thread.join(timeout=5)
+
+    def _on_event(self, path):
+        with self._cond:
+            self._pending[path] = time.monotonic()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # 等待写入事件, 空闲时不做任何事
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 等待写入结束并满足最小间隔, 只等最早可以检查的文件
+                now = time.monotonic()
+                ready = []
+                wait = None
+                for path, last_event in self._pending.items():
+                    ready_at = max(last_event + self.debounce, self._last_fire[path] + self.min_interval)
+                    if now >= ready_at:
+                        ready.append(path)
+                    elif wait is None or ready_at - now < wait:
+                        wait = ready_at - now
+                if not ready:
+                    self._cond.wait(wait)
+                    continue
+                for path in ready:
+                    del self._pending[path]
+            for path in ready:
+                digest = file_digest(path)
+                if digest and digest != self.last_digests[path]:
+                    self.last_digests[path] = digest
+                    self._last_fire[path] = time.monotonic()
+                    self.on_change(path, digest)
@@ -0,0 +1,60 @@
+import os
+
+# 游戏的每个档案(1~3)是一个目录, 除了当前对局 save.jkr 还有解锁和统计等文件,
+# 读取存档时需要与 save.jkr 一起恢复, 否则解锁和档案统计会与对局不一致
+PROFILE_COMPANIONS = ("profile.jkr", "meta.jkr")
+GAME_PROFILES = ("1", "2", "3")
+# 读取一组文件时其中的文件被改写, 最多重新读取的次数
+READ_ATTEMPTS = 5
+
+
+def profile_name(game_save_path):
+    """游戏存档所在档案的名称(所在目录名, 如 "1")"""
+    return os.path.basename(os.path.dirname(os.path.abspath(game_save_path)))
+
+
+def profile_save_path(game_save_path, profile):
+    """同一游戏目录下另一个档案中对应的存档路径"""
+    profile_dir = os.path.dirname(os.path.abspath(game_save_path))
+    return os.path.join(os.path.dirname(profile_dir), profile, os.path.basename(game_save_path))
+
+
+def profile_files(save_path, companions=PROFILE_COMPANIONS):
+    """档案中需要一起备份的文件: [(文件名, 路径)], 第一个是存档本身"""
+    profile_dir = os.path.dirname(save_path)
+    files = [(os.path.basename(save_path), save_path)]
+    for file_name in companions:
+        if file_name != files[0][0]:
+            files.append((file_name, os.path.join(profile_dir, file_name)))
+    return files
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+def read_files(files, attempts=READ_ATTEMPTS):
+    """读取一组文件的一致快照, 返回 {文件名: 内容}, 不存在的文件不包含在内
+
+    读取前后各检查一次全部文件的修改时间和大小, 读取过程中有文件被改写时
+    重新读取, 保证得到的是游戏同一次写入后的状态. 多次仍不一致时返回最后一次的结果
+    """
+    contents = {}
+    for _ in range(attempts):
+        before = [_stat(path) for _, path in files]
+        contents = {}
+        for (file_name, path), st in zip(files, before):
+            if st is None:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    contents[file_name] = f.read()
+            except FileNotFoundError:
+                pass
+        if [_stat(path) for _, path in files] == before:
+            break
+    return contents
@@ -0,0 +1,224 @@
+import re
+import zlib
+
+# 游戏存档由 STR_PACK 序列化: return {["key"]=value,[1]=value,...}
+# 字符串使用 Lua 的 %q 格式, 表可以任意嵌套
+
+# 需要提取的字段: 名称 -> 路径, "*" 匹配任意键, 含有 "*" 的字段收集为列表
+METADATA_FIELDS = {
+    "seed": ("GAME", "pseudorandom", "seed"),
+    "ante": ("GAME", "round_resets", "ante"),
+    "round": ("GAME", "round"),
+    "money": ("GAME", "dollars"),
+    "stake": ("GAME", "stake"),
+    "deck": ("BACK", "name"),
+    "jokers": ("cardAreas", "jokers", "cards", "*", "save_fields", "center"),
+}
+
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_NUMBER = re.compile(rb'[-+0-9.eEinfaINFA]+')
+_SCALAR = re.compile(rb'true|false|[-+0-9.eEinfaINFA]+')
+_KEY_NUMBER = re.compile(rb'\[([-+0-9.eE]+)\]=')
+# 匹配到下一个不在字符串中的括号之前的全部内容
+_SKIP_RUN = re.compile(rb'[^{}"]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^{}"]*)*', re.DOTALL)
+_ESCAPE = re.compile(rb'\\(\d{1,3}|.)', re.DOTALL)
+_ESCAPES = {b'n': b'\n', b'\n': b'\n', b'r': b'\r', b't': b'\t', b'a': b'\a', b'b': b'\b',
+            b'f': b'\f', b'v': b'\v', b'\\': b'\\', b'"': b'"', b"'": b"'"}
+
+
+def decompress_jkr(data):
+    """解压 .jkr 存档(raw deflate 压缩的 Lua 表), 数据损坏时抛出 ValueError"""
+    try:
+        return zlib.decompress(data, -15)
+    except zlib.error:
+        pass
+    try:
+        # 兼容带 zlib/gzip 头的数据
+        return zlib.decompress(data, 47)
+    except zlib.error as e:
+        raise ValueError(f"无法解压存档: {str(e)}")
+
+
+def _unescape(match):
+    code = match.group(1)
+    if code.isdigit():
+        return bytes([int(code)])
+    return _ESCAPES.get(code, code)
+
+
+def _parse_string(token):
+    return _ESCAPE.sub(_unescape, token[1:-1]).decode('utf-8', 'replace')
+
+
+def _sort_key(path):
+    # 数字键按数值排序, 字符串键排在后面
+    return [(0, k, "") if isinstance(k, (int, float)) else (1, 0, k) for k in path]
+
+
+def _parse_number(token):
+    text = token.decode('ascii')
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class JkrParseError(ValueError):
+    pass
+
+
+class LuaTableReader:
+    """在 Lua 表文本上按需解析的读取器
+
+    只有路径与需要的字段匹配的子表才会被解析, 其余子表通过括号计数快速跳过,
+    不会构建完整的表
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.pos = 0
+        if raw.startswith(b"return "):
+            self.pos = len(b"return ")
+
+    def _error(self, message):
+        raise JkrParseError(f"{message} (位置 {self.pos})")
+
+    def read_key(self):
+        """读取 [key]= , 表结束时返回 None"""
+        raw = self.raw
+        if raw[self.pos:self.pos + 1] == b'}':
+            self.pos += 1
+            return None
+        if raw[self.pos:self.pos + 2] == b'["':
+            match = _STRING.match(raw, self.pos + 1)
+            if not match or raw[match.end():match.end() + 2] != b']=':
+                self._error("无效的键")
+            self.pos = match.end() + 2
+            return _parse_string(match.group())
+        match = _KEY_NUMBER.match(raw, self.pos)
+        if not match:
+            self._error("无效的键")
+        self.pos = match.end()
+        return _parse_number(match.group(1))
+
+    def read_scalar(self):
+        """读取字符串、数字或布尔值"""
+        raw = self.raw
+        first = raw[self.pos:self.pos + 1]
+        if first == b'"':
+            match = _STRING.match(raw, self.pos)
+            if not match:
+                self._error("字符串没有结束")
+            self.pos = match.end()
+            return _parse_string(match.group())
+        if raw.startswith(b'true', self.pos):
+            self.pos += 4
+            return True
+        if raw.startswith(b'false', self.pos):
+            self.pos += 5
+            return False
+        match = _NUMBER.match(raw, self.pos)
+        if not match:
+            self._error("无效的值")
+        self.pos = match.end()
+        return _parse_number(match.group())
+
+    def skip_scalar(self):
+        """跳过一个字符串、数字或布尔值, 不解码"""
+        raw = self.raw
+        match = (_STRING if raw[self.pos:self.pos + 1] == b'"' else _SCALAR).match(raw, self.pos)
+        if not match:
+            self._error("无效的值")
+        self.pos = match.end()
+
+    def skip_table(self):
+        """跳过一个完整的子表(当前位置为 '{')"""
+        raw = self.raw
+        run = _SKIP_RUN.match
+        depth = 0
+        pos = self.pos
+        while True:
+            pos = run(raw, pos).end()
+            char = raw[pos:pos + 1]
+            if char == b'{':
+                depth += 1
+            elif char == b'}':
+                depth -= 1
+            else:
+                self._error("表没有结束")
+            pos += 1
+            if depth == 0:
+                self.pos = pos
+                return
+
+    def end_value(self):
+        """跳过值后面的逗号"""
+        if self.raw[self.pos:self.pos + 1] == b',':
+            self.pos += 1
+
+    def read_table(self):
+        """完整解析当前位置的表"""
+        if self.raw[self.pos:self.pos + 1] != b'{':
+            self._error("应为表")
+        self.pos += 1
+        table = {}
+        while True:
+            key = self.read_key()
+            if key is None:
+                return table
+            if self.raw[self.pos:self.pos + 1] == b'{':
+                table[key] = self.read_table()
+            else:
+                table[key] = self.read_scalar()
+            self.end_value()
+
+    def extract(self, paths, prefix=()):
+        """只解析 paths 中路径需要的部分, 返回 [(路径, 值)]"""
+        if self.raw[self.pos:self.pos + 1] != b'{':
+            self._error("应为表")
+        self.pos += 1
+        found = []
+        depth = len(prefix)
+        while True:
+            key = self.read_key()
+            if key is None:
+                return found
+            path = prefix + (key,)
+            wanted = [p for p in paths if len(p) > depth and p[depth] in ("*", key)]
+            if self.raw[self.pos:self.pos + 1] == b'{':
+                if any(len(p) > depth + 1 for p in wanted):
+                    found.extend(self.extract(wanted, path))
+                else:
+                    self.skip_table()
+            else:
+                value = self.read_scalar()
+                if any(len(p) == depth + 1 for p in wanted):
+                    found.append((path, value))
+            self.end_value()
+
+
+def decode_table(data):
+    """将 .jkr 存档完整解析为嵌套字典"""
+    return LuaTableReader(decompress_jkr(data)).read_table()
+
+
+def read_metadata(data, fields=METADATA_FIELDS):
+    """从 .jkr 存档中提取对局信息(种子、底注、回合、金钱、卡组、赌注、小丑牌)
+
+    返回字典, 存档中不存在的字段不会出现在结果中
+    """
+    reader = LuaTableReader(decompress_jkr(data))
+    by_path = dict((path, name) for name, path in fields.items())
+    metadata = {}
+    for path, value in reader.extract(list(fields.values())):
+        for pattern, name in by_path.items():
+            if len(pattern) == len(path) and all(p in ("*", k) for p, k in zip(pattern, path)):
+                if "*" in pattern:
+                    metadata.setdefault(name, []).append((path, value))
+                else:
+                    metadata[name] = value
+    for name, pattern in fields.items():
+        if "*" in pattern and name in metadata:
+            # 按牌在区域中的位置排序
+            metadata[name] = [v for _, v in sorted(metadata[name], key=lambda item: _sort_key(item[0]))]
+    return metadata
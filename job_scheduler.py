@@ -0,0 +1,260 @@
+import heapq
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# 优先级: 数字越大越先执行. 后台任务在用户操作(保存、读取)进行时暂停
+PRIORITY_BACKGROUND = 0
+PRIORITY_AUTO_SAVE = 10
+PRIORITY_USER = 20
+# 上一次还在运行时到期: skip 跳过这一次, coalesce 在运行结束后立即补一次(多次到期只补一次)
+OVERLAP_SKIP = "skip"
+OVERLAP_COALESCE = "coalesce"
+SCHEDULER_WORKERS = 2
+
+
+class JobStats:
+    """一个任务的运行统计"""
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.total_ms = 0.0
+        self.last_ms = None
+        self.max_ms = 0.0
+        self.last_error = None
+
+    def record(self, ms, error=None):
+        self.runs += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        if error is not None:
+            self.failures += 1
+            self.last_error = str(error)
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "mean_ms": self.total_ms / self.runs if self.runs else None,
+            "last_ms": self.last_ms,
+            "max_ms": self.max_ms,
+            "last_error": self.last_error,
+        }
+
+
+class Job:
+    """一个周期任务, interval 为秒, 为None时只在 trigger 时运行"""
+
+    def __init__(self, name, func, interval=None, jitter=0.0, priority=PRIORITY_BACKGROUND,
+                 overlap=OVERLAP_SKIP):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.priority = priority
+        self.overlap = overlap
+        self.stats = JobStats()
+        self.running = False
+        self.pending = False
+        self.next_run = None
+
+    def next_delay(self, rng):
+        """下一次运行前的等待时间, 按 jitter 比例随机错开, 避免多个任务总在同一时刻运行"""
+        if self.jitter:
+            return self.interval * (1 + rng.uniform(-self.jitter, self.jitter))
+        return self.interval
+
+
+class JobScheduler:
+    """命名周期任务的统一调度器
+
+    一个调度线程按到期时间排序, 到期的任务交给工作线程按优先级运行.
+    同一任务不会同时运行两次: 上一次还没结束时按 overlap 跳过或合并为一次补运行.
+    foreground() 期间(用户保存、读取存档)不开始新的后台任务, 后台任务也可以在
+    分批处理之间调用 wait_foreground() 让出. 任务函数在工作线程中调用, 需要操作界面时
+    自己投递回主线程
+    """
+
+    def __init__(self, workers=SCHEDULER_WORKERS, seed=None):
+        self._jobs = {}
+        self._timers = []
+        self._ready = []
+        self._sequence = 0
+        self._foreground = 0
+        self._stopped = False
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._schedule, name="scheduler", daemon=True)]
+        self._threads += [threading.Thread(target=self._work, name=f"scheduler-{i}", daemon=True)
+                          for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def add(self, name, func, interval=None, jitter=0.0, priority=PRIORITY_BACKGROUND,
+            overlap=OVERLAP_SKIP, delay=None):
+        """添加或替换任务, 第一次在 delay 秒后运行(默认一个周期后)"""
+        job = Job(name, func, interval, jitter, priority, overlap)
+        with self._cond:
+            old = self._jobs.get(name)
+            if old is not None:
+                job.stats = old.stats
+            self._jobs[name] = job
+            first = delay if delay is not None else interval
+            if first is not None:
+                self._arm(job, first)
+            self._cond.notify_all()
+        return job
+
+    def remove(self, name):
+        """删除任务, 正在运行的这一次不受影响"""
+        with self._cond:
+            self._jobs.pop(name, None)
+
+    def reschedule(self, name, interval, jitter=None):
+        """修改任务的周期, 从现在起重新计时"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return
+            job.interval = interval
+            if jitter is not None:
+                job.jitter = jitter
+            job.next_run = None
+            if interval is not None:
+                self._arm(job, job.next_delay(self._rng))
+            self._cond.notify_all()
+
+    def trigger(self, name):
+        """立即运行一次任务, 正在运行时按 overlap 处理, 返回是否已安排"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            return self._dispatch(job)
+
+    def skip(self, name):
+        """任务自己决定不做这一次时记为跳过(如上一次投递出去的工作还没完成)"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is not None:
+                job.stats.skipped += 1
+
+    def _arm(self, job, delay, base=None):
+        job.next_run = (base if base is not None else time.monotonic()) + delay
+        self._sequence += 1
+        heapq.heappush(self._timers, (job.next_run, self._sequence, job))
+
+    def _dispatch(self, job):
+        # 调用时持有锁
+        if job.running or job in (item[2] for item in self._ready):
+            if job.overlap == OVERLAP_COALESCE:
+                job.stats.coalesced += 1
+                job.pending = True
+                return True
+            job.stats.skipped += 1
+            return False
+        self._sequence += 1
+        heapq.heappush(self._ready, (-job.priority, self._sequence, job))
+        self._cond.notify_all()
+        return True
+
+    @contextmanager
+    def foreground(self):
+        """用户操作期间暂停开始新的后台任务"""
+        self.begin_foreground()
+        try:
+            yield
+        finally:
+            self.end_foreground()
+
+    def begin_foreground(self):
+        with self._cond:
+            self._foreground += 1
+
+    def end_foreground(self):
+        with self._cond:
+            self._foreground = max(0, self._foreground - 1)
+            self._cond.notify_all()
+
+    def wait_foreground(self, timeout=None):
+        """等待用户操作结束(后台任务分批处理之间调用), 返回是否已经没有用户操作"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._foreground or self._stopped, timeout)
+
+    def sleep(self, seconds):
+        """后台任务中的暂停, 调度器停止时提前返回"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopped, seconds)
+
+    def stats(self):
+        """各任务的运行统计 {名称: {...}}, 另有 running 和 next_in(距下一次运行的秒数)"""
+        now = time.monotonic()
+        with self._cond:
+            return dict((name, dict(job.stats.as_dict(), running=job.running, priority=job.priority,
+                                    interval=job.interval,
+                                    next_in=max(0.0, job.next_run - now) if job.next_run else None))
+                        for name, job in self._jobs.items())
+
+    def stop(self, timeout=5):
+        """停止调度, 最多等待 timeout 秒让正在运行的任务结束"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def _schedule(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    due, _, job = heapq.heappop(self._timers)
+                    # 任务已删除或改了周期时丢弃旧的定时
+                    if self._jobs.get(job.name) is not job or job.next_run != due:
+                        continue
+                    job.next_run = None
+                    self._dispatch(job)
+                    if job.interval is not None:
+                        # 从预定时间起算下一次, 不累积延迟; 落后超过一个周期时从现在起算
+                        delay = job.next_delay(self._rng)
+                        self._arm(job, delay, due if due + delay > now else now)
+                timeout = self._timers[0][0] - now if self._timers else None
+                self._cond.wait(timeout)
+
+    def _runnable(self):
+        if not self._ready:
+            return False
+        # 有用户操作时只运行不低于用户操作优先级的任务
+        return not self._foreground or -self._ready[0][0] >= PRIORITY_USER
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped or self._runnable())
+                if self._stopped:
+                    return
+                _, _, job = heapq.heappop(self._ready)
+                job.running = True
+            start = time.perf_counter()
+            error = None
+            try:
+                job.func()
+            except Exception as e:
+                error = e
+            ms = (time.perf_counter() - start) * 1000
+            with self._cond:
+                job.running = False
+                job.stats.record(ms, error)
+                if job.pending:
+                    job.pending = False
+                    if self._jobs.get(job.name) is job:
+                        self._dispatch(job)
+                self._cond.notify_all()
@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict, deque
+
+# 解码后的预览图占用的内存上限, 一张 770x570 的 RGB 预览图约 1.3 MB
+PREVIEW_CACHE_MB = 64
+# 选中存档前后各预取的存档数
+PREFETCH_NEIGHBOURS = 3
+PREVIEW_WORKERS = 2
+
+
+def image_bytes(image):
+    """解码后的图像占用的内存(字节)"""
+    return image.width * image.height * len(image.getbands())
+
+
+class PreviewCache:
+    """解码后的预览图的 LRU 缓存, 按图像占用的字节数限制总大小
+
+    超出预算时从最久未使用的开始丢弃. 单张超过预算的图像不缓存. 可以在多个线程中使用
+    """
+
+    def __init__(self, budget_bytes=PREVIEW_CACHE_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._items
+
+    def get(self, name):
+        """返回缓存的图像并标记为最近使用, 没有时返回None"""
+        with self._lock:
+            image = self._items.get(name)
+            if image is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(name)
+            self.hits += 1
+            return image
+
+    def put(self, name, image):
+        size = image_bytes(image)
+        with self._lock:
+            old = self._items.pop(name, None)
+            if old is not None:
+                self.used_bytes -= image_bytes(old)
+            if size > self.budget_bytes:
+                return
+            self._items[name] = image
+            self.used_bytes += size
+            self._evict()
+
+    def discard(self, names):
+        """删除存档的缓存(存档被覆盖或删除时)"""
+        with self._lock:
+            for name in names:
+                image = self._items.pop(name, None)
+                if image is not None:
+                    self.used_bytes -= image_bytes(image)
+
+    def resize(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.used_bytes = 0
+
+    def _evict(self):
+        while self.used_bytes > self.budget_bytes and self._items:
+            _, image = self._items.popitem(last=False)
+            self.used_bytes -= image_bytes(image)
+
+
+class PreviewLoader:
+    """在后台线程中解码预览图, 并预取选中存档附近的存档
+
+    request(name, prefetch) 在缓存中时直接返回图像, 否则排队解码, 完成后在解码线程中
+    调用 on_loaded(name, image). 每次请求都会取消之前还没开始的解码, 所以按住方向键
+    连续切换时只解码最新选中的存档和它附近的存档; 已经开始的解码完成后仍会放入缓存,
+    但只有仍是最新选中的存档才会回调
+    """
+
+    def __init__(self, load, on_loaded, cache=None, workers=PREVIEW_WORKERS):
+        self.load = load
+        self.on_loaded = on_loaded
+        self.cache = cache if cache is not None else PreviewCache()
+        self.cancelled = 0
+        self._queue = deque()
+        self._loading = set()
+        self._wanted = None
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f"preview-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, name, prefetch=()):
+        """显示 name 的预览, 同时预取 prefetch 中的存档(按顺序), 返回缓存的图像或None"""
+        image = self.cache.get(name)
+        with self._cond:
+            self._wanted = name if image is None else None
+            self.cancelled += len(self._queue)
+            self._queue.clear()
+            for queued in ([name] if image is None else []) + list(prefetch):
+                if queued not in self._loading and queued not in self._queue and \
+                        (queued == name or queued not in self.cache):
+                    self._queue.append(queued)
+            self._cond.notify_all()
+        return image
+
+    def cancel(self):
+        """取消全部还没开始的解码(如清除选择时)"""
+        with self._cond:
+            self._wanted = None
+            self.cancelled += len(self._queue)
+            self._queue.clear()
+
+    def idle(self):
+        """没有排队和正在进行的解码"""
+        with self._cond:
+            return not self._queue and not self._loading
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._queue.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                name = self._queue.popleft()
+                self._loading.add(name)
+            image = None
+            try:
+                image = self.load(name)
+                if image is not None:
+                    self.cache.put(name, image)
+            except Exception:
+                # 截图损坏或被删除时不显示预览
+                image = None
+            finally:
+                with self._cond:
+                    self._loading.discard(name)
+                    wanted = self._wanted == name
+                    if wanted:
+                        self._wanted = None
+            if wanted:
+                self.on_loaded(name, image)
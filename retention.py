@@ -0,0 +1,195 @@
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+
+BATCH_SIZE = 200
+BATCH_PAUSE = 0.05  # 秒, 批次之间让出时间
+
+
+def is_auto_save(record):
+    """是否为自动存档(旧版本记录没有 auto 字段, 按名称判断)"""
+    if "auto" in record:
+        return record["auto"]
+    return record["name"].startswith("auto_")
+
+
+def record_size(record):
+    """存档占用的字节数, 旧版本记录没有 size 字段时读取文件大小"""
+    if "size" in record:
+        return record["size"]
+    size = 0
+    for key in ("screenshot", "game_save"):
+        path = record.get(key)
+        if path:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+    return size
+
+
+def record_time(record):
+    """存档时间, 时间戳格式为 %Y-%m-%d %H:%M:%S"""
+    try:
+        return datetime.fromisoformat(record.get("timestamp") or "")
+    except ValueError:
+        return datetime.min
+
+
+class RetentionPolicy:
+    """自动存档保留策略
+
+    保留最近 keep_last 个; 之后 hourly_hours 小时内每小时保留一个;
+    之后 daily_days 天内每天保留一个; 更早的删除.
+    max_bytes 不为空时, 总占用超出预算则继续从最旧的开始删除, 这些存档不经过回收站直接彻底删除,
+    否则要等回收站清理后才真正低于预算. 手动存档和每一局(run)的第一个、最后一个存档始终保留
+    """
+
+    def __init__(self, keep_last=20, hourly_hours=24, daily_days=30, max_bytes=None):
+        self.keep_last = keep_last
+        self.hourly_hours = hourly_hours
+        self.daily_days = daily_days
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置字典读取策略"""
+        return cls(
+            keep_last=config.get('retention_keep_last', 20),
+            hourly_hours=config.get('retention_hourly_hours', 24),
+            daily_days=config.get('retention_daily_days', 30),
+            max_bytes=config.get('retention_max_bytes')
+        )
+
+    def to_config(self):
+        return {
+            'retention_keep_last': self.keep_last,
+            'retention_hourly_hours': self.hourly_hours,
+            'retention_daily_days': self.daily_days,
+            'retention_max_bytes': self.max_bytes
+        }
+
+    def select(self, records, now=None):
+        """返回 (按时间段应删除的存档, 为满足空间预算继续删除的存档), 都是从旧到新
+
+        前者移入回收站; 后者需要立即彻底删除, 只移入回收站不会减少占用的空间
+        """
+        now = now or datetime.now()
+        times = {}
+        protected = set()
+        runs = {}
+        candidates = []
+        for record in records:
+            if not is_auto_save(record):
+                protected.add(record["name"])
+                continue
+            candidates.append(record)
+            times[record["name"]] = record_time(record)
+            run = record.get("run")
+            if run:
+                runs.setdefault(run, []).append(record)
+        # 每一局的边界存档
+        for run_records in runs.values():
+            run_records.sort(key=lambda r: times[r["name"]])
+            protected.add(run_records[0]["name"])
+            protected.add(run_records[-1]["name"])
+
+        candidates.sort(key=lambda r: times[r["name"]], reverse=True)
+        keep = set(r["name"] for r in candidates[:self.keep_last])
+        hourly_limit = now - timedelta(hours=self.hourly_hours)
+        daily_limit = now - timedelta(days=self.daily_days)
+        buckets = set()
+        for record in candidates[self.keep_last:]:
+            saved_at = times[record["name"]]
+            if saved_at >= hourly_limit:
+                bucket = ("hour", saved_at.strftime("%Y%m%d%H"))
+            elif saved_at >= daily_limit:
+                bucket = ("day", saved_at.strftime("%Y%m%d"))
+            else:
+                continue
+            # 从新到旧遍历, 每个时间段保留最新的一个
+            if bucket not in buckets:
+                buckets.add(bucket)
+                keep.add(record["name"])
+
+        prunable = [r for r in reversed(candidates)
+                    if r["name"] not in keep and r["name"] not in protected]
+        over_budget = []
+
+        if self.max_bytes is not None:
+            pruned = set(r["name"] for r in prunable)
+            total = sum(record_size(r) for r in records if r["name"] not in pruned)
+            recent = set(r["name"] for r in candidates[:self.keep_last])
+            # 超出预算时从最旧的时间段存档开始继续删除
+            for record in reversed(candidates):
+                if total <= self.max_bytes:
+                    break
+                name = record["name"]
+                if name in pruned or name in protected or name in recent:
+                    continue
+                over_budget.append(record)
+                pruned.add(name)
+                total -= record_size(record)
+        return prunable, over_budget
+
+
+class RetentionWorker:
+    """在后台线程中按保留策略分批清理自动存档
+
+    list_records() 返回全部存档信息, delete(names) 把一批存档移入回收站并返回被移入的记录,
+    purge(names) 彻底删除回收站中的存档, 用于为满足空间预算删除的存档.
+    完成后调用 on_done(删除数量, 存档记录的大小之和). 去重的内容可能仍被其他存档引用,
+    这不是释放的空间. 同一时间只运行一次清理. wait_idle 在每批之间调用, 用于等待用户操作结束
+    """
+
+    def __init__(self, list_records, delete, on_done=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE,
+                 wait_idle=None, purge=None):
+        self.list_records = list_records
+        self.delete = delete
+        self.purge = purge
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.pause = pause
+        self.wait_idle = wait_idle
+        self._running = threading.Lock()
+
+    def run(self, policy):
+        """在当前线程清理(由调度器调用), 已有清理在运行时返回 False"""
+        if not self._running.acquire(blocking=False):
+            return False
+        self._run(policy)
+        return True
+
+    def run_async(self, policy):
+        """开始一次后台清理, 已有清理在运行时返回 False"""
+        if not self._running.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._run, args=(policy,), name="retention", daemon=True).start()
+        return True
+
+    def _run(self, policy):
+        removed = 0
+        record_bytes = 0
+        try:
+            by_age, over_budget = policy.select(self.list_records())
+            batches = [(records[start:start + self.batch_size], purge)
+                       for records, purge in ((by_age, False), (over_budget, True))
+                       for start in range(0, len(records), self.batch_size)]
+            for batch, purge in batches:
+                # 删除前记下大小, 删除后文件已不存在
+                sizes = dict((r["name"], record_size(r)) for r in batch)
+                deleted = self.delete(list(sizes))
+                if purge and self.purge:
+                    # 超出空间预算的存档不在回收站中等待, 立即释放空间
+                    self.purge([record["name"] for record in deleted])
+                for record in deleted:
+                    removed += 1
+                    record_bytes += sizes[record["name"]]
+                time.sleep(self.pause)
+                if self.wait_idle:
+                    self.wait_idle()
+        finally:
+            self._running.release()
+            if self.on_done:
+                self.on_done(removed, record_bytes)
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import shutil
+import threading
+from datetime import datetime
+
+# 恢复方式: auto 优先写时复制(reflink), 不支持时复制内容; hardlink 直接链接到备份文件
+LINK_MODES = ("auto", "copy", "reflink", "hardlink")
+JOURNAL_SIZE = 5
+JOURNAL_INDEX = "journal.json"
+TMP_SUFFIX = ".smartsl.tmp"
+# Linux FICLONE ioctl
+FICLONE = 0x40049409
+
+
+def _fsync_dir(directory):
+    """写入目录项, Windows 不支持打开目录时跳过"""
+    if sys.platform.startswith("win"):
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def reflink(src_path, dst_file):
+    """把 src_path 的内容以写时复制的方式克隆到已打开的 dst_file, 不支持时抛出 OSError"""
+    if not sys.platform.startswith("linux"):
+        raise OSError("当前平台不支持 reflink")
+    import fcntl
+    with open(src_path, 'rb') as src:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src.fileno())
+
+
+def replace_atomic(path, data=None, source=None, mode="auto"):
+    """原子地替换 path 的内容, 返回实际使用的方式(copy/reflink/hardlink)
+
+    新内容先写入同目录下的临时文件并 fsync, 再用 os.replace 替换,
+    任何时刻中断都只会留下旧文件或新文件. data 为字节内容, source 为内容来源文件;
+    有 source 时可以使用 reflink 或 hardlink 避免复制数据, 不支持时退回到复制
+    (明确指定 reflink 时除外). hardlink 让游戏存档与备份共用同一个文件,
+    游戏原地写入存档时会改写备份, 只有确认游戏总是整体替换存档时才应使用
+    """
+    tmp_path = path + TMP_SUFFIX
+    used = "copy"
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if source and mode == "hardlink":
+            try:
+                os.link(source, tmp_path)
+                used = "hardlink"
+            except OSError:
+                # 不在同一文件系统时退回到复制
+                pass
+        if used != "hardlink":
+            with open(tmp_path, 'wb') as f:
+                if source and mode in ("auto", "reflink"):
+                    try:
+                        reflink(source, f)
+                        used = "reflink"
+                    except OSError:
+                        if mode == "reflink":
+                            raise
+                if used == "copy":
+                    if data is None:
+                        with open(source, 'rb') as src:
+                            shutil.copyfileobj(src, f)
+                    else:
+                        f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(os.path.dirname(path))
+    return used
+
+
+class RestoreJournal:
+    """读取存档前游戏存档状态的日志, 用于撤销读取
+
+    每次读取存档前把当前游戏存档(和档案中一起恢复的文件)硬链接(不支持时复制)到日志目录,
+    只保留最近 size 条. 游戏存档随后被整体替换, 日志中的旧文件不会再被游戏改写
+    """
+
+    def __init__(self, root, size=JOURNAL_SIZE):
+        self.root = root
+        self.size = size
+        self.index_path = os.path.join(root, JOURNAL_INDEX)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, entries):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    def entries(self):
+        """从旧到新的日志记录"""
+        with self._lock:
+            return self._load()
+
+    @staticmethod
+    def entry_files(entry):
+        """日志记录中的 [(日志文件名, 游戏文件路径)], 日志文件名为None表示读取前文件不存在
+
+        兼容旧版本只有一个文件的记录
+        """
+        if "files" in entry:
+            return [(f["file"], f["game_path"]) for f in entry["files"]]
+        return [(entry["file"], entry["game_path"])]
+
+    def _remove_files(self, entry):
+        for file_name, _ in self.entry_files(entry):
+            file_path = os.path.join(self.root, file_name) if file_name else None
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+
+    def record(self, game_paths, restored_name):
+        """记下一组游戏文件当前的内容, 返回日志记录
+
+        game_paths 可以是一个路径或路径列表(档案中的多个文件). 不存在的文件也会记下,
+        撤销时删除读取存档时新建的文件
+        """
+        if isinstance(game_paths, str):
+            game_paths = [game_paths]
+        with self._lock:
+            entries = self._load()
+            timestamp = datetime.now()
+            stem = timestamp.strftime("%Y%m%d_%H%M%S_%f")
+            files = []
+            for i, game_path in enumerate(game_paths):
+                if not os.path.exists(game_path):
+                    files.append({"file": None, "game_path": game_path})
+                    continue
+                file_name = f"{stem}.jkr" if i == 0 else f"{stem}_{i}.jkr"
+                file_path = os.path.join(self.root, file_name)
+                try:
+                    # 同一文件系统上只增加一个目录项, 不复制数据
+                    os.link(game_path, file_path)
+                except OSError:
+                    shutil.copy2(game_path, file_path)
+                files.append({"file": file_name, "game_path": game_path})
+            entry = {
+                "files": files,
+                "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "restored": restored_name
+            }
+            entries.append(entry)
+            while len(entries) > self.size:
+                self._remove_files(entries.pop(0))
+            self._save(entries)
+            return entry
+
+    def undo(self, mode="auto"):
+        """把游戏文件恢复为最近一次读取前的状态, 返回日志记录, 没有记录时返回None
+
+        读取前不存在的文件(如档案的附属文件)会被删除
+        """
+        with self._lock:
+            entries = self._load()
+            if not entries:
+                return None
+            entry = entries[-1]
+            for file_name, game_path in self.entry_files(entry):
+                if file_name is None:
+                    if os.path.exists(game_path):
+                        os.remove(game_path)
+                    continue
+                # 日志文件只在这里使用一次, 可以直接链接回去
+                replace_atomic(game_path, source=os.path.join(self.root, file_name),
+                               mode="hardlink" if mode in ("auto", "hardlink") else mode)
+            # 全部替换成功后才删除日志文件, 中途失败时可以再次撤销
+            self._remove_files(entry)
+            entries.pop()
+            self._save(entries)
+            return entry
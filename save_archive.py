@@ -0,0 +1,119 @@
+import os
+import io
+import json
+import time
+import zlib
+import hashlib
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# 存档包是 tar 格式, 成员依次写入, 清单在最后
+ARCHIVE_SUFFIX = ".smartsl"
+ARCHIVE_MANIFEST = "manifest.json"
+ARCHIVE_VERSION = 1
+# 单独压缩的成员名以 .z 结尾
+COMPRESSED_SUFFIX = ".z"
+COMPRESS_LEVEL = 6
+# 压缩后至少小这么多才保存压缩结果, 游戏存档和 WebP 截图本身已经压缩过
+COMPRESS_MIN_SAVING = 0.1
+CHUNK_SIZE = 1024 * 1024
+# 每个线程最多有这么多个处理完等待写出的结果
+MAX_PENDING_PER_WORKER = 2
+
+
+def compress_member(data):
+    """压缩一个成员, 返回 (数据, 是否压缩); 压缩效果不明显时返回原数据
+
+    zlib 压缩时释放 GIL, 可以在多个线程中并行
+    """
+    compressed = zlib.compress(data, COMPRESS_LEVEL)
+    if len(compressed) <= len(data) * (1 - COMPRESS_MIN_SAVING):
+        return compressed, True
+    return data, False
+
+
+def ordered_map(func, items, workers=None):
+    """在线程池中对 items 调用 func, 按原顺序产出结果
+
+    同时最多有 workers * MAX_PENDING_PER_WORKER 个结果在内存中
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive") as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ArchiveWriter:
+    """把成员依次写入 tar 流, 输出不需要支持寻址"""
+
+    def __init__(self, fileobj):
+        self.tar = tarfile.open(fileobj=fileobj, mode="w|")
+
+    def add(self, name, data, compressed=False):
+        """写入一个成员, data 为 compress_member 的结果时 compressed 为 True"""
+        info = tarfile.TarInfo(name + COMPRESSED_SUFFIX if compressed else name)
+        info.size = len(data)
+        info.mtime = time.time()
+        self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self, manifest):
+        """写入清单并结束存档包"""
+        data = json.dumps(manifest, ensure_ascii=False).encode('utf-8')
+        self.add(ARCHIVE_MANIFEST, *compress_member(data))
+        self.tar.close()
+
+
+class _InflateReader:
+    """边读边解压的只读流, 每次最多解压 CHUNK_SIZE 字节"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.inflater = zlib.decompressobj()
+        self.buffer = b''
+        self.eof = False
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            data = self.inflater.unconsumed_tail or self.raw.read(CHUNK_SIZE)
+            if not data:
+                self.buffer += self.inflater.flush()
+                self.eof = True
+                break
+            self.buffer += self.inflater.decompress(data, CHUNK_SIZE)
+        if size < 0:
+            size = len(self.buffer)
+        result, self.buffer = self.buffer[:size], self.buffer[size:]
+        return result
+
+
+def read_archive(fileobj):
+    """依次产出存档包中的 (成员名, 只读流)
+
+    压缩的成员在读取时解压, 成员名不带 .z. 不读取的成员会被直接跳过
+    """
+    with tarfile.open(fileobj=fileobj, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            stream = tar.extractfile(member)
+            name = member.name
+            if name.endswith(COMPRESSED_SUFFIX):
+                name = name[:-len(COMPRESSED_SUFFIX)]
+                stream = _InflateReader(stream)
+            yield name, stream
+
+
+def copy_stream(stream, path):
+    """把流写入文件, 返回内容的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
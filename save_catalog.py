@@ -0,0 +1,455 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+
+from perceptual_hash import parse_hash, to_signed
+
+CATALOG_FILE = "catalog.db"
+LEGACY_DIR = "legacy_json"
+# 单独建列的对局信息字段
+INDEXED_FIELDS = (("seed", "TEXT"), ("ante", "INTEGER"))
+
+
+def _phash_column(record):
+    """截图感知哈希(十六进制)转换为有符号 64 位整数保存"""
+    text = record.get("phash")
+    return to_signed(parse_hash(text)) if text else None
+
+
+def record_digests(record):
+    """存档引用的去重 blob: 档案附属文件和不在快照链中的游戏存档"""
+    digests = list((record.get("companions") or {}).values())
+    if record.get("game_save_hash") and not record.get("chain"):
+        digests.append(record["game_save_hash"])
+    return digests
+
+
+class SaveCatalog:
+    """所有存档信息的统一索引(SQLite)
+
+    替代每个存档一个的 JSON 文件, 创建和删除都是增量更新,
+    监听者会收到 ("add", [名称]) / ("remove", [名称]) 形式的变更, 覆盖已有存档时为 ("update", [名称]).
+    删除的存档先移入回收站(deleted_at 不为空), 除回收站相关的方法外查询都不包含它们
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS saves ("
+                "name TEXT PRIMARY KEY, timestamp TEXT, data TEXT NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_timestamp ON saves(timestamp)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # 从存档中解析出的对局信息, 用于搜索和分组
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(saves)")]
+            for column, column_type in INDEXED_FIELDS + (("deleted_at", "TEXT"), ("phash", "INTEGER")):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE saves ADD COLUMN {column} {column_type}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_seed ON saves(seed)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS saves_deleted_at ON saves(deleted_at)")
+            # 游戏存档的子表哈希树(用于比较存档), 随存档一起删除
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS tree_index (name TEXT PRIMARY KEY, digest TEXT, data BLOB NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS tree_index_digest ON tree_index(digest)")
+            # 画廊联系表: 每张联系表的版本和已用位置数, 每个存档的缩略图所在的联系表和位置.
+            # 没有截图的存档 sheet 为空, 随存档一起删除
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS atlas_sheets ("
+                "sheet INTEGER PRIMARY KEY, generation INTEGER NOT NULL, slots INTEGER NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS atlas_tiles ("
+                "name TEXT PRIMARY KEY, sheet INTEGER, slot INTEGER, width INTEGER, height INTEGER)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS atlas_tiles_sheet ON atlas_tiles(sheet)")
+            # 存档引用的去重 blob(包括回收站中的存档), 与存档信息在同一个事务中更新,
+            # blob 的引用计数就是这里的行数; blobs 记录每个 blob 的大小, 用于存储统计
+            self.conn.execute("CREATE TABLE IF NOT EXISTS blob_refs (name TEXT NOT NULL, digest TEXT NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_name ON blob_refs(name)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS blob_refs_digest ON blob_refs(digest)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+
+    def add_listener(self, callback):
+        """注册变更监听 callback(op, names)"""
+        self._listeners.append(callback)
+
+    def _notify(self, op, names):
+        for callback in self._listeners:
+            callback(op, names)
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              (key, json.dumps(value)))
+
+    def get_tree_index(self, digest):
+        """内容哈希为 digest 的游戏存档的哈希树数据, 没有时返回None"""
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM tree_index WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def put_tree_index(self, name, digest, data):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO tree_index (name, digest, data) VALUES (?, ?, ?)",
+                              (name, digest, data))
+
+    def atlas_sheets(self):
+        """全部联系表 [(编号, 版本, 已用位置数, 仍在使用的位置数)], 按编号排序"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT s.sheet, s.generation, s.slots, COUNT(t.name) FROM atlas_sheets s "
+                "LEFT JOIN atlas_tiles t ON t.sheet = s.sheet GROUP BY s.sheet ORDER BY s.sheet").fetchall()
+
+    def atlas_tiles(self, names):
+        """存档缩略图的位置 {名称: (联系表, 版本, 位置, 宽, 高)}, 没有截图的存档为None,
+        还没有加入联系表的存档不在结果中"""
+        names = list(names)
+        tiles = {}
+        with self._lock:
+            # SQLite 对参数个数有限制, 分批查询
+            for i in range(0, len(names), 500):
+                chunk = names[i:i + 500]
+                for name, sheet, generation, slot, width, height in self.conn.execute(
+                        "SELECT t.name, t.sheet, s.generation, t.slot, t.width, t.height FROM atlas_tiles t "
+                        "LEFT JOIN atlas_sheets s ON s.sheet = t.sheet "
+                        f"WHERE t.name IN ({','.join('?' * len(chunk))})", chunk):
+                    tiles[name] = (sheet, generation, slot, width, height) if sheet is not None else None
+        return tiles
+
+    def sheet_tiles(self, sheet):
+        """联系表中仍在使用的缩略图 [(名称, 位置, 宽, 高)], 按位置排序"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT name, slot, width, height FROM atlas_tiles WHERE sheet = ? ORDER BY slot",
+                (sheet,)).fetchall()
+
+    def names_without_tiles(self, limit):
+        """还没有加入联系表的最多 limit 个存档名称, 按时间排序"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT name FROM saves WHERE deleted_at IS NULL "
+                "AND name NOT IN (SELECT name FROM atlas_tiles) ORDER BY timestamp, name LIMIT ?", (limit,))]
+
+    def put_atlas_sheet(self, sheet, generation, slots, tiles, removed_sheets=()):
+        """在一个事务中写入联系表和其中的缩略图 [(名称, 位置, 宽, 高)], 并删除合并掉的联系表"""
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO atlas_sheets (sheet, generation, slots) VALUES (?, ?, ?)",
+                              (sheet, generation, slots))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO atlas_tiles (name, sheet, slot, width, height) VALUES (?, ?, ?, ?, ?)",
+                [(name, sheet, slot, width, height) for name, slot, width, height in tiles])
+            self.conn.executemany("DELETE FROM atlas_sheets WHERE sheet = ?", [(s,) for s in removed_sheets])
+
+    def put_blank_tiles(self, names):
+        """记录没有截图的存档, 不再尝试加入联系表"""
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO atlas_tiles (name) VALUES (?)", [(name,) for name in names])
+
+    def drop_atlas_tiles(self, names):
+        """截图改变时删除存档的缩略图位置, 之后重新加入联系表"""
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM atlas_tiles WHERE name = ?", [(name,) for name in names])
+
+    def drop_atlas_sheets(self, sheets=None):
+        """删除联系表(默认全部)和其中的缩略图位置"""
+        with self._lock, self.conn:
+            if sheets is None:
+                self.conn.execute("DELETE FROM atlas_tiles")
+                self.conn.execute("DELETE FROM atlas_sheets")
+                return
+            for sheet in sheets:
+                self.conn.execute("DELETE FROM atlas_tiles WHERE sheet = ?", (sheet,))
+                self.conn.execute("DELETE FROM atlas_sheets WHERE sheet = ?", (sheet,))
+
+    def import_legacy(self, saves_dir):
+        """首次启动时导入旧版本的 JSON 存档信息, 返回导入数量
+
+        导入后的 JSON 文件移动到 saves/legacy_json/ 保留
+        """
+        if self.get_meta("legacy_imported"):
+            return 0
+        records = []
+        legacy_files = []
+        for file_name in os.listdir(saves_dir):
+            if not file_name.endswith('.json'):
+                continue
+            file_path = os.path.join(saves_dir, file_name)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            record.setdefault("name", file_name[:-len('.json')])
+            records.append(record)
+            legacy_files.append(file_path)
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO saves (name, timestamp, data) VALUES (?, ?, ?)",
+                [(r["name"], r.get("timestamp"), json.dumps(r, ensure_ascii=False)) for r in records])
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', 'true')")
+
+        if legacy_files:
+            legacy_dir = os.path.join(saves_dir, LEGACY_DIR)
+            os.makedirs(legacy_dir, exist_ok=True)
+            for file_path in legacy_files:
+                shutil.move(file_path, os.path.join(legacy_dir, os.path.basename(file_path)))
+        return len(records)
+
+    def get(self, name, include_trashed=False):
+        """读取存档信息, 不存在时返回None
+
+        include_trashed 为 True 时也返回回收站中的存档, 这时记录带有 deleted_at
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT data, deleted_at FROM saves WHERE name = ?", (name,)).fetchone()
+        if not row or (row[1] and not include_trashed):
+            return None
+        record = json.loads(row[0])
+        if row[1]:
+            record["deleted_at"] = row[1]
+        return record
+
+    def put(self, record, blob_sizes=None):
+        """新增或覆盖一条存档信息"""
+        self.put_many([record], blob_sizes)
+
+    def put_many(self, records, blob_sizes=None):
+        """在一个事务中新增或覆盖多条存档信息和它们引用的 blob
+
+        blob_sizes 为新写入的 blob 的大小 {哈希: 字节数}, 已有记录的 blob 不会被改写.
+        覆盖的存档原来引用的 blob 由调用方用 unreferenced 找出后删除
+        """
+        added = []
+        updated = []
+        with self._lock:
+            with self.conn:
+                for record in records:
+                    existed = self.conn.execute(
+                        "SELECT 1 FROM saves WHERE name = ? AND deleted_at IS NULL", (record["name"],)).fetchone()
+                    meta = record.get("meta", {})
+                    # 同名存档在回收站中时直接覆盖
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO saves (name, timestamp, data, seed, ante, phash) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (record["name"], record.get("timestamp"), json.dumps(record, ensure_ascii=False),
+                         meta.get("seed"), meta.get("ante"), _phash_column(record)))
+                    self.conn.execute("DELETE FROM blob_refs WHERE name = ?", (record["name"],))
+                    self.conn.executemany("INSERT INTO blob_refs (name, digest) VALUES (?, ?)",
+                                          [(record["name"], digest) for digest in record_digests(record)])
+                    (updated if existed else added).append(record["name"])
+                if blob_sizes:
+                    self.conn.executemany("INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)",
+                                          list(blob_sizes.items()))
+        if added:
+            self._notify("add", added)
+        if updated:
+            self._notify("update", updated)
+
+    def trash(self, names, deleted_at):
+        """在一个事务中把多条存档移入回收站, 返回被移入的记录"""
+        with self._lock:
+            removed = []
+            with self.conn:
+                for name in names:
+                    row = self.conn.execute(
+                        "SELECT data FROM saves WHERE name = ? AND deleted_at IS NULL", (name,)).fetchone()
+                    if row:
+                        removed.append(json.loads(row[0]))
+                self.conn.executemany("UPDATE saves SET deleted_at = ? WHERE name = ?",
+                                      [(deleted_at, r["name"]) for r in removed])
+        if removed:
+            self._notify("remove", [r["name"] for r in removed])
+        return removed
+
+    def untrash(self, names):
+        """从回收站恢复存档, 返回被恢复的记录"""
+        with self._lock:
+            restored = []
+            with self.conn:
+                for name in names:
+                    row = self.conn.execute(
+                        "SELECT data FROM saves WHERE name = ? AND deleted_at IS NOT NULL", (name,)).fetchone()
+                    if row:
+                        restored.append(json.loads(row[0]))
+                self.conn.executemany("UPDATE saves SET deleted_at = NULL WHERE name = ?",
+                                      [(r["name"],) for r in restored])
+        if restored:
+            self._notify("add", [r["name"] for r in restored])
+        return restored
+
+    def trashed(self, before=None):
+        """回收站中的存档(带 deleted_at), 按删除时间排序; before 不为空时只返回更早删除的"""
+        query = "SELECT data, deleted_at FROM saves WHERE deleted_at IS NOT NULL"
+        params = []
+        if before is not None:
+            query += " AND deleted_at < ?"
+            params.append(before)
+        records = []
+        with self._lock:
+            for data, deleted_at in self.conn.execute(query + " ORDER BY deleted_at", params):
+                record = json.loads(data)
+                record["deleted_at"] = deleted_at
+                records.append(record)
+        return records
+
+    def purge(self, names):
+        """从回收站中彻底删除存档信息, 返回被删除的记录"""
+        with self._lock:
+            removed = []
+            with self.conn:
+                for name in names:
+                    row = self.conn.execute(
+                        "SELECT data FROM saves WHERE name = ? AND deleted_at IS NOT NULL", (name,)).fetchone()
+                    if row:
+                        removed.append(json.loads(row[0]))
+                        self.conn.execute("DELETE FROM saves WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM tree_index WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM atlas_tiles WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM blob_refs WHERE name = ?", (name,))
+        return removed
+
+    def delete(self, names):
+        """在一个事务中删除多条存档信息, 返回被删除的记录"""
+        with self._lock:
+            removed = []
+            with self.conn:
+                for name in names:
+                    row = self.conn.execute("SELECT data FROM saves WHERE name = ?", (name,)).fetchone()
+                    if row:
+                        removed.append(json.loads(row[0]))
+                        self.conn.execute("DELETE FROM saves WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM tree_index WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM atlas_tiles WHERE name = ?", (name,))
+                        self.conn.execute("DELETE FROM blob_refs WHERE name = ?", (name,))
+        if removed:
+            self._notify("remove", [r["name"] for r in removed])
+        return removed
+
+    def known_blobs(self, digests):
+        """digests 中已记录大小的 blob"""
+        digests = list(digests)
+        known = set()
+        with self._lock:
+            for i in range(0, len(digests), 500):
+                chunk = digests[i:i + 500]
+                known.update(row[0] for row in self.conn.execute(
+                    f"SELECT digest FROM blobs WHERE digest IN ({','.join('?' * len(chunk))})", chunk))
+        return known
+
+    def unreferenced(self, digests):
+        """digests 中已没有任何存档(包括回收站中的)引用的 blob, 同时删除它们的大小记录
+
+        调用方随后删除这些 blob 文件, 检查和删除之间需要持有 BlobStore.lock
+        """
+        orphans = []
+        with self._lock, self.conn:
+            for digest in set(digests):
+                if not self.conn.execute("SELECT 1 FROM blob_refs WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                    orphans.append(digest)
+            self.conn.executemany("DELETE FROM blobs WHERE digest = ?", [(digest,) for digest in orphans])
+        return orphans
+
+    def blob_stats(self):
+        """去重存储的统计: 引用数, blob数, 逻辑字节, 实际字节, 去重率"""
+        with self._lock:
+            refs, logical = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM blob_refs r "
+                "LEFT JOIN blobs b ON b.digest = r.digest").fetchone()
+            blobs, physical = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs "
+                "WHERE digest IN (SELECT digest FROM blob_refs)").fetchone()
+        return {
+            "refs": refs,
+            "blobs": blobs,
+            "logical_bytes": logical,
+            "physical_bytes": physical,
+            "dedup_ratio": logical / physical if physical else 1.0
+        }
+
+    def rebuild_blob_refs(self, size_of):
+        """从全部存档信息(包括回收站中的)重建 blob 引用, 返回被引用的哈希集合
+
+        size_of(digest) 返回还没有记录大小的 blob 的大小, 文件不存在时返回None
+        """
+        with self._lock:
+            refs = [(name, digest) for name, data in self.conn.execute("SELECT name, data FROM saves")
+                    for digest in record_digests(json.loads(data))]
+            referenced = set(digest for _, digest in refs)
+            missing = referenced - self.known_blobs(referenced)
+            sizes = [(digest, size) for digest, size in ((d, size_of(d)) for d in missing) if size is not None]
+            with self.conn:
+                self.conn.execute("DELETE FROM blob_refs")
+                self.conn.executemany("INSERT INTO blob_refs (name, digest) VALUES (?, ?)", refs)
+                self.conn.execute("DELETE FROM blobs WHERE digest NOT IN (SELECT digest FROM blob_refs)")
+                self.conn.executemany("INSERT OR REPLACE INTO blobs (digest, size) VALUES (?, ?)", sizes)
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('blob_refs_built', 'true')")
+        return referenced
+
+    def names(self):
+        """按名称排序的存档名称列表"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT name FROM saves WHERE deleted_at IS NULL ORDER BY name")]
+
+    def names_after(self, after, limit):
+        """名称排在 after 之后的最多 limit 个存档名称, 用于分批遍历全部存档"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT name FROM saves WHERE deleted_at IS NULL AND name > ? ORDER BY name LIMIT ?",
+                (after or "", limit))]
+
+    def entries(self):
+        """全部存档的 (名称, 时间)"""
+        with self._lock:
+            return self.conn.execute("SELECT name, timestamp FROM saves WHERE deleted_at IS NULL").fetchall()
+
+    def records(self):
+        """按名称排序的全部存档信息"""
+        with self._lock:
+            return [json.loads(row[0]) for row in
+                    self.conn.execute("SELECT data FROM saves WHERE deleted_at IS NULL ORDER BY name")]
+
+    def find(self, seed=None, ante=None):
+        """按种子和底注查找存档, 按时间排序"""
+        conditions = ["deleted_at IS NULL"]
+        params = []
+        if seed is not None:
+            conditions.append("seed = ?")
+            params.append(seed)
+        if ante is not None:
+            conditions.append("ante = ?")
+            params.append(ante)
+        with self._lock:
+            return [json.loads(row[0]) for row in self.conn.execute(
+                f"SELECT data FROM saves WHERE {' AND '.join(conditions)} ORDER BY timestamp", params)]
+
+    def phashes(self):
+        """有截图哈希的存档 [(名称, 有符号 64 位哈希)]"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT name, phash FROM saves WHERE phash IS NOT NULL AND deleted_at IS NULL").fetchall()
+
+    def seeds(self):
+        """按种子分组的存档数量 {种子: 数量}"""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT seed, COUNT(*) FROM saves WHERE seed IS NOT NULL AND deleted_at IS NULL GROUP BY seed"))
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM saves WHERE deleted_at IS NULL").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,380 @@
+"""存档管理命令行工具, 不需要图形界面
+
+    python save_cli.py list [--seed SEED] [--json]
+    python save_cli.py save NAME [--screenshot IMAGE | --capture] [--auto] [--profile P]
+    python save_cli.py restore NAME [--profile P]
+    python save_cli.py profiles
+    python save_cli.py undo-restore
+    python save_cli.py delete NAME [NAME ...]
+    python save_cli.py trash
+    python save_cli.py undelete NAME [NAME ...]
+    python save_cli.py purge-trash [--all | NAME ...]
+    python save_cli.py prune [--dry-run]
+    python save_cli.py verify [NAME ...]
+    python save_cli.py scrub [--limit N | --all] [--no-throttle]
+    python save_cli.py export DEST [NAME ...]
+    python save_cli.py export-archive FILE [NAME ...]
+    python save_cli.py similar NAME [--limit N]
+    python save_cli.py diff OLD NEW [--json]
+    python save_cli.py timeline (--run RUN | NAME NAME [NAME ...]) [--changes]
+    python save_cli.py hash-screenshots
+    python save_cli.py contact-sheets [--rebuild]
+    python save_cli.py import-archive FILE [--overwrite]
+
+批量操作(删除、清理)在一个索引事务中完成
+"""
+import os
+import sys
+import json
+import argparse
+
+from save_diff import format_change, summarize
+from save_store import SaveStore, SaveStoreError
+from scrubber import CURSOR_KEY, IntegrityScrubber
+from tracing import tracer
+from trash import purge_before
+
+
+def cmd_list(store, args):
+    records = store.catalog.find(seed=args.seed) if args.seed else store.records()
+    if args.json:
+        json.dump(records, sys.stdout, ensure_ascii=False, indent=4)
+        print()
+        return 0
+    for record in records:
+        meta = record.get("meta", {})
+        kind = "自动" if record.get("auto") else "手动"
+        print(f"{record['name']}\t{record.get('timestamp') or ''}\t{kind}\t"
+              f"{meta.get('seed', '')}\t{meta.get('ante', '')}")
+    print(f"共 {len(records)} 个存档")
+    return 0
+
+
+def cmd_save(store, args):
+    screenshot = None
+    if args.screenshot:
+        from PIL import Image
+        with Image.open(args.screenshot) as img:
+            img.load()
+            screenshot = img
+    elif args.capture:
+        from capture import CaptureError, create_backend
+        title = store.config.get('window_title', "Balatro")
+        try:
+            backend = create_backend(store.config.get('capture_backend', "auto"))
+        except CaptureError as e:
+            raise SaveStoreError(str(e))
+        try:
+            hwnd = backend.find_window(title)
+            if not hwnd:
+                raise SaveStoreError(f"找不到窗口: {title}")
+            screenshot = backend.capture(hwnd, alpha=store.screenshot_policy.keeps_alpha)
+        except CaptureError as e:
+            raise SaveStoreError(str(e))
+        finally:
+            backend.close()
+    record = store.save(args.name, screenshot, auto=args.auto, profile=args.profile)
+    companions = ", ".join(sorted(record.get("companions", {})))
+    print(f"已保存: {record['name']} (档案 {record['profile']}{', ' + companions if companions else ''})")
+    return 0
+
+
+def cmd_restore(store, args):
+    save_data, used = store.restore(args.name, args.profile)
+    print(f"已恢复: {args.name} 到档案 {args.profile or save_data.get('profile') or store.primary_profile()} ({used})")
+    return 0
+
+
+def cmd_profiles(store, args):
+    for profile in store.profiles():
+        path = store.profile_path(profile)
+        state = "" if os.path.exists(path) else "\t(不存在)"
+        print(f"{profile}\t{path}{state}")
+    return 0
+
+
+def cmd_undo_restore(store, args):
+    entry = store.undo_restore()
+    print(f"已撤销读取 {entry['restored']}, 游戏存档回到 {entry['timestamp']} 的状态")
+    return 0
+
+
+def cmd_delete(store, args):
+    removed = store.delete(args.names)
+    print(f"已将 {len(removed)} 个存档移入回收站")
+    return 0
+
+
+def cmd_trash(store, args):
+    records = store.trashed()
+    for record in records:
+        print(f"{record['name']}\t删除于 {record['deleted_at']}")
+    print(f"回收站中共 {len(records)} 个存档")
+    return 0
+
+
+def cmd_undelete(store, args):
+    restored = store.undelete(args.names)
+    print(f"已恢复 {len(restored)} 个存档")
+    return 0
+
+
+def cmd_purge_trash(store, args):
+    if args.names:
+        names = args.names
+    else:
+        before = None if args.all else purge_before(store.trash_retention_hours)
+        names = [r["name"] for r in store.trashed(before)]
+    removed = store.purge(names)
+    print(f"已彻底删除 {len(removed)} 个存档")
+    return 0
+
+
+def cmd_prune(store, args):
+    removed = store.prune(dry_run=args.dry_run)
+    for record in removed:
+        print(record["name"])
+    print(f"{'将删除' if args.dry_run else '已删除'} {len(removed)} 个存档")
+    return 0
+
+
+def cmd_verify(store, args):
+    problems = store.verify(args.names or None)
+    for name, problem in problems:
+        print(f"{name}\t{problem}")
+    print(f"发现 {len(problems)} 个问题")
+    return 1 if problems else 0
+
+
+def cmd_scrub(store, args):
+    policy = store.scrub_policy
+    if args.no_throttle:
+        policy.io_mb_per_s = policy.cpu_percent = 0
+    scrubber = IntegrityScrubber(store.catalog, store.scrub, policy)
+    limit = args.limit
+    if args.all:
+        # 从头校验一遍
+        store.catalog.set_meta(CURSOR_KEY, None)
+        limit = store.catalog.count()
+    checked, damaged = scrubber.run(limit)
+    for name, problems, _ in damaged:
+        print(f"{name}\t{'; '.join(problems)}")
+    quarantined = sum(count for _, _, count in damaged)
+    print(f"已校验 {checked} 个存档, {len(damaged)} 个损坏" +
+          (f", {quarantined} 个文件已移到 quarantine" if quarantined else ""))
+    return 1 if damaged else 0
+
+
+def cmd_repair_refs(store, args):
+    removed = store.rebuild_blob_refs()
+    stats = store.catalog.blob_stats()
+    print(f"已重建引用: {stats['refs']} 个引用, {stats['blobs']} 个备份, 删除 {removed} 个不再被引用的备份")
+    return 0
+
+
+def cmd_export(store, args):
+    exported = store.export(args.names or store.catalog.names(), args.dest)
+    print(f"已导出 {len(exported)} 个存档到 {args.dest}")
+    return 0
+
+
+def cmd_export_archive(store, args):
+    exported = store.export_archive(args.names or store.catalog.names(), args.file, args.workers)
+    print(f"已导出 {len(exported)} 个存档到 {args.file}")
+    return 0
+
+
+def cmd_import_archive(store, args):
+    imported, skipped = store.import_archive(args.file, overwrite=args.overwrite)
+    print(f"已导入 {len(imported)} 个存档" + (f", 跳过 {len(skipped)} 个" if skipped else ""))
+    return 0
+
+
+def cmd_similar(store, args):
+    results = store.similar(args.name, args.limit, args.max_distance)
+    for name, distance in results:
+        print(f"{name}\t{distance}")
+    print(f"找到 {len(results)} 个相似的存档")
+    return 0
+
+
+def cmd_diff(store, args):
+    save_a, save_b, changes = next(store.diff_pairs([(args.old, args.new)]))
+    if args.json:
+        json.dump([{"path": list(path), "old": old, "new": new} for path, old, new in changes],
+                  sys.stdout, ensure_ascii=False, indent=4)
+        print()
+        return 0
+    for line in summarize(save_a.get("meta", {}), save_b.get("meta", {}), changes):
+        print(line)
+    for change in changes:
+        print(f"  {format_change(change)}")
+    print(f"共 {len(changes)} 处变化")
+    return 0
+
+
+def cmd_timeline(store, args):
+    names = args.names
+    if args.run:
+        # 一局的存档按时间排序
+        records = [r for r in store.records() if r.get("run") == args.run]
+        names = [r["name"] for r in sorted(records, key=lambda r: r.get("timestamp") or "")]
+    if len(names) < 2:
+        print("错误: 至少需要两个存档", file=sys.stderr)
+        return 1
+    for save_a, save_b, changes in store.timeline(names):
+        print(f"{save_a['name']} -> {save_b['name']}: {len(changes)} 处变化")
+        for line in summarize(save_a.get("meta", {}), save_b.get("meta", {}), changes):
+            print(f"  {line}")
+        if args.changes:
+            for change in changes:
+                print(f"    {format_change(change)}")
+    return 0
+
+
+def cmd_hash_screenshots(store, args):
+    count = store.hash_screenshots()
+    print(f"已为 {count} 个存档计算截图哈希")
+    return 0
+
+
+def cmd_contact_sheets(store, args):
+    sheets = store.contact_sheets
+    if args.rebuild:
+        added = sheets.rebuild()
+        rewritten = None
+    else:
+        added, rewritten = sheets.update()
+    total = store.catalog.atlas_sheets()
+    print(f"已加入 {added} 个缩略图" + (f", 重写 {rewritten} 张联系表" if rewritten is not None else "") +
+          f", 共 {len(total)} 张联系表")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Balatro 存档管理命令行工具")
+    parser.add_argument("--base-dir", default=None, help="存档和截图所在目录, 默认为程序所在目录")
+    parser.add_argument("--config", default=None, help="配置文件路径, 默认为存档目录下的 config.json")
+    parser.add_argument("--timing", metavar="FILE", default=None,
+                        help="记录各步骤耗时并导出到文件(.json 或 .csv)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("list", help="列出存档")
+    p.add_argument("--seed", help="只列出指定种子的存档")
+    p.add_argument("--json", action="store_true", help="输出完整的存档信息(JSON)")
+    p.set_defaults(func=cmd_list)
+
+    p = commands.add_parser("save", help="保存当前游戏存档")
+    p.add_argument("name")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--screenshot", help="使用图片文件作为截图")
+    group.add_argument("--capture", action="store_true", help="截取游戏窗口(仅 Windows)")
+    p.add_argument("--auto", action="store_true", help="作为自动存档保存")
+    p.add_argument("--profile", default=None, help="保存指定档案(如 2), 默认为游戏存档路径所在的档案")
+    p.set_defaults(func=cmd_save)
+
+    p = commands.add_parser("restore", help="恢复存档到游戏")
+    p.add_argument("name")
+    p.add_argument("--profile", default=None, help="恢复到指定档案, 默认为存档所属的档案")
+    p.set_defaults(func=cmd_restore)
+
+    p = commands.add_parser("profiles", help="列出备份的档案和游戏存档路径")
+    p.set_defaults(func=cmd_profiles)
+
+    p = commands.add_parser("undo-restore", help="撤销最近一次恢复")
+    p.set_defaults(func=cmd_undo_restore)
+
+    p = commands.add_parser("delete", help="把存档移入回收站")
+    p.add_argument("names", nargs="+")
+    p.set_defaults(func=cmd_delete)
+
+    p = commands.add_parser("trash", help="列出回收站中的存档")
+    p.set_defaults(func=cmd_trash)
+
+    p = commands.add_parser("undelete", help="从回收站恢复存档")
+    p.add_argument("names", nargs="+")
+    p.set_defaults(func=cmd_undelete)
+
+    p = commands.add_parser("purge-trash", help="彻底删除回收站中超过保留时间的存档")
+    p.add_argument("--all", action="store_true", help="清空整个回收站")
+    p.add_argument("names", nargs="*", help="只彻底删除指定的存档")
+    p.set_defaults(func=cmd_purge_trash)
+
+    p = commands.add_parser("prune", help="按配置的保留策略清理自动存档")
+    p.add_argument("--dry-run", action="store_true", help="只列出将被删除的存档")
+    p.set_defaults(func=cmd_prune)
+
+    p = commands.add_parser("verify", help="校验存档文件, 有问题时返回1")
+    p.add_argument("names", nargs="*")
+    p.set_defaults(func=cmd_verify)
+
+    p = commands.add_parser("scrub", help="从上次的位置继续校验存档, 标记并隔离损坏的存档, 有损坏时返回1")
+    p.add_argument("--limit", type=int, default=None, help="本次校验的存档数, 默认为配置中的 scrub_batch")
+    p.add_argument("--all", action="store_true", help="校验全部存档")
+    p.add_argument("--no-throttle", action="store_true", help="不限制读取速度和CPU占用")
+    p.set_defaults(func=cmd_scrub)
+
+    p = commands.add_parser("repair-refs", help="从存档索引重建去重备份的引用, 删除不再被引用的备份")
+    p.set_defaults(func=cmd_repair_refs)
+
+    p = commands.add_parser("export", help="导出存档到目录, 不指定名称时导出全部")
+    p.add_argument("dest")
+    p.add_argument("names", nargs="*")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("similar", help="查找截图相似的存档, 输出名称和差异(汉明距离)")
+    p.add_argument("name")
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--max-distance", type=int, default=None, help="最大差异, 默认10")
+    p.set_defaults(func=cmd_similar)
+
+    p = commands.add_parser("diff", help="比较两个存档的游戏数据, 列出变化的字段")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出变化列表")
+    p.set_defaults(func=cmd_diff)
+
+    p = commands.add_parser("timeline", help="依次比较相邻的存档, 输出每一步的变化摘要")
+    p.add_argument("names", nargs="*", help="按顺序比较的存档")
+    p.add_argument("--run", help="比较一局的全部自动存档(按时间排序)")
+    p.add_argument("--changes", action="store_true", help="同时列出变化的字段")
+    p.set_defaults(func=cmd_timeline)
+
+    p = commands.add_parser("hash-screenshots", help="为旧存档补算截图哈希")
+    p.set_defaults(func=cmd_hash_screenshots)
+
+    p = commands.add_parser("contact-sheets", help="更新画廊使用的缩略图联系表")
+    p.add_argument("--rebuild", action="store_true", help="删除后全部重新生成")
+    p.set_defaults(func=cmd_contact_sheets)
+
+    p = commands.add_parser("export-archive", help="把存档导出为一个存档包, 不指定名称时导出全部")
+    p.add_argument("file")
+    p.add_argument("names", nargs="*")
+    p.add_argument("--workers", type=int, default=None, help="压缩线程数, 默认为CPU核数")
+    p.set_defaults(func=cmd_export_archive)
+
+    p = commands.add_parser("import-archive", help="导入存档包")
+    p.add_argument("file")
+    p.add_argument("--overwrite", action="store_true", help="覆盖同名存档(默认跳过)")
+    p.set_defaults(func=cmd_import_archive)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = SaveStore(args.base_dir, args.config)
+    if args.timing:
+        tracer.enabled = True
+    try:
+        return args.func(store, args)
+    except (SaveStoreError, OSError) as e:
+        print(f"错误: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        store.close()
+        if args.timing:
+            tracer.export(args.timing)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import json
+import zlib
+import hashlib
+from collections import Counter
+
+from jkr_decoder import LuaTableReader
+
+# 小于这个字节数的子表不单独记录, 比较时直接比较原文
+MIN_INDEXED_BYTES = 64
+# 哈希树格式改变时增加, 旧格式的哈希树会被重新建立
+INDEX_VERSION = 1
+# 摘要中逐项列出的对局信息
+SUMMARY_FIELDS = (("seed", "种子"), ("stake", "赌注"), ("deck", "卡组"), ("ante", "底注"),
+                  ("round", "回合"), ("money", "金钱"))
+# 按区域统计变化时使用的路径深度(如 cardAreas.deck)
+AREA_DEPTH = 2
+
+
+def _key_bytes(key):
+    # 数字键和字符串键不会混淆
+    return (b"s" + key.encode('utf-8')) if isinstance(key, str) else (b"n" + repr(key).encode('ascii'))
+
+
+def _key_order(key):
+    # 数字键按数值排序, 字符串键排在后面
+    return (1, 0, key) if isinstance(key, str) else (0, key, "")
+
+
+def _root_start(raw):
+    return len(b"return ") if raw.startswith(b"return ") else 0
+
+
+def build_index(raw):
+    """为解压后的存档建立子表哈希树, 返回根节点
+
+    节点为 (哈希, 开始位置, 结束位置, {键: 子节点}, 字段数). 哈希由排序后的键和值
+    (子表为子表的哈希)计算, 与序列化时键的顺序无关, 内容相同的子表哈希相同.
+    只记录不小于 MIN_INDEXED_BYTES 的子表, 根节点总是记录
+    """
+    reader = LuaTableReader(raw)
+    reader.pos = _root_start(raw)
+    return _index_table(reader)
+
+
+def _index_table(reader):
+    raw = reader.raw
+    if raw[reader.pos:reader.pos + 1] != b'{':
+        reader._error("应为表")
+    start = reader.pos
+    reader.pos += 1
+    entries = []
+    children = {}
+    while True:
+        key = reader.read_key()
+        if key is None:
+            break
+        if raw[reader.pos:reader.pos + 1] == b'{':
+            child = _index_table(reader)
+            entries.append((_key_bytes(key), child[0]))
+            if child[2] - child[1] >= MIN_INDEXED_BYTES:
+                children[key] = child
+        else:
+            value_start = reader.pos
+            reader.skip_scalar()
+            entries.append((_key_bytes(key), raw[value_start:reader.pos]))
+        reader.end_value()
+    entries.sort()
+    digest = hashlib.blake2b(digest_size=8)
+    for key, value in entries:
+        digest.update(b"%d:%s%d:%s" % (len(key), key, len(value), value))
+    return digest.digest(), start, reader.pos, children, len(entries)
+
+
+def dump_index(node):
+    """序列化哈希树(压缩的 JSON), 用于保存到索引库"""
+    def encode(node):
+        return [node[0].hex(), node[1], node[2], [[key, encode(child)] for key, child in node[3].items()], node[4]]
+    return zlib.compress(json.dumps([INDEX_VERSION, encode(node)], separators=(",", ":")).encode('ascii'))
+
+
+def load_index(data):
+    """读取 dump_index 的结果, 格式版本不同时返回None"""
+    def decode(item):
+        return bytes.fromhex(item[0]), item[1], item[2], dict((key, decode(child)) for key, child in item[3]), item[4]
+    item = json.loads(zlib.decompress(data))
+    return decode(item[1]) if len(item) == 2 and item[0] == INDEX_VERSION else None
+
+
+def _entries(raw, start, node):
+    """读取表的一层: {键: 标量值 或 (子表开始, 结束)}, 子表不解析"""
+    reader = LuaTableReader(raw)
+    reader.pos = start + 1
+    children = node[3] if node else {}
+    entries = {}
+    while True:
+        key = reader.read_key()
+        if key is None:
+            return entries
+        if raw[reader.pos:reader.pos + 1] == b'{':
+            child_start = reader.pos
+            child = children.get(key)
+            if child and child[1] == child_start:
+                # 哈希树中记录了子表的结束位置, 不需要扫描
+                reader.pos = child[2]
+            else:
+                reader.skip_table()
+            entries[key] = (child_start, reader.pos)
+        else:
+            entries[key] = reader.read_scalar()
+        reader.end_value()
+
+
+def _value(raw, value):
+    """标量原样返回, 子表解析为字典"""
+    if isinstance(value, tuple):
+        reader = LuaTableReader(raw)
+        reader.pos = value[0]
+        return reader.read_table()
+    return value
+
+
+def _diff_table(raw_a, span_a, node_a, raw_b, span_b, node_b, path, changes):
+    if node_a and node_b and node_a[0] == node_b[0]:
+        return
+    if raw_a[span_a[0]:span_a[1]] == raw_b[span_b[0]:span_b[1]]:
+        return
+    if node_a and node_b and len(node_a[3]) == node_a[4] and len(node_b[3]) == node_b[4]:
+        # 全部字段都是记录在哈希树中的子表(如牌的列表), 不需要读取原文
+        entries_a = dict((key, (child[1], child[2])) for key, child in node_a[3].items())
+        entries_b = dict((key, (child[1], child[2])) for key, child in node_b[3].items())
+    else:
+        entries_a = _entries(raw_a, span_a[0], node_a)
+        entries_b = _entries(raw_b, span_b[0], node_b)
+    for key in sorted(entries_a.keys() | entries_b.keys(), key=_key_order):
+        old = entries_a.get(key)
+        new = entries_b.get(key)
+        if isinstance(old, tuple) and isinstance(new, tuple):
+            _diff_table(raw_a, old, node_a[3].get(key) if node_a else None,
+                        raw_b, new, node_b[3].get(key) if node_b else None, path + (key,), changes)
+        elif old != new or type(old) is not type(new):
+            changes.append((path + (key,), _value(raw_a, old), _value(raw_b, new)))
+
+
+def diff_tables(raw_a, raw_b, index_a=None, index_b=None):
+    """比较两个解压后的存档, 返回按路径排序的 [(路径, 旧值, 新值)]
+
+    路径为键的元组, 新增的字段旧值为None, 删除的字段新值为None, 子表的值为字典.
+    两边都有哈希树时哈希相同的子表直接跳过, 否则比较原文; 只有不同的子表才逐层解析
+    """
+    span_a = (index_a[1], index_a[2]) if index_a else (_root_start(raw_a), len(raw_a))
+    span_b = (index_b[1], index_b[2]) if index_b else (_root_start(raw_b), len(raw_b))
+    changes = []
+    _diff_table(raw_a, span_a, index_a, raw_b, span_b, index_b, (), changes)
+    return changes
+
+
+def format_path(path):
+    return ".".join(str(key) for key in path)
+
+
+def format_value(value, limit=60):
+    if value is None:
+        return "(无)"
+    if isinstance(value, dict):
+        return f"{{{len(value)} 项}}"
+    text = json.dumps(value, ensure_ascii=False) if isinstance(value, str) else str(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def format_change(change):
+    path, old, new = change
+    return f"{format_path(path)}: {format_value(old)} -> {format_value(new)}"
+
+
+def summarize(meta_a, meta_b, changes):
+    """变化摘要: 对局信息(底注、金钱等)和小丑牌的变化, 以及各区域变化的字段数, 返回文本行"""
+    lines = []
+    for field, label in SUMMARY_FIELDS:
+        old, new = meta_a.get(field), meta_b.get(field)
+        if old != new:
+            lines.append(f"{label}: {format_value(old)} -> {format_value(new)}")
+    jokers_a, jokers_b = Counter(meta_a.get("jokers", [])), Counter(meta_b.get("jokers", []))
+    added = sorted((jokers_b - jokers_a).elements())
+    removed = sorted((jokers_a - jokers_b).elements())
+    if added or removed:
+        lines.append("小丑牌: " + " ".join([f"+{j}" for j in added] + [f"-{j}" for j in removed]))
+    areas = Counter(format_path(path[:AREA_DEPTH]) for path, _, _ in changes)
+    if areas:
+        lines.append("变化的字段: " + ", ".join(f"{area} {count}" for area, count in sorted(areas.items())))
+    return lines
@@ -1,193 +1,56 @@
-import sys
-import json
 import os
+import time
+import threading
 from datetime import datetime
-from PIL import Image, ImageTk
-from ctypes import windll, byref, create_unicode_buffer, create_string_buffer, Structure, sizeof, WINFUNCTYPE
-from ctypes.wintypes import (BOOL, HWND, RECT, DWORD, LPARAM, WCHAR, UINT, POINT, WORD, LONG, ATOM)
 import tkinter as tk
-from tkinter import ttk, messagebox
-
-HWND_TOPMOST = -1
-HWND_NOTOPMOST = -2
-SWP_SHOWWINDOW = 0x0040
-DIB_RGB_COLORS = 0
-BI_RGB = 0
-
-class BITMAPINFOHEADER(Structure):
-    _fields_ = [
-        ("biSize", DWORD),
-        ("biWidth", LONG),
-        ("biHeight", LONG),
-        ("biPlanes", WORD),
-        ("biBitCount", WORD),
-        ("biCompression", DWORD),
-        ("biSizeImage", DWORD),
-        ("biXPelsPerMeter", LONG),
-        ("biYPelsPerMeter", LONG),
-        ("biClrUsed", DWORD),
-        ("biClrImportant", DWORD)
-    ]
-
-class BITMAPINFO(Structure):
-    _fields_ = [
-        ("bmiHeader", BITMAPINFOHEADER),
-        ("bmiColors", DWORD * 3)
-    ]
-
-class WINDOWPLACEMENT(Structure):
-    _fields_ = [
-        ("length", UINT),
-        ("flags", UINT),
-        ("showCmd", UINT),
-        ("ptMinPosition", POINT),
-        ("ptMaxPosition", POINT),
-        ("rcNormalPosition", RECT)
-    ]
-
-class WINDOWINFO(Structure):
-    _fields_ = [
-        ("cbSize", DWORD),
-        ("rcWindow", RECT),
-        ("rcClient", RECT),
-        ("dwStyle", DWORD),
-        ("dwExStyle", DWORD),
-        ("dwWindowStatus", DWORD),
-        ("cxWindowBorders", WORD),
-        ("cyWindowBorders", WORD),
-        ("atomWindowType", ATOM),
-        ("wCreatorVersion", WORD)
-    ]
-
-def window_screenshot(hwnd):
-    """使用 ctypes 实现的窗口截图功能"""
-    try:
-        # 获取窗口位置和大小
-        rect = RECT()
-        windll.user32.GetWindowRect(hwnd, byref(rect))
-        
-        # 计算尺寸增加
-        width = rect.right - rect.left
-        height = rect.bottom - rect.top
-        width_increase = int(width * 0.25)
-        height_increase = int(height * 0.25)
-        
-        # 保存当前窗口位置
-        placement = WINDOWPLACEMENT()
-        placement.length = sizeof(WINDOWPLACEMENT)
-        windll.user32.GetWindowPlacement(hwnd, byref(placement))
-        
-        # 设置窗口位置
-        windll.user32.SetWindowPos(
-            hwnd, 
-            HWND_TOPMOST,
-            rect.left, rect.top,
-            width + width_increase,
-            height + height_increase,
-            SWP_SHOWWINDOW
-        )
-        
-        #time.sleep(0.2)
-        
-        # 创建DC和位图
-        hwnd_dc = windll.user32.GetWindowDC(hwnd)
-        mf_dc = windll.gdi32.CreateCompatibleDC(hwnd_dc)
-        bitmap = windll.gdi32.CreateCompatibleBitmap(
-            hwnd_dc,
-            width + width_increase,
-            height + height_increase
-        )
-        windll.gdi32.SelectObject(mf_dc, bitmap)
-        
-        # 截图
-        result = windll.user32.PrintWindow(hwnd, mf_dc, 3)
-        if result == 0:
-            raise Exception("PrintWindow failed")
-            
-        # 转换为PIL图像
-        bmp_info = BITMAPINFO()
-        bmp_info.bmiHeader.biSize = sizeof(BITMAPINFOHEADER)
-        bmp_info.bmiHeader.biWidth = width + width_increase
-        bmp_info.bmiHeader.biHeight = -(height + height_increase)
-        bmp_info.bmiHeader.biPlanes = 1
-        bmp_info.bmiHeader.biBitCount = 32
-        bmp_info.bmiHeader.biCompression = BI_RGB
-        
-        buffer_size = (width + width_increase) * (height + height_increase) * 4
-        buffer = create_string_buffer(buffer_size)
-        
-        windll.gdi32.GetDIBits(
-            mf_dc, bitmap, 0,
-            height + height_increase,
-            buffer,
-            byref(bmp_info),
-            DIB_RGB_COLORS
-        )
-        
-        # 创建PIL图像
-        img = Image.frombuffer(
-            'RGBA',
-            (width + width_increase, height + height_increase),
-            buffer,
-            'raw',
-            'BGRA',
-            0,
-            1
-        )
-        
-        # 清理资源
-        windll.gdi32.DeleteObject(bitmap)
-        windll.gdi32.DeleteDC(mf_dc)
-        windll.user32.ReleaseDC(hwnd, hwnd_dc)
-        
-        # 恢复窗口位置
-        windll.user32.SetWindowPos(
-            hwnd,
-            HWND_NOTOPMOST,
-            rect.left, rect.top,
-            width, height,
-            SWP_SHOWWINDOW
-        )
-        windll.user32.SetWindowPlacement(hwnd, byref(placement))
-        
-        return img
-        
-    except Exception as e:
-        # 确保恢复窗口状态
-        try:
-            windll.user32.SetWindowPos(
-                hwnd,
-                HWND_NOTOPMOST,
-                rect.left, rect.top,
-                width, height,
-                SWP_SHOWWINDOW
-            )
-            windll.user32.SetWindowPlacement(hwnd, byref(placement))
-        except:
-            pass
-        raise Exception(f"截图失败: {str(e)}")
-
-def list_windows():
-    """使用 ctypes 实现的窗口列表获取功能"""
-    result = []
-    
-    def enum_windows_proc(hwnd, lParam):
-        if windll.user32.IsWindowVisible(hwnd):
-            length = windll.user32.GetWindowTextLengthW(hwnd)
-            if length:
-                buff = create_unicode_buffer(length + 1)
-                windll.user32.GetWindowTextW(hwnd, buff, length + 1)
-                result.append(buff.value)
-        return True
-    
-    WNDENUMPROC = WINFUNCTYPE(BOOL, HWND, LPARAM)
-    enum_proc = WNDENUMPROC(enum_windows_proc)
-    windll.user32.EnumWindows(enum_proc, 0)
-    
-    return sorted(result)
+from tkinter import ttk, messagebox, filedialog
+
+# PIL、截图和文件监视模块在第一次用到时才导入, 加快启动
+from contact_sheets import TILE_SIZE
+from job_scheduler import OVERLAP_COALESCE, PRIORITY_AUTO_SAVE, JobScheduler
+from retention import RetentionPolicy, RetentionWorker
+from save_archive import ARCHIVE_SUFFIX
+from save_diff import format_change, summarize
+from save_pipeline import SaveJob, SavePipeline
+from save_store import SaveStore, SaveStoreError, TIMESTAMP_FORMAT
+from scrubber import IntegrityScrubber
+from preview_cache import PREFETCH_NEIGHBOURS, PREVIEW_CACHE_MB, PreviewCache, PreviewLoader
+from trash import TrashPurger
+from tracing import tracer
+from virtual_list import FilterableSaveList, VirtualListView
+from screenshot_codec import FORMATS as SCREENSHOT_FORMATS, ScreenshotPolicy
+from thumbnails import PREVIEW_SIZE, get_thumbnail
+
+# 启动时每批加入列表的存档数量
+LIST_CHUNK = 2000
+# 耗时统计窗口的刷新间隔(毫秒)
+TIMING_REFRESH_INTERVAL = 1000
+# 后台任务的间隔(秒)和随机错开的比例
+TRASH_CHECK_INTERVAL = 60 * 60
+RETENTION_INTERVAL = 30 * 60
+THUMBNAIL_BACKFILL_INTERVAL = 60
+CONTACT_SHEET_INTERVAL = 5 * 60
+JOB_JITTER = 0.1
+# 画廊每页的列数和行数, 每行缩略图下方显示名称的高度
+GALLERY_COLUMNS = 5
+GALLERY_ROWS = 3
+GALLERY_LABEL_HEIGHT = 18
+# 解码后的联系表缓存(MB), 一张联系表约 5.3 MB
+GALLERY_CACHE_MB = 48
+# 定时自动存档截图和写入的最长时间(秒), 超过后下一次到期时不再因为它还没完成而跳过
+AUTO_SAVE_TIMEOUT = 5 * 60
+
+def format_metadata(meta):
+    """将对局信息格式化为一行文字"""
+    labels = (("seed", "种子"), ("deck", "卡组"), ("stake", "赌注"), ("ante", "底注"),
+              ("round", "回合"), ("money", "金钱"))
+    parts = [f"{label}: {meta[key]}" for key, label in labels if key in meta]
+    if meta.get("jokers"):
+        parts.append(f"小丑: {len(meta['jokers'])}")
+    return "  ".join(parts)
 
 class SaveManager:
-    def __init__(self):
+    def __init__(self, base_dir=None):
         self.root = tk.Tk()
         self.root.title("存档管理器")
         
@@ -206,45 +69,72 @@ class SaveManager:
         # 设置窗口大小和位置
         self.root.geometry(f"{window_width}x{window_height}+{int(x)}+{int(y)}")
         self.root.resizable(False, False)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
-        # 获取当前目录
-        if getattr(sys, 'frozen', False):
-            # 如果是通过 PyInstaller 打包后的 .exe 文件
-            current_directory = os.path.dirname(sys.executable)
-        else:
-            # 如果是源代码环境下
-            current_directory = os.path.dirname(__file__)
-        # 固定存档记录在程序所在目录下
-        self.saves_dir = os.path.join(current_directory, "saves")
-        self.screenshots_dir = os.path.join(current_directory, "screenshots")
-        
-        # 默认游戏存档路径
-        self.game_save_path = os.path.expandvars(r"%APPDATA%\Balatro\1\save.jkr")
+        # 存档存储核心, 存档和截图固定在程序所在目录下
+        self.store = SaveStore(base_dir)
+        self.catalog = self.store.catalog
         
         # 自动存档相关属性
-        self.auto_save_enabled = False
-        self.auto_save_interval = 5  # 默认5分钟
-        self.auto_save_job = None
+        self.change_monitor = None
+        # 正在进行的定时自动存档开始的时间(time.monotonic), 写入完成后清空
+        self.auto_save_started = None
+        # 定时自动存档时其他档案上一次检查到的游戏存档哈希
+        self.profile_digests = {}
+        self.capture_backend = None
+        self.auto_save_run = datetime.now().strftime("run_%Y%m%d_%H%M%S")
         
-        # 加载配置
+        # 加载界面配置
         self.load_config()
         
-        # 创建目录
-        os.makedirs(self.saves_dir, exist_ok=True)
-        os.makedirs(self.screenshots_dir, exist_ok=True)
+        # 后台存档流水线, 索引变更也通过它回到主线程更新列表
+        self.pipeline = SavePipeline(self.root, self.encode_save, self.commit_save)
+        self.catalog.add_listener(
+            lambda op, names: self.pipeline.post(self.on_catalog_change, op, names))
+        # 自动存档和清理等周期任务统一由调度器运行, 用户保存和读取存档时后台任务暂停
+        self.scheduler = JobScheduler()
+        self.retention_worker = RetentionWorker(
+            self.catalog.records, self.store.delete,
+            lambda removed, record_bytes: self.pipeline.post(self.on_retention_done, removed, record_bytes),
+            wait_idle=self.scheduler.wait_foreground, purge=self.store.purge)
+        self.trash_purger = TrashPurger(
+            self.store.trashed, self.store.purge,
+            lambda removed, record_bytes: self.pipeline.post(self.on_purge_done, removed, record_bytes),
+            wait_idle=self.scheduler.wait_foreground)
+        # 后台逐个校验存档的校验和, 按读取和 CPU 预算暂停
+        self.scrubber = IntegrityScrubber(
+            self.catalog, self.store.scrub, self.store.scrub_policy,
+            lambda checked, damaged: self.pipeline.post(self.on_scrub_done, checked, damaged),
+            wait_idle=self.scheduler.wait_foreground, sleep=self.scheduler.sleep)
+        # 解码后的预览图缓存, 预览在后台线程解码并预取相邻的存档
+        self.preview_loader = PreviewLoader(
+            self.load_preview,
+            lambda name, image: self.pipeline.post(self.on_preview_loaded, name, image),
+            PreviewCache(self.preview_cache_mb * 1024 * 1024))
+        self.preview_name = None
+        self.preview_index = None
+        self.preview_photo = None
+        # 画廊页面在后台从联系表拼接, 解码后的联系表放入缓存; 拼好的页面不缓存,
+        # 预取前后两页只是提前解码它们的联系表
+        self.sheet_cache = PreviewCache(GALLERY_CACHE_MB * 1024 * 1024)
+        self.gallery_loader = PreviewLoader(
+            self.load_gallery_page,
+            lambda names, image: self.pipeline.post(self.on_gallery_page_loaded, names, image),
+            PreviewCache(0), workers=1)
+        self.gallery_dialog = None
+        self.gallery_page = 0
+        self.gallery_names = ()
+        self.gallery_photo = None
         
         # 创建主界面
         self.create_widgets()
         
-        # 加载存档列表
-        self.load_save_list()
-        
-        # 如果启用了自动存档，启动定时任务
-        if self.auto_save_enabled:
-            self.start_auto_save()
-        
         # 添加一个变量来记录上一次的选择集
         self.previous_selections = ()
+        
+        # 窗口先显示出来, 存档列表在主循环中分批加载
+        self.list_loaded = False
+        self.root.after(0, self.load_save_list)
 
     def create_widgets(self):
         # 左侧面板 - 固定宽度
@@ -252,17 +142,30 @@ class SaveManager:
         left_frame.pack(side=tk.LEFT, fill=tk.Y, padx=5, pady=5)
         left_frame.pack_propagate(False)  # 防止frame被子组件压缩
         
-        # 存档列表 - 保留多选功能，但移除右键菜单
-        self.save_listbox = tk.Listbox(left_frame, width=25, selectmode=tk.EXTENDED)
-        self.save_listbox.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
-        self.save_listbox.bind('<<ListboxSelect>>', self.on_select_save)
+        # 存档列表 - 只绘制可见行, 支持多选、前缀过滤和排序切换
+        self.save_list = FilterableSaveList(left_frame)
+        self.save_list.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
+        self.save_list.bind('<<ListboxSelect>>', self.on_select_save)
         
         # 按钮
         ttk.Button(left_frame, text="保存存档", command=self.create_save).pack(fill=tk.X, pady=2)
         ttk.Button(left_frame, text="读取存档", command=self.load_save).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="撤销读取", command=self.undo_load).pack(fill=tk.X, pady=2)
         ttk.Button(left_frame, text="删除存档", command=self.delete_save).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="相似存档", command=self.show_similar).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="画廊", command=self.show_gallery).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="比较存档", command=self.compare_saves).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="回收站", command=self.show_trash).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="导出存档包", command=self.export_archive).pack(fill=tk.X, pady=2)
+        ttk.Button(left_frame, text="导入存档包", command=self.import_archive).pack(fill=tk.X, pady=2)
         ttk.Button(left_frame, text="设置", command=self.show_settings).pack(fill=tk.X, pady=2)
         
+        # 存储统计
+        self.status_var = tk.StringVar()
+        ttk.Label(left_frame, textvariable=self.status_var).pack(fill=tk.X, pady=2)
+        self.retention_var = tk.StringVar()
+        ttk.Label(left_frame, textvariable=self.retention_var).pack(fill=tk.X, pady=2)
+        
         # 右侧预览 - 占据剩余空间
         self.preview_frame = ttk.Frame(self.root)
         self.preview_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -273,58 +176,91 @@ class SaveManager:
         
         self.preview_label = ttk.Label(self.preview_inner_frame)
         self.preview_label.pack()
+        
+        # 对局信息
+        self.info_var = tk.StringVar()
+        ttk.Label(self.preview_inner_frame, textvariable=self.info_var).pack(pady=2)
     
     def load_save_list(self):
-        """加载存档列表"""
-        self.save_listbox.delete(0, tk.END)
-        saves = [f for f in os.listdir(self.saves_dir) if f.endswith('.json')]
-        for save in saves:
-            self.save_listbox.insert(tk.END, save.replace('.json', ''))
+        """分批加载存档列表, 每批之间界面可以重绘和响应操作"""
+        entries = self.catalog.entries()
+        self.save_list.reset([])
+        
+        def load_chunk(start):
+            self.save_list.extend(entries[start:start + LIST_CHUNK])
+            if start + LIST_CHUNK < len(entries):
+                self.root.after(1, load_chunk, start + LIST_CHUNK)
+            else:
+                self.on_list_loaded()
+        
+        load_chunk(0)
     
-    def create_save(self, auto = False):
-        """创建新存档"""
+    def on_list_loaded(self):
+        """列表加载完成后再统计存储、启动自动存档和后台任务"""
+        self.list_loaded = True
+        self.update_storage_status()
+        
+        # 如果启用了自动存档，启动定时任务
+        if self.auto_save_enabled:
+            self.start_auto_save()
+        # 清理在启动时先运行一次, 自动存档后也会触发(合并为一次)
+        self.scheduler.add("retention", self.run_retention_job, RETENTION_INTERVAL, JOB_JITTER,
+                           overlap=OVERLAP_COALESCE, delay=0)
+        self.scheduler.add("trash-purge", lambda: self.trash_purger.run(self.store.trash_retention_hours),
+                           TRASH_CHECK_INTERVAL, JOB_JITTER, delay=0)
+        self.scheduler.add("thumbnail-backfill", self.store.backfill_thumbnails,
+                           THUMBNAIL_BACKFILL_INTERVAL, JOB_JITTER)
+        # 画廊联系表在启动时补上新存档, 之后存档变化时更新(合并为一次)
+        self.scheduler.add("contact-sheets", self.run_contact_sheets_job, CONTACT_SHEET_INTERVAL, JOB_JITTER,
+                           overlap=OVERLAP_COALESCE, delay=0)
+        self.schedule_scrub()
+    
+    def schedule_scrub(self):
+        """按设置添加或删除后台校验任务"""
+        policy = self.store.scrub_policy
+        if policy.enabled:
+            self.scheduler.add("integrity-scrub", self.scrubber.run, max(1, policy.interval_minutes) * 60,
+                               JOB_JITTER)
+        else:
+            self.scheduler.remove("integrity-scrub")
+    
+    def on_catalog_change(self, op, names):
+        """按索引变更增量更新列表, 不重新加载全部存档"""
+        if op == "add":
+            records = [self.catalog.get(name) for name in names]
+            self.save_list.add([(r["name"], r.get("timestamp")) for r in records if r])
+        elif op == "remove":
+            self.save_list.remove(names)
+        if op in ("update", "remove"):
+            # 截图可能已经改变
+            self.preview_loader.cache.discard(names)
+        if op in ("add", "update"):
+            self.scheduler.trigger("contact-sheets")
+        if self.gallery_dialog is not None:
+            self.show_gallery_page()
+    
+    def create_save(self, auto = False, profile=None, on_finished=None):
+        """创建新存档, 自动存档可以指定档案, 写入完成、失败或跳过后调用 on_finished"""
         # 如果是自动保存模式
         if auto:
             save_name = datetime.now().strftime("auto_%Y%m%d_%H%M%S")
-            # 检查游戏存档是否存在
-            if not os.path.exists(self.game_save_path):
-                messagebox.showerror("错误", "找不到游戏存档文件！")
-                return
+            if profile and profile != self.store.primary_profile():
+                # 其他档案的自动存档加上档案名, 避免同一秒的存档重名
+                save_name += f"_p{profile}"
             
-            # 获取目标窗口截图
-            hwnd = windll.user32.FindWindowW(None, self.window_title)
-            if hwnd:
-                try:
-                    # 使用新的截图方法
-                    screenshot = window_screenshot(hwnd)
-                    
-                    screenshot_path = os.path.join(self.screenshots_dir, f"{save_name}.png")
-                    save_path = os.path.join(self.saves_dir, f"{save_name}.json")
-                    game_save_backup = os.path.join(self.saves_dir, f"{save_name}.jkr")
-                    
-                    # 复制游戏存档文件
-                    import shutil
-                    shutil.copy2(self.game_save_path, game_save_backup)
-                    
-                    # 保存截图和存档信息
-                    screenshot.save(screenshot_path)
-                    save_data = {
-                        "name": save_name,
-                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "screenshot": screenshot_path,
-                        "game_save": game_save_backup
-                    }
-                    
-                    with open(save_path, 'w', encoding='utf-8') as f:
-                        json.dump(save_data, f, indent=4)
-                    
-                    self.load_save_list()
-                except Exception as e:
-                    messagebox.showerror("错误", f"截图失败: {str(e)}")
-                    return
-            else:
-                messagebox.showerror("错误", f"找不到窗口: {self.window_title}")
-            return  # 自动保存完成，退出函数
+            def finish(callback):
+                def run(result):
+                    callback(result)
+                    if on_finished:
+                        on_finished()
+                return run
+            
+            job = self.capture_save(save_name, auto=True, profile=profile)
+            # 队列已满时跳过本次自动存档, 不阻塞界面
+            if not (job and self.pipeline.submit(job, finish(self.on_save_done), finish(self.on_save_error))):
+                if on_finished:
+                    on_finished()
+            return  # 自动保存已提交，退出函数
 
         # 创建存档名称输入窗口
         dialog_width = 300
@@ -347,89 +283,190 @@ class SaveManager:
         def save():
             save_name = name_var.get()
             if save_name:
-                # 检查游戏存档是否存在
-                if not os.path.exists(self.game_save_path):
-                    messagebox.showerror("错误", "找不到游戏存档文件！")
+                job = self.capture_save(save_name)
+                if not job:
                     return
                 
-                # 获取目标窗口截图
-                hwnd = windll.user32.FindWindowW(None, self.window_title)
-                if hwnd:
-                    try:
-                        # 使用新的截图方法
-                        screenshot = window_screenshot(hwnd)
-                        
-                        screenshot_path = os.path.join(self.screenshots_dir, f"{save_name}.png")
-                        save_path = os.path.join(self.saves_dir, f"{save_name}.json")
-                        game_save_backup = os.path.join(self.saves_dir, f"{save_name}.jkr")
-                        
-                        # 检查是否存在
-                        if os.path.exists(save_path):
-                            if not messagebox.askyesno("确认", "存档已存在，是否覆盖？"):
-                                return
-                        
-                        # 复制游戏存档文件
-                        import shutil
-                        shutil.copy2(self.game_save_path, game_save_backup)
-                        
-                        # 保存截图和存档信息
-                        screenshot.save(screenshot_path)
-                        save_data = {
-                            "name": save_name,
-                            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "screenshot": screenshot_path,
-                            "game_save": game_save_backup
-                        }
-                        
-                        with open(save_path, 'w', encoding='utf-8') as f:
-                            json.dump(save_data, f, indent=4)
-                        
-                        self.load_save_list()
-                        dialog.destroy()
-                    except Exception as e:
-                        messagebox.showerror("错误", f"截图失败: {str(e)}")
+                # 检查是否存在
+                if self.catalog.get(save_name):
+                    if not messagebox.askyesno("确认", "存档已存在，是否覆盖？"):
                         return
+                
+                def done(result):
+                    self.scheduler.end_foreground()
+                    self.on_save_done(result)
+                
+                def failed(error):
+                    self.scheduler.end_foreground()
+                    self.on_save_error(error)
+                
+                # 写入完成前不开始新的后台任务
+                self.scheduler.begin_foreground()
+                if self.pipeline.submit(job, done, failed):
+                    dialog.destroy()
                 else:
-                    messagebox.showerror("错误", f"找不到窗口: {self.window_title}")
+                    self.scheduler.end_foreground()
+                    messagebox.showwarning("提示", "正在保存的存档过多，请稍后再试")
         
         ttk.Button(dialog, text="保存", command=save).pack(pady=5)
 
+    def capture_save(self, save_name, auto=False, profile=None):
+        """截图并读取档案快照, 这是存档唯一需要在主线程完成的步骤
+
+        失败时提示错误并返回None
+        """
+        # 检查游戏存档是否存在
+        if not os.path.exists(self.store.profile_path(profile)):
+            messagebox.showerror("错误", "找不到游戏存档文件！")
+            return None
+        
+        # 获取目标窗口截图
+        try:
+            backend = self.get_capture_backend()
+            hwnd = backend.find_window(self.window_title)
+        except Exception as e:
+            messagebox.showerror("错误", f"截图失败: {str(e)}")
+            return None
+        if not hwnd:
+            messagebox.showerror("错误", f"找不到窗口: {self.window_title}")
+            return None
+        try:
+            with tracer.span("save.capture"):
+                screenshot = backend.capture(hwnd, alpha=self.store.screenshot_policy.keeps_alpha)
+            # 立即读取游戏存档和档案附属文件, 保证与截图对应
+            game_data, companions = self.store.read_snapshot(profile)
+        except Exception as e:
+            messagebox.showerror("错误", f"截图失败: {str(e)}")
+            return None
+        return SaveJob(save_name, screenshot, game_data,
+                       datetime.now().strftime(TIMESTAMP_FORMAT), auto, companions, profile)
+
+    def get_capture_backend(self):
+        """第一次截图时创建截图后端, 配置项 capture_backend 可设为 fake 在没有游戏窗口时测试"""
+        if self.capture_backend is None:
+            from capture import create_backend
+            self.capture_backend = create_backend(self.store.config.get('capture_backend', "auto"))
+        return self.capture_backend
+
+    def encode_save(self, job):
+        """计算截图哈希、编码截图并生成预览缩略图(后台线程), 返回截图路径
+
+        与上一个自动存档几乎相同的自动存档在这里跳过, 不再编码截图
+        """
+        from perceptual_hash import image_hash
+        with tracer.span("save.phash"):
+            job.phash = image_hash(job.screenshot)
+        if job.auto and self.store.auto_save_skip_similar:
+            with tracer.span("save.similar_check"):
+                job.skipped = self.store.is_similar_auto_save(job.game_data, job.phash, job.profile)
+            if job.skipped:
+                return None
+        return self.store.encode_screenshot(job.name, job.screenshot)
+
+    def commit_save(self, job, screenshot_path):
+        """写入游戏存档备份和存档信息(后台提交线程, 按顺序执行), 跳过的存档返回None"""
+        if job.skipped:
+            return None
+        with tracer.span("save.commit"):
+            return self.store.commit(job.name, job.game_data, screenshot_path, job.timestamp,
+                                     job.auto, self.auto_save_run, job.phash, job.companions, job.profile)
+
+    def on_save_done(self, save_data):
+        """存档完成(主线程)"""
+        if save_data is None:
+            self.retention_var.set("画面和存档没有变化, 跳过自动存档")
+            return
+        self.update_storage_status()
+        if save_data.get("auto"):
+            self.run_retention()
+
+    def run_retention(self):
+        """在后台按保留策略清理自动存档, 正在清理时合并为结束后再清理一次"""
+        self.scheduler.trigger("retention")
+
+    def run_retention_job(self):
+        """按保留策略清理自动存档(调度器线程)"""
+        if self.store.retention_enabled:
+            self.retention_worker.run(self.store.retention_policy)
+
+    def on_retention_done(self, removed, record_bytes):
+        """自动清理完成(主线程), 实际占用的空间由存储状态显示"""
+        if removed:
+            self.retention_var.set(f"自动清理: {removed} 个存档\n存档大小 {record_bytes / 1024 / 1024:.1f} MB")
+            self.update_storage_status()
+
+    def on_purge_done(self, removed, record_bytes):
+        """回收站清理完成(主线程), 去重后实际释放的空间可能更少, 由存储状态显示"""
+        if removed:
+            self.retention_var.set(f"回收站清理: 删除 {removed} 个\n存档大小 {record_bytes / 1024 / 1024:.1f} MB")
+            self.update_storage_status()
+
+    def run_contact_sheets_job(self):
+        """把新存档加入画廊联系表并合并稀疏的联系表(调度器线程)"""
+        added, rewritten = self.store.contact_sheets.update(wait_idle=self.scheduler.wait_foreground)
+        if rewritten:
+            self.pipeline.post(self.on_contact_sheets_updated)
+
+    def on_contact_sheets_updated(self):
+        """联系表更新后重新显示画廊的当前页(主线程)"""
+        if self.gallery_dialog is not None:
+            self.show_gallery_page()
+
+    def on_scrub_done(self, checked, damaged):
+        """后台校验完成(主线程)"""
+        if damaged:
+            quarantined = sum(count for _, _, count in damaged)
+            detail = f"{quarantined} 个损坏的文件已移到 quarantine" if quarantined else "已标记为损坏"
+            self.retention_var.set(f"校验发现 {len(damaged)} 个损坏的存档\n{detail}")
+            # 刷新当前预览中的损坏标记
+            if self.preview_name in (name for name, _, _ in damaged):
+                self.preview_name = None
+                self.show_preview()
+
+    def on_save_error(self, error):
+        """存档失败(主线程)"""
+        messagebox.showerror("错误", f"保存存档失败: {str(error)}")
+
+    def update_storage_status(self):
+        """更新存储统计显示"""
+        stats = self.store.catalog.blob_stats()
+        self.status_var.set(
+            f"存档备份: {stats['refs']} 个 / 实际 {stats['blobs']} 个\n"
+            f"去重率: {stats['dedup_ratio']:.2f}x"
+        )
+
     def load_save(self):
         """读取存档"""
-        selection = self.save_listbox.curselection()
+        selection = self.save_list.curselection()
         if selection:
-            save_name = self.save_listbox.get(selection[0])
-            save_path = os.path.join(self.saves_dir, f"{save_name}.json")
-            
-            with open(save_path, 'r', encoding='utf-8') as f:
-                save_data = json.load(f)
-                game_save = save_data.get('game_save')
-                
-                if os.path.exists(game_save):
-                    # 备份当前存档
-                    current_backup = os.path.join(self.saves_dir, "current_backup.txt")
-                    import shutil
-                    shutil.copy2(self.game_save_path, current_backup)
-                    
-                    try:
-                        # 复制存档文件到游戏目录
-                        shutil.copy2(game_save, self.game_save_path)
-                        messagebox.showinfo("成功", "存档已恢复！")
-                    except Exception as e:
-                        # 如果失败，尝试恢复备份
-                        shutil.copy2(current_backup, self.game_save_path)
-                        messagebox.showerror("错误", f"恢复存档失败: {str(e)}")
-                else:
-                    messagebox.showerror("错误", "找不到存档文件！")
+            save_name = self.save_list.get(selection[0])
+            try:
+                with tracer.span("restore.total"), self.scheduler.foreground():
+                    self.store.restore(save_name)
+                messagebox.showinfo("成功", "存档已恢复！")
+            except SaveStoreError as e:
+                messagebox.showerror("错误", str(e))
+                # 读取前校验发现损坏时显示损坏标记
+                self.show_preview()
+    
+    def undo_load(self):
+        """撤销最近一次读取存档, 游戏存档回到读取前的状态"""
+        try:
+            with self.scheduler.foreground():
+                entry = self.store.undo_restore()
+        except SaveStoreError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        messagebox.showinfo("成功", f"已撤销读取 {entry['restored']}, 游戏存档已回到 {entry['timestamp']} 的状态")
     
     def delete_save(self):
         """删除存档"""
-        selections = self.save_listbox.curselection()
+        selections = self.save_list.curselection()
         if not selections:
             return
         
         # 获取所有选中的存档名称
-        save_names = [self.save_listbox.get(idx) for idx in selections]
+        save_names = [self.save_list.get(idx) for idx in selections]
         
         # 确认删除
         if len(save_names) == 1:
@@ -438,31 +475,300 @@ class SaveManager:
             confirm_msg = f"确定要删除选中的 {len(save_names)} 个存档吗？"
         
         if messagebox.askyesno("确认", confirm_msg):
-            for save_name in save_names:
-                # 所有相关文件路径
-                save_path = os.path.join(self.saves_dir, f"{save_name}.json")  # 存档信息
-                screenshot_path = os.path.join(self.screenshots_dir, f"{save_name}.png")  # 截图
-                game_save_backup = os.path.join(self.saves_dir, f"{save_name}.jkr")  # 游戏存档备份
+            # 只移入回收站, 文件在后台清理
+            with tracer.span("delete.total"):
+                self.store.delete(save_names)
                 
-                # 删除所有相关文件
-                if os.path.exists(save_path):
-                    os.remove(save_path)
-                if os.path.exists(screenshot_path):
-                    os.remove(screenshot_path)
-                if os.path.exists(game_save_backup):
-                    os.remove(game_save_backup)
-            
-            # 刷新列表和预览
-            self.load_save_list()
-            self.preview_label.configure(image='')
+                # 清除预览
+                self.preview_label.configure(image='')
+                self.update_storage_status()
+
+    def export_archive(self):
+        """把选中的存档(未选择时为全部存档)导出为存档包, 在后台线程中进行"""
+        save_names = [self.save_list.get(idx) for idx in self.save_list.curselection()]
+        path = filedialog.asksaveasfilename(
+            title="导出存档包", defaultextension=ARCHIVE_SUFFIX,
+            filetypes=[("存档包", f"*{ARCHIVE_SUFFIX}")])
+        if not path:
+            return
+        
+        def run():
+            try:
+                exported = self.store.export_archive(save_names or self.catalog.names(), path)
+                self.pipeline.post(messagebox.showinfo, "成功", f"已导出 {len(exported)} 个存档")
+            except (SaveStoreError, OSError) as e:
+                self.pipeline.post(messagebox.showerror, "错误", f"导出存档包失败: {str(e)}")
+            finally:
+                self.pipeline.post(self.retention_var.set, "")
+        
+        self.retention_var.set("正在导出存档包...")
+        threading.Thread(target=run, name="export-archive", daemon=True).start()
+
+    def import_archive(self):
+        """导入存档包, 同名存档可选择覆盖或跳过, 在后台线程中进行"""
+        path = filedialog.askopenfilename(
+            title="导入存档包", filetypes=[("存档包", f"*{ARCHIVE_SUFFIX}")])
+        if not path:
+            return
+        overwrite = messagebox.askyesno("导入存档包", "是否覆盖同名存档？\n选择“否”将跳过同名存档")
+        
+        def run():
+            try:
+                imported, skipped = self.store.import_archive(path, overwrite=overwrite)
+                message = f"已导入 {len(imported)} 个存档" + (f", 跳过 {len(skipped)} 个" if skipped else "")
+                self.pipeline.post(messagebox.showinfo, "成功", message)
+                self.pipeline.post(self.update_storage_status)
+            except (SaveStoreError, OSError) as e:
+                self.pipeline.post(messagebox.showerror, "错误", f"导入存档包失败: {str(e)}")
+            finally:
+                self.pipeline.post(self.retention_var.set, "")
+        
+        self.retention_var.set("正在导入存档包...")
+        threading.Thread(target=run, name="import-archive", daemon=True).start()
+
+    def show_similar(self):
+        """列出截图与选中存档相似的存档, 选择后在主列表中定位"""
+        selection = self.save_list.curselection()
+        if not selection:
+            return
+        save_name = self.save_list.get(selection[0])
+        try:
+            similar = self.store.similar(save_name, limit=50)
+        except SaveStoreError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        if not similar:
+            messagebox.showinfo("相似存档", "没有找到相似的存档")
+            return
+        
+        dialog_width = 300
+        dialog_height = 400
+        x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"与 {save_name} 相似的存档")
+        dialog.geometry(f"{dialog_width}x{dialog_height}+{x}+{y}")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        ttk.Label(dialog, text="按画面差异从小到大排列").pack(pady=5)
+        similar_list = VirtualListView(dialog)
+        similar_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        similar_list.set_items([f"{name}  (差异 {distance})" for name, distance in similar])
+        
+        def locate(event):
+            selection = similar_list.curselection()
+            if selection:
+                self.save_list.select(similar[selection[0]][0])
+        
+        similar_list.bind("<<ListboxSelect>>", locate)
+
+    def show_gallery(self):
+        """按当前列表的过滤和排序分页显示存档缩略图, 点击缩略图在主列表中定位"""
+        if self.gallery_dialog is not None:
+            self.gallery_dialog.lift()
+            return
+        tile_width, tile_height = TILE_SIZE
+        canvas_width = GALLERY_COLUMNS * tile_width
+        canvas_height = GALLERY_ROWS * (tile_height + GALLERY_LABEL_HEIGHT)
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("画廊")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        nav_frame = ttk.Frame(dialog)
+        nav_frame.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(nav_frame, text="上一页", command=lambda: self.turn_gallery_page(-1)).pack(side=tk.LEFT)
+        ttk.Button(nav_frame, text="下一页", command=lambda: self.turn_gallery_page(1)).pack(side=tk.RIGHT)
+        self.gallery_page_var = tk.StringVar()
+        ttk.Label(nav_frame, textvariable=self.gallery_page_var, anchor=tk.CENTER).pack(fill=tk.X, expand=True)
+        
+        canvas = tk.Canvas(dialog, width=canvas_width, height=canvas_height, bg="#202020", highlightthickness=0)
+        canvas.pack(padx=5, pady=(0, 5))
+        canvas.create_image(0, 0, anchor=tk.NW, tags="page")
+        self.gallery_canvas = canvas
+        
+        def locate(event):
+            index = (event.y // (tile_height + GALLERY_LABEL_HEIGHT)) * GALLERY_COLUMNS + event.x // tile_width
+            if 0 <= index < len(self.gallery_names):
+                self.save_list.select(self.gallery_names[index])
+        
+        def close():
+            self.gallery_loader.cancel()
+            self.gallery_dialog = None
+            self.gallery_photo = None
+            dialog.destroy()
+        
+        canvas.bind("<Button-1>", locate)
+        for key in ("<Left>", "<Prior>"):
+            dialog.bind(key, lambda event: self.turn_gallery_page(-1))
+        for key in ("<Right>", "<Next>"):
+            dialog.bind(key, lambda event: self.turn_gallery_page(1))
+        dialog.protocol("WM_DELETE_WINDOW", close)
+        self.gallery_dialog = dialog
+        
+        # 从选中的存档所在的页开始
+        selection = self.save_list.curselection()
+        self.gallery_page = selection[0] // (GALLERY_COLUMNS * GALLERY_ROWS) if selection else 0
+        self.show_gallery_page()
+
+    def turn_gallery_page(self, delta):
+        self.gallery_page += delta
+        self.show_gallery_page()
+
+    def show_gallery_page(self):
+        """显示画廊的当前页: 名称立即显示, 缩略图在后台从联系表拼接"""
+        items = self.save_list.view.items
+        per_page = GALLERY_COLUMNS * GALLERY_ROWS
+        pages = max(1, -(-len(items) // per_page))
+        self.gallery_page = min(max(0, self.gallery_page), pages - 1)
+        start = self.gallery_page * per_page
+        names = tuple(items[start:start + per_page])
+        self.gallery_page_var.set(f"第 {self.gallery_page + 1}/{pages} 页  共 {len(items)} 个存档")
+        
+        tile_width, tile_height = TILE_SIZE
+        canvas = self.gallery_canvas
+        canvas.delete("label")
+        for index, name in enumerate(names):
+            x = (index % GALLERY_COLUMNS) * tile_width + tile_width // 2
+            y = (index // GALLERY_COLUMNS) * (tile_height + GALLERY_LABEL_HEIGHT) + tile_height + 2
+            text = name if len(name) <= 28 else name[:27] + "…"
+            canvas.create_text(x, y, text=text, anchor=tk.N, fill="#dddddd", tags="label")
+        if names != self.gallery_names:
+            # 新的一页拼接完成前不显示上一页的缩略图
+            canvas.itemconfigure("page", state=tk.HIDDEN)
+        self.gallery_names = names
+        
+        prefetch = [tuple(items[s:s + per_page]) for s in (start + per_page, start - per_page) if 0 <= s < len(items)]
+        self.gallery_loader.request(names, prefetch)
+
+    def load_gallery_page(self, names):
+        """从联系表拼接画廊的一页(画廊线程)"""
+        with tracer.span("gallery.render"):
+            return self.store.contact_sheets.render_page(
+                names, GALLERY_COLUMNS, self.sheet_cache, TILE_SIZE[1] + GALLERY_LABEL_HEIGHT)
+
+    def on_gallery_page_loaded(self, names, image):
+        """画廊的一页拼接完成(主线程), 只显示仍是当前页的"""
+        if self.gallery_dialog is None or names != self.gallery_names or image is None:
+            return
+        from PIL import ImageTk
+        photo = self.gallery_photo
+        if photo is not None and photo.width() == image.width and photo.height() == image.height:
+            photo.paste(image)
+        else:
+            photo = ImageTk.PhotoImage(image)
+            self.gallery_photo = photo  # 保持引用
+        self.gallery_canvas.itemconfigure("page", image=photo, state=tk.NORMAL)
+
+    def compare_saves(self):
+        """比较选中的两个存档(从较早的到较晚的), 在后台线程中进行"""
+        save_names = [self.save_list.get(idx) for idx in self.save_list.curselection()]
+        if len(save_names) != 2:
+            messagebox.showinfo("比较存档", "请选择两个存档")
+            return
+        records = [self.store.get(name) or {"name": name} for name in save_names]
+        old_name, new_name = [r["name"] for r in sorted(records, key=lambda r: r.get("timestamp") or "")]
+        
+        def run():
+            try:
+                result = next(self.store.diff_pairs([(old_name, new_name)]))
+                self.pipeline.post(self.show_diff, *result)
+            except SaveStoreError as e:
+                self.pipeline.post(messagebox.showerror, "错误", str(e))
+            finally:
+                self.pipeline.post(self.retention_var.set, "")
+        
+        self.retention_var.set("正在比较存档...")
+        threading.Thread(target=run, name="compare-saves", daemon=True).start()
+
+    def show_diff(self, save_a, save_b, changes):
+        """显示两个存档之间的变化: 对局信息和小丑牌的变化, 以及变化的字段"""
+        dialog_width = 560
+        dialog_height = 400
+        x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"{save_a['name']} -> {save_b['name']}")
+        dialog.geometry(f"{dialog_width}x{dialog_height}+{x}+{y}")
+        dialog.transient(self.root)
+        
+        summary = summarize(save_a.get("meta", {}), save_b.get("meta", {}), changes)
+        ttk.Label(dialog, text="\n".join(summary) or "游戏数据没有变化", justify=tk.LEFT,
+                  wraplength=dialog_width - 20).pack(fill=tk.X, padx=5, pady=5)
+        scrollbar = ttk.Scrollbar(dialog)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        text = tk.Text(dialog, wrap=tk.NONE, yscrollcommand=scrollbar.set)
+        text.pack(fill=tk.BOTH, expand=True, padx=(5, 0), pady=(0, 5))
+        scrollbar.configure(command=text.yview)
+        text.insert(tk.END, "\n".join(format_change(change) for change in changes))
+        text.configure(state=tk.DISABLED)
+
+    def show_trash(self):
+        """显示回收站, 可以恢复或彻底删除存档"""
+        dialog_width = 300
+        dialog_height = 400
+        x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("回收站")
+        dialog.geometry(f"{dialog_width}x{dialog_height}+{x}+{y}")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        ttk.Label(dialog, text=f"删除的存档保留 {self.store.trash_retention_hours} 小时后自动清理").pack(pady=5)
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(side=tk.BOTTOM, pady=5)
+        trash_list = VirtualListView(dialog)
+        trash_list.pack(fill=tk.BOTH, expand=True, padx=5)
+        
+        def refresh():
+            # 最近删除的在前
+            trash_list.set_items([r["name"] for r in reversed(self.store.trashed())])
+        
+        def selected_names():
+            return [trash_list.get(i) for i in trash_list.curselection()]
+        
+        def undelete():
+            names = selected_names()
+            if names:
+                self.store.undelete(names)
+                refresh()
+        
+        def purge(names):
+            if not names or not messagebox.askyesno("确认", f"确定要彻底删除 {len(names)} 个存档吗？", parent=dialog):
+                return
+            if not self.trash_purger.run_async(names=names):
+                messagebox.showwarning("提示", "正在清理回收站，请稍后再试", parent=dialog)
+                return
+            # 文件在后台删除, 列表中先去掉
+            purged = set(names)
+            trash_list.set_items([name for name in trash_list.items if name not in purged])
+        
+        ttk.Button(btn_frame, text="恢复", command=undelete).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="彻底删除", command=lambda: purge(selected_names())).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="清空", command=lambda: purge(list(trash_list.items))).pack(side=tk.LEFT, padx=2)
+        refresh()
 
     def on_select_save(self, event):
         """选择存档时显示预览"""
-        selections = self.save_listbox.curselection()
+        with tracer.span("preview.total"):
+            self.show_preview()
+
+    def show_preview(self):
+        """显示最新选中的存档的预览图和对局信息"""
+        selections = self.save_list.curselection()
         if not selections:
             # 清除预览
             self.preview_label.configure(image='')
+            self.info_var.set('')
             self.previous_selections = ()
+            self.preview_name = None
+            self.preview_loader.cancel()
             return
         
         # 确定最新选中的项
@@ -481,93 +787,183 @@ class SaveManager:
         # 更新上一次的选择记录
         self.previous_selections = selections
         
-        # 显示预览
-        save_name = self.save_listbox.get(current)
-        screenshot_path = os.path.join(self.screenshots_dir, f"{save_name}.png")
+        # 显示预览: 缓存中有时立即显示, 否则在后台解码, 完成后由 on_preview_loaded 显示
+        save_name = self.save_list.get(current)
+        with tracer.span("preview.lookup"):
+            save_data = self.catalog.get(save_name) or {}
+        self.preview_name = save_name
+        image = self.preview_loader.request(save_name, self.preview_neighbours(current))
+        self.preview_index = current
+        if image is not None:
+            self.display_preview(image)
         
-        if os.path.exists(screenshot_path):
-            # 加载原始图片
-            img = Image.open(screenshot_path)
-            img_width, img_height = img.size
-            
-            # 取预览区域大小
-            self.preview_frame.update()
-            frame_width = self.preview_frame.winfo_width() - 20  # 减去padding
-            frame_height = self.preview_frame.winfo_height() - 20  # 减去padding
-            
-            # 优先适应宽度
-            scale = frame_width / img_width
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            
-            # 如果高度超出，则改用高度缩放
-            if new_height > frame_height:
-                scale = frame_height / img_height
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-            
-            # 缩放图片
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 转换为PhotoImage以适配tkinter显示
-            photo = ImageTk.PhotoImage(img_resized)
-            
-            # 更新预览
-            self.preview_label.configure(image=photo)
-            self.preview_label.image = photo  # 保持引用
+        # 显示对局信息
+        info = format_metadata(save_data.get("meta", {}))
+        if len(self.store.profiles()) > 1 and save_data.get("profile"):
+            info = f"档案: {save_data['profile']}  {info}"
+        if save_data.get("damaged"):
+            info = f"⚠ 已损坏: {save_data['damaged']}\n{info}"
+        self.info_var.set(info)
 
+    def preview_neighbours(self, index):
+        """选中存档附近要预取的存档, 移动方向上的在前"""
+        step = -1 if self.preview_index is not None and index < self.preview_index else 1
+        count = self.save_list.size()
+        names = []
+        for direction in (step, -step):
+            for distance in range(1, self.preview_prefetch + 1):
+                i = index + direction * distance
+                if 0 <= i < count:
+                    names.append(self.save_list.get(i))
+        return names
+    
+    def load_preview(self, save_name):
+        """解码存档的预览缩略图(预览线程), 没有截图时返回None"""
+        from PIL import Image
+        save_data = self.catalog.get(save_name) or {}
+        screenshot_path = save_data.get("screenshot") or os.path.join(self.store.screenshots_dir, f"{save_name}.png")
+        # 使用保存时生成的预览尺寸缩略图, 旧存档在第一次预览时补生成
+        with tracer.span("preview.thumbnail"):
+            thumb_path = get_thumbnail(screenshot_path, save_name, self.store.thumbs_dir, PREVIEW_SIZE)
+        if not thumb_path:
+            return None
+        with tracer.span("preview.decode"), Image.open(thumb_path) as img:
+            img.load()
+            return img
+    
+    def on_preview_loaded(self, save_name, image):
+        """后台解码完成(主线程), 只显示仍然选中的存档"""
+        if save_name != self.preview_name:
+            return
+        if image is None:
+            self.preview_label.configure(image='')
+        else:
+            self.display_preview(image)
+    
+    def display_preview(self, image):
+        """显示预览图, 尺寸相同时把图像复制到现有的 PhotoImage 中, 不再创建新的"""
+        from PIL import ImageTk
+        with tracer.span("preview.display"):
+            photo = self.preview_photo
+            if photo is not None and photo.width() == image.width and photo.height() == image.height:
+                photo.paste(image)
+            else:
+                photo = ImageTk.PhotoImage(image)
+                self.preview_photo = photo  # 保持引用
+            self.preview_label.configure(image=photo)
+    
     def load_config(self):
-        """加载配置"""
-        try:
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                self.window_title = config.get('window_title', "Balatro")
-                self.game_save_path = config.get('game_save_path', 
-                    os.path.expandvars(r"%APPDATA%\Balatro\1\save.jkr"))
-                self.auto_save_enabled = config.get('auto_save_enabled', False)
-                self.auto_save_interval = config.get('auto_save_interval', 5)
-        except FileNotFoundError:
-            self.window_title = "Balatro"
-            self.game_save_path = os.path.expandvars(r"%APPDATA%\Balatro\1\save.jkr")
-            self.auto_save_enabled = False
-            self.auto_save_interval = 5
-            self.save_config()
+        """读取界面相关的配置, 存储相关的配置由 SaveStore 加载"""
+        config = self.store.config
+        self.window_title = config.get('window_title', "Balatro")
+        self.auto_save_enabled = config.get('auto_save_enabled', False)
+        self.auto_save_interval = config.get('auto_save_interval', 5)  # 默认5分钟
+        # 自动存档方式: timer 为定时存档, change 为游戏存档变化时存档
+        self.auto_save_mode = config.get('auto_save_mode', "timer")
+        self.auto_save_min_interval = config.get('auto_save_min_interval', 60)  # 变化存档的最小间隔(秒)
+        # 预览图缓存的内存上限和预取的相邻存档数
+        self.preview_cache_mb = config.get('preview_cache_mb', PREVIEW_CACHE_MB)
+        self.preview_prefetch = config.get('preview_prefetch', PREFETCH_NEIGHBOURS)
     
     def save_config(self):
         """保存配置"""
-        config = {
+        self.store.config.update({
             'window_title': self.window_title,
-            'game_save_path': self.game_save_path,
             'auto_save_enabled': self.auto_save_enabled,
-            'auto_save_interval': self.auto_save_interval
-        }
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4)
+            'auto_save_interval': self.auto_save_interval,
+            'auto_save_mode': self.auto_save_mode,
+            'auto_save_min_interval': self.auto_save_min_interval,
+            'preview_cache_mb': self.preview_cache_mb,
+            'preview_prefetch': self.preview_prefetch
+        })
+        self.store.save_config()
     
     def start_auto_save(self):
         """开始自动存档"""
-        if self.auto_save_job:
-            self.root.after_cancel(self.auto_save_job)
+        self.stop_auto_save()
+        
+        # 每次开启自动存档开始一条新的快照链
+        self.auto_save_run = datetime.now().strftime("run_%Y%m%d_%H%M%S")
         
-        def auto_save():
-            if self.auto_save_enabled:
-                self.create_save(True)
-                # 设置下一次自动存档
-                self.auto_save_job = self.root.after(self.auto_save_interval * 60 * 1000, auto_save)
+        profiles = self.store.profiles()
+        
+        if self.auto_save_mode == "change":
+            # 游戏存档内容变化时才存档, 所有档案共用一个监视线程, 通过流水线回到主线程截图
+            from file_watcher import ChangeMonitor
+            paths = dict((self.store.profile_path(profile), profile) for profile in profiles)
+            
+            def on_change(path, digest):
+                self.pipeline.post(self.auto_save, [paths[path]])
+            
+            self.change_monitor = ChangeMonitor(list(paths), on_change, min_interval=self.auto_save_min_interval)
+            self.change_monitor.start()
+            return
         
-        # 设置第一次自动存档的定时
-        self.auto_save_job = self.root.after(self.auto_save_interval * 60 * 1000, auto_save)
+        # 所有档案共用一个定时任务, 其他档案从现在起有变化时才存档
+        from file_watcher import file_digest
+        self.profile_digests = dict((profile, file_digest(self.store.profile_path(profile)))
+                                    for profile in profiles[1:])
+        self.scheduler.add("auto-save", self.run_auto_save, self.auto_save_interval * 60,
+                           priority=PRIORITY_AUTO_SAVE)
+    
+    def run_auto_save(self):
+        """定时自动存档(调度器线程): 只把截图投递到主线程, 不等待写入完成, 不占用调度器的工作线程.
+        上一次截图或写入还没完成(或错误提示没有关闭)时跳过这一次, 不会叠在一起;
+        超过 AUTO_SAVE_TIMEOUT 后不再跳过
+        """
+        started = self.auto_save_started
+        if started is not None and time.monotonic() - started < AUTO_SAVE_TIMEOUT:
+            self.scheduler.skip("auto-save")
+            return
+        started = self.auto_save_started = time.monotonic()
+        self.pipeline.post(self.auto_save, self.changed_profiles(),
+                           lambda: self.on_auto_save_finished(started))
+    
+    def on_auto_save_finished(self, started):
+        """定时自动存档写入完成、失败或跳过(主线程), 超时后才完成的旧自动存档不影响新的"""
+        if self.auto_save_started == started:
+            self.auto_save_started = None
+    
+    def auto_save(self, profiles, on_finished=None):
+        """为指定的档案各创建一个自动存档, 全部完成后调用 on_finished"""
+        profiles = list(profiles) if self.auto_save_enabled else []
+        remaining = [len(profiles)]
+        
+        def finished():
+            remaining[0] -= 1
+            if remaining[0] == 0 and on_finished:
+                on_finished()
+        
+        if not profiles and on_finished:
+            on_finished()
+        for profile in profiles:
+            self.create_save(True, profile, finished)
+    
+    def changed_profiles(self):
+        """定时自动存档要保存的档案: 当前档案总是保存, 其他档案只在游戏存档变化后保存"""
+        from file_watcher import file_digest
+        profiles = self.store.profiles()
+        changed = profiles[:1]
+        for profile in profiles[1:]:
+            digest = file_digest(self.store.profile_path(profile))
+            if digest and digest != self.profile_digests.get(profile):
+                self.profile_digests[profile] = digest
+                changed.append(profile)
+        return changed
 
     def stop_auto_save(self):
         """停止自动存档"""
-        if self.auto_save_job:
-            self.root.after_cancel(self.auto_save_job)
-            self.auto_save_job = None
+        self.scheduler.remove("auto-save")
+        # 重新开始时不再因为之前的自动存档而跳过
+        self.auto_save_started = None
+        if self.change_monitor:
+            self.change_monitor.stop()
+            self.change_monitor = None
 
     def show_settings(self):
         """显示设置窗口"""
         dialog_width = 400
-        dialog_height = 300
+        dialog_height = 660
         x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
         y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
         
@@ -591,10 +987,20 @@ class SaveManager:
             
         # 存档路径设置
         ttk.Label(form_frame, text="游戏存档路径:").pack(fill=tk.X, pady=2)
-        path_var = tk.StringVar(value=self.game_save_path)
+        path_var = tk.StringVar(value=self.store.game_save_path)
         path_entry = ttk.Entry(form_frame, textvariable=path_var)
         path_entry.pack(fill=tk.X, pady=2)
         
+        # 档案设置
+        profiles_frame = ttk.Frame(form_frame)
+        profiles_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(profiles_frame, text="同时备份的其他档案(如 2,3):").pack(side=tk.LEFT)
+        profiles_var = tk.StringVar(value=",".join(self.store.tracked_profiles))
+        ttk.Entry(profiles_frame, textvariable=profiles_var, width=10).pack(side=tk.LEFT, padx=5)
+        companions_var = tk.BooleanVar(value=self.store.snapshot_companions)
+        ttk.Checkbutton(form_frame, text="一起备份和恢复档案文件(profile.jkr, meta.jkr)",
+                        variable=companions_var).pack(fill=tk.X, pady=2)
+        
         # 自动存档设置
         ttk.Label(form_frame, text="自动存档设置:").pack(fill=tk.X, pady=2)
         enabled_var = tk.BooleanVar(value=self.auto_save_enabled)
@@ -606,10 +1012,86 @@ class SaveManager:
         interval_var = tk.StringVar(value=str(self.auto_save_interval))
         interval_entry = ttk.Entry(interval_frame, textvariable=interval_var, width=10)
         interval_entry.pack(side=tk.LEFT, padx=5)
+        
+        change_var = tk.BooleanVar(value=self.auto_save_mode == "change")
+        ttk.Checkbutton(form_frame, text="仅在游戏存档变化时自动存档", variable=change_var).pack(fill=tk.X, pady=2)
+        
+        min_interval_frame = ttk.Frame(form_frame)
+        min_interval_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(min_interval_frame, text="变化存档最小间隔(秒):").pack(side=tk.LEFT)
+        min_interval_var = tk.StringVar(value=str(self.auto_save_min_interval))
+        ttk.Entry(min_interval_frame, textvariable=min_interval_var, width=10).pack(side=tk.LEFT, padx=5)
+        
+        chain_var = tk.BooleanVar(value=self.store.auto_save_storage == "chain")
+        ttk.Checkbutton(form_frame, text="自动存档使用增量快照链", variable=chain_var).pack(fill=tk.X, pady=2)
+        
+        skip_similar_var = tk.BooleanVar(value=self.store.auto_save_skip_similar)
+        ttk.Checkbutton(form_frame, text="画面和存档都几乎没变时跳过自动存档",
+                        variable=skip_similar_var).pack(fill=tk.X, pady=2)
+        
+        # 自动存档清理设置
+        retention = self.store.retention_policy
+        retention_var = tk.BooleanVar(value=self.store.retention_enabled)
+        ttk.Checkbutton(form_frame, text="自动清理旧的自动存档(手动存档不会被清理)",
+                        variable=retention_var).pack(fill=tk.X, pady=2)
+        retention_frame = ttk.Frame(form_frame)
+        retention_frame.pack(fill=tk.X, pady=2)
+        retention_vars = []
+        for label, value in (("保留最近", retention.keep_last), ("每小时(h)", retention.hourly_hours),
+                             ("每天(d)", retention.daily_days),
+                             ("上限(MB)", retention.max_bytes // (1024 * 1024) if retention.max_bytes else "")):
+            ttk.Label(retention_frame, text=label).pack(side=tk.LEFT)
+            var = tk.StringVar(value=str(value))
+            ttk.Entry(retention_frame, textvariable=var, width=5).pack(side=tk.LEFT, padx=2)
+            retention_vars.append(var)
+        
+        # 后台校验设置
+        scrub = self.store.scrub_policy
+        scrub_var = tk.BooleanVar(value=scrub.enabled)
+        ttk.Checkbutton(form_frame, text="后台校验存档(损坏的文件移到 quarantine)",
+                        variable=scrub_var).pack(fill=tk.X, pady=2)
+        scrub_frame = ttk.Frame(form_frame)
+        scrub_frame.pack(fill=tk.X, pady=2)
+        scrub_vars = []
+        for label, value in (("读取上限(MB/s)", scrub.io_mb_per_s), ("CPU占用(%)", scrub.cpu_percent),
+                             ("间隔(分钟)", scrub.interval_minutes)):
+            ttk.Label(scrub_frame, text=label).pack(side=tk.LEFT)
+            var = tk.StringVar(value=str(value))
+            ttk.Entry(scrub_frame, textvariable=var, width=5).pack(side=tk.LEFT, padx=2)
+            scrub_vars.append(var)
+        
+        # 截图存储设置
+        policy = self.store.screenshot_policy
+        ttk.Label(form_frame, text="截图存储设置(webp/jpeg 为有损压缩, 体积更小):").pack(fill=tk.X, pady=2)
+        codec_frame = ttk.Frame(form_frame)
+        codec_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(codec_frame, text="格式:").pack(side=tk.LEFT)
+        format_var = tk.StringVar(value=policy.format)
+        ttk.Combobox(codec_frame, textvariable=format_var, values=sorted(SCREENSHOT_FORMATS),
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(codec_frame, text="质量:").pack(side=tk.LEFT)
+        quality_var = tk.StringVar(value=str(policy.quality))
+        ttk.Entry(codec_frame, textvariable=quality_var, width=5).pack(side=tk.LEFT, padx=5)
+        ttk.Label(codec_frame, text="最大分辨率:").pack(side=tk.LEFT)
+        max_size_var = tk.StringVar(value="x".join(map(str, policy.max_size)) if policy.max_size else "")
+        ttk.Entry(codec_frame, textvariable=max_size_var, width=10).pack(side=tk.LEFT, padx=5)
+        
+        preview_frame = ttk.Frame(form_frame)
+        preview_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(preview_frame, text="预览缓存(MB):").pack(side=tk.LEFT)
+        preview_cache_var = tk.StringVar(value=str(self.preview_cache_mb))
+        ttk.Entry(preview_frame, textvariable=preview_cache_var, width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(preview_frame, text="预取前后存档数:").pack(side=tk.LEFT)
+        preview_prefetch_var = tk.StringVar(value=str(self.preview_prefetch))
+        ttk.Entry(preview_frame, textvariable=preview_prefetch_var, width=4).pack(side=tk.LEFT, padx=5)
     
         # 添加窗口列表按钮
         def show_window_list():
-            windows = list_windows()
+            try:
+                windows = self.get_capture_backend().list_windows()
+            except Exception as e:
+                messagebox.showerror("错误", str(e))
+                return
             list_width = 300
             list_height = 400
             x = self.root.winfo_x() + (self.root.winfo_width() - list_width) // 2
@@ -638,36 +1120,103 @@ class SaveManager:
             ttk.Button(list_dialog, text="选择", command=select_window).pack(pady=5)
         
         ttk.Button(form_frame, text="列出窗口", command=show_window_list).pack(fill=tk.X, pady=2)
+        ttk.Button(form_frame, text="耗时统计", command=self.show_timing).pack(fill=tk.X, pady=2)
+        ttk.Button(form_frame, text="后台任务", command=self.show_jobs).pack(fill=tk.X, pady=2)
         
         def save_settings():
-            self.window_title = title_var.get()
-            new_save_path = path_var.get()
+            # 先解析和检查全部输入, 有错误时不改变任何设置, 全部通过后再一起应用并保存
+            try:
+                interval = max(1, int(interval_var.get()))
+                min_interval = max(1, int(min_interval_var.get()))
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的时间间隔！")
+                return
+            try:
+                keep_last, hourly_hours, daily_days = (max(0, int(var.get())) for var in retention_vars[:3])
+                budget_text = retention_vars[3].get().strip()
+                max_bytes = int(budget_text) * 1024 * 1024 if budget_text else None
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的清理设置！")
+                return
+            try:
+                io_mb_per_s = max(0.0, float(scrub_vars[0].get()))
+                cpu_percent = min(100, max(1, int(scrub_vars[1].get())))
+                interval_minutes = max(1, int(scrub_vars[2].get()))
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的校验设置！")
+                return
+            try:
+                quality = min(100, max(1, int(quality_var.get())))
+                max_size_text = max_size_var.get().strip()
+                max_size = tuple(int(v) for v in max_size_text.lower().split("x")) if max_size_text else None
+                if max_size and len(max_size) != 2:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的截图质量和分辨率(如 1920x1080)！")
+                return
+            try:
+                preview_cache_mb = max(0, int(preview_cache_var.get()))
+                preview_prefetch = max(0, int(preview_prefetch_var.get()))
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的预览缓存设置！")
+                return
             
             # 验证存档文件是否存在
+            new_save_path = path_var.get()
             if not os.path.exists(new_save_path):
                 if not messagebox.askyesno("警告", 
                     "指定的存档文件不存在，是否继续保存设置？"):
                     return
             
             # 保存自动存档设置
-            try:
-                interval = max(1, int(interval_var.get()))
-                self.auto_save_interval = interval
-                new_enabled = enabled_var.get()
-                
-                # 更新自动存档状态
-                if new_enabled != self.auto_save_enabled:
-                    self.auto_save_enabled = new_enabled
-                    if new_enabled:
-                        self.start_auto_save()
-                    else:
-                        self.stop_auto_save()
-            except ValueError:
-                messagebox.showerror("错误", "请输入有效的时间间隔！")
-                return
+            self.window_title = title_var.get()
+            new_enabled = enabled_var.get()
+            new_mode = "change" if change_var.get() else "timer"
+            new_profiles = [p.strip() for p in profiles_var.get().replace("，", ",").split(",") if p.strip()]
+            changed = (interval != self.auto_save_interval or new_mode != self.auto_save_mode or
+                       min_interval != self.auto_save_min_interval or
+                       new_save_path != self.store.game_save_path or
+                       new_profiles != self.store.tracked_profiles)
+            restart_auto_save = new_enabled != self.auto_save_enabled or (new_enabled and changed)
+            self.auto_save_enabled = new_enabled
+            self.auto_save_interval = interval
+            self.auto_save_min_interval = min_interval
+            self.auto_save_mode = new_mode
+            self.store.game_save_path = new_save_path
+            self.store.tracked_profiles = new_profiles
+            self.store.snapshot_companions = companions_var.get()
+            self.store.auto_save_storage = "chain" if chain_var.get() else "blob"
+            self.store.auto_save_skip_similar = skip_similar_var.get()
             
-            self.game_save_path = new_save_path
+            # 保存自动存档清理设置
+            self.store.retention_enabled = retention_var.get()
+            self.store.retention_policy = RetentionPolicy(keep_last, hourly_hours, daily_days, max_bytes)
+            
+            # 保存后台校验设置
+            scrub.enabled = scrub_var.get()
+            scrub.io_mb_per_s = io_mb_per_s
+            scrub.cpu_percent = cpu_percent
+            scrub.interval_minutes = interval_minutes
+            
+            # 保存截图存储设置, 切换格式时使用新格式的默认压缩等级
+            compress_level = policy.compress_level if format_var.get() == policy.format else None
+            self.store.screenshot_policy = ScreenshotPolicy(format_var.get(), quality, compress_level,
+                                                            max_size, policy.keep_alpha)
+            
+            # 保存预览缓存设置
+            self.preview_cache_mb = preview_cache_mb
+            self.preview_prefetch = preview_prefetch
+            self.preview_loader.cache.resize(self.preview_cache_mb * 1024 * 1024)
             self.save_config()
+            
+            # 设置全部生效后再重新开始后台任务
+            if restart_auto_save:
+                if new_enabled:
+                    self.start_auto_save()
+                else:
+                    self.stop_auto_save()
+            self.schedule_scrub()
+            self.run_retention()
             dialog.destroy()
         
         # 按钮区域
@@ -677,6 +1226,111 @@ class SaveManager:
         ttk.Button(btn_frame, text="保存", command=save_settings).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
     
+    def show_timing(self):
+        """显示保存、读取、删除和预览各步骤的耗时统计, 打开期间每秒刷新"""
+        dialog_width = 560
+        dialog_height = 400
+        x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("耗时统计")
+        dialog.geometry(f"{dialog_width}x{dialog_height}+{x}+{y}")
+        dialog.transient(self.root)
+        
+        enabled_var = tk.BooleanVar(value=self.store.timing_enabled)
+        
+        def toggle():
+            self.store.timing_enabled = enabled_var.get()
+            tracer.enabled = self.store.timing_enabled
+            self.save_config()
+        
+        ttk.Checkbutton(dialog, text="记录各步骤耗时(关闭时几乎没有开销)", variable=enabled_var,
+                        command=toggle).pack(fill=tk.X, padx=5, pady=5)
+        
+        columns = ("count", "mean", "p50", "p90", "p99", "max")
+        tree = ttk.Treeview(dialog, columns=columns)
+        tree.heading("#0", text="步骤")
+        tree.column("#0", width=170)
+        for column, title in zip(columns, ("次数", "平均(ms)", "P50", "P90", "P99", "最大")):
+            tree.heading(column, text=title)
+            tree.column(column, width=60, anchor=tk.E)
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(side=tk.BOTTOM, pady=5)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        
+        def refresh():
+            if not dialog.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for name, entry in tracer.stats().items():
+                tree.insert("", tk.END, text=name, values=(
+                    entry["count"], *(f"{entry[key]:.1f}" for key in columns[1:])))
+            dialog.after(TIMING_REFRESH_INTERVAL, refresh)
+        
+        def export():
+            path = filedialog.asksaveasfilename(
+                parent=dialog, title="导出耗时记录", defaultextension=".json",
+                filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+            if path:
+                try:
+                    count = tracer.export(path)
+                except OSError as e:
+                    messagebox.showerror("错误", f"导出失败: {str(e)}", parent=dialog)
+                    return
+                messagebox.showinfo("成功", f"已导出 {count} 条记录", parent=dialog)
+        
+        ttk.Button(btn_frame, text="清空", command=tracer.clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="导出", command=export).pack(side=tk.LEFT, padx=5)
+        refresh()
+
+    def show_jobs(self):
+        """显示自动存档和清理等后台任务的运行统计, 打开期间每秒刷新"""
+        dialog_width = 620
+        dialog_height = 240
+        x = self.root.winfo_x() + (self.root.winfo_width() - dialog_width) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - dialog_height) // 2
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("后台任务")
+        dialog.geometry(f"{dialog_width}x{dialog_height}+{x}+{y}")
+        dialog.transient(self.root)
+        
+        columns = ("runs", "skipped", "coalesced", "failures", "mean_ms", "max_ms", "next_in")
+        tree = ttk.Treeview(dialog, columns=columns)
+        tree.heading("#0", text="任务")
+        tree.column("#0", width=140)
+        for column, title in zip(columns, ("次数", "跳过", "合并", "失败", "平均(ms)", "最大", "下次(秒)")):
+            tree.heading(column, text=title)
+            tree.column(column, width=62, anchor=tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        def refresh():
+            if not dialog.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for name, entry in sorted(self.scheduler.stats().items()):
+                values = [entry[key] for key in columns[:4]]
+                values += [f"{entry[key]:.1f}" if entry[key] is not None else "" for key in columns[4:]]
+                if entry["running"]:
+                    values[-1] = "运行中"
+                tree.insert("", tk.END, text=name, values=values)
+            dialog.after(TIMING_REFRESH_INTERVAL, refresh)
+        
+        refresh()
+
+    def on_close(self):
+        """关闭窗口前等待正在保存的存档完成"""
+        self.stop_auto_save()
+        self.scheduler.stop()
+        self.preview_loader.stop()
+        self.gallery_loader.stop()
+        self.pipeline.shutdown(wait=True)
+        if self.capture_backend:
+            self.capture_backend.close()
+        self.root.destroy()
+    
     def run(self):
         self.root.mainloop()
 
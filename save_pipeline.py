@@ -0,0 +1,96 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_INTERVAL = 50  # 毫秒
+MAX_PENDING = 4
+ENCODE_WORKERS = 2
+
+
+class SaveJob:
+    """一次存档在关键路径上采集到的数据: 截图、游戏存档和档案附属文件的内容"""
+
+    def __init__(self, name, screenshot, game_data, timestamp, auto=False, companions=None, profile=None):
+        self.name = name
+        self.screenshot = screenshot
+        self.game_data = game_data
+        self.timestamp = timestamp
+        self.auto = auto
+        self.companions = companions
+        self.profile = profile
+        # 编码阶段填写: 截图感知哈希, 以及是否因与上一个自动存档相同而跳过
+        self.phash = None
+        self.skipped = False
+
+
+class SavePipeline:
+    """后台存档流水线
+
+    截图和读取游戏存档在主线程完成, 之后的图片编码在线程池中并行执行,
+    存储和写入索引在单独的提交线程中按提交顺序串行执行.
+    完成和失败的回调通过 root.after 轮询回到 Tk 主线程执行.
+    同时处理中的存档数量有上限, 队列满时 submit 直接返回 False 而不会阻塞
+    """
+
+    def __init__(self, root, encode, commit, workers=ENCODE_WORKERS, max_pending=MAX_PENDING):
+        self.root = root
+        self.encode = encode
+        self.commit = commit
+        self._encode_pool = ThreadPoolExecutor(workers, thread_name_prefix="save-encode")
+        # 单线程保证按提交顺序写入存储和索引
+        self._commit_pool = ThreadPoolExecutor(1, thread_name_prefix="save-commit")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._results = queue.Queue()
+        self._poll_job = self.root.after(POLL_INTERVAL, self._poll)
+
+    def submit(self, job, on_done=None, on_error=None):
+        """提交存档任务, 队列已满时返回 False"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._pending_lock:
+            self._pending += 1
+        encoded = self._encode_pool.submit(self.encode, job)
+        self._commit_pool.submit(self._run_commit, job, encoded, on_done, on_error)
+        return True
+
+    def _run_commit(self, job, encoded, on_done, on_error):
+        try:
+            result = self.commit(job, encoded.result())
+            self.post(on_done, result)
+        except Exception as e:
+            self.post(on_error, e)
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def post(self, callback, *args):
+        """从任意线程投递一个回调, 在 Tk 主线程中执行"""
+        if callback is not None:
+            self._results.put((callback, args))
+
+    def pending(self):
+        """正在处理中的存档数量"""
+        with self._pending_lock:
+            return self._pending
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, args = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                callback(*args)
+        finally:
+            self._poll_job = self.root.after(POLL_INTERVAL, self._poll)
+
+    def shutdown(self, wait=True):
+        """停止流水线, wait 为 True 时等待已提交的存档完成"""
+        self._encode_pool.shutdown(wait=wait)
+        self._commit_pool.shutdown(wait=wait)
+        if self._poll_job:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
@@ -0,0 +1,1045 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import zlib
+import tarfile
+import tempfile
+from datetime import datetime
+from collections import OrderedDict
+
+from blob_store import BlobStore, hash_file, is_digest
+from errors import SaveStoreError
+from game_profiles import PROFILE_COMPANIONS, profile_files, profile_name, profile_save_path, read_files
+from snapshot_chain import SnapshotChainStore, encode_delta
+from save_catalog import INDEXED_FIELDS, SaveCatalog, record_digests
+from jkr_decoder import decompress_jkr, read_metadata
+from save_diff import build_index, diff_tables, dump_index, load_index
+from retention import RetentionPolicy
+from scrubber import ScrubPolicy
+from safe_restore import RestoreJournal, replace_atomic
+from save_archive import ARCHIVE_MANIFEST, ARCHIVE_VERSION, ArchiveWriter, compress_member, copy_stream, \
+    ordered_map, read_archive
+from trash import TRASH_RETENTION_HOURS
+from tracing import tracer
+from screenshot_codec import FORMATS as SCREENSHOT_FORMATS, ScreenshotPolicy
+from thumbnails import PREVIEW_SIZE, SMALL_SIZE, get_thumbnail, make_thumbnails, remove_thumbnails, \
+    thumbnail_path
+from contact_sheets import ContactSheets
+
+CONFIG_FILE = "config.json"
+DEFAULT_GAME_SAVE_PATH = os.path.expandvars(r"%APPDATA%\Balatro\1\save.jkr")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+EXPORT_MANIFEST = "saves.json"
+# 不导出到存档包中的存档信息(只在本机有意义)
+LOCAL_FIELDS = ("game_save", "game_save_hash", "chain", "chain_index", "deleted_at", "damaged")
+# 截图哈希的汉明距离不超过这个值, 且解压后的游戏存档改动不超过这么多字节时认为几乎相同
+SIMILAR_HASH_DISTANCE = 4
+SIMILAR_SAVE_BYTES = 256
+# 校验时发现损坏的备份文件移到这个目录(saves/ 下), 不再被去重存储复用
+QUARANTINE_DIR = "quarantine"
+# 后台补生成缩略图时每次检查的存档数
+THUMBNAIL_BACKFILL_BATCH = 50
+# 连续比较多对存档时保留在内存中的解压后的存档数
+DIFF_CACHE_SAVES = 8
+
+
+def is_save_name(name):
+    """存档名称能否直接用作文件名(不含路径分隔符, 不是 . 或 ..)"""
+    return isinstance(name, str) and name not in ("", ".", "..") and \
+        "/" not in name and "\\" not in name and name == os.path.basename(name)
+
+
+def app_directory():
+    """程序所在目录, 存档和截图固定保存在这里"""
+    if getattr(sys, 'frozen', False):
+        # 如果是通过 PyInstaller 打包后的 .exe 文件
+        return os.path.dirname(sys.executable)
+    # 如果是源代码环境下
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+class SaveStore:
+    """不依赖界面的存档存储核心
+
+    负责配置、游戏存档备份(去重 blob 或快照链)、截图、存档信息索引,
+    以及保存、恢复、删除、清理、校验和导出. 图形界面和命令行都通过它操作存档,
+    所有方法都可以在非主线程调用
+    """
+
+    def __init__(self, base_dir=None, config_path=None):
+        self.base_dir = base_dir or app_directory()
+        self.saves_dir = os.path.join(self.base_dir, "saves")
+        self.screenshots_dir = os.path.join(self.base_dir, "screenshots")
+        self.thumbs_dir = os.path.join(self.screenshots_dir, "thumbs")
+        # 配置文件默认在程序所在目录, 与启动时的工作目录无关
+        self.config_path = config_path or os.path.join(self.base_dir, CONFIG_FILE)
+
+        # 加载配置
+        self.config = {}
+        self.load_config()
+
+        # 创建目录
+        os.makedirs(self.saves_dir, exist_ok=True)
+        os.makedirs(self.screenshots_dir, exist_ok=True)
+
+        # 游戏存档备份按内容哈希去重存储
+        self.blob_store = BlobStore(os.path.join(self.saves_dir, "blobs"))
+        self.snapshot_chains = SnapshotChainStore(
+            os.path.join(self.saves_dir, "chains"), self.snapshot_keyframe_interval)
+
+        # 存档信息统一保存在索引中, 首次启动时导入旧版本的 JSON 文件
+        self.catalog = SaveCatalog(os.path.join(self.saves_dir, "catalog.db"))
+        self.catalog.import_legacy(self.saves_dir)
+        # blob 的引用记录在索引中, 首次启动时从存档信息重建(替代旧版本的 refs.json)
+        if not self.catalog.get_meta("blob_refs_built"):
+            self.rebuild_blob_refs()
+        # 画廊使用的缩略图联系表, 在后台增量更新
+        self.contact_sheets = ContactSheets(self.catalog, os.path.join(self.screenshots_dir, "sheets"),
+                                            self.small_thumbnail)
+
+        # 读取存档前的游戏存档状态, 用于撤销读取
+        self.restore_journal = RestoreJournal(os.path.join(self.saves_dir, "restore_journal"))
+
+        # 截图哈希索引在第一次查找相似存档时建立
+        self._hash_index = None
+        # 各档案最近一次自动存档的 (游戏存档, 截图哈希), 用于跳过几乎相同的自动存档
+        self.last_auto_saves = {}
+
+    def load_config(self):
+        """加载配置, 配置文件不存在时写入默认配置
+
+        界面相关的配置项原样保留在 self.config 中
+        """
+        missing = False
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                self.config = json.load(f)
+        except FileNotFoundError:
+            # 旧版本的配置文件在工作目录下, 找到时迁移到新位置
+            self.config = {}
+            if os.path.abspath(CONFIG_FILE) != os.path.abspath(self.config_path):
+                try:
+                    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                        self.config = json.load(f)
+                except (OSError, ValueError):
+                    pass
+            missing = True
+        config = self.config
+        self.game_save_path = config.get('game_save_path', DEFAULT_GAME_SAVE_PATH)
+        # 同时备份和监视的其他档案(目录名, 如 "2"), game_save_path 所在的档案总是包含在内
+        self.tracked_profiles = [str(p) for p in config.get('tracked_profiles', [])]
+        # 保存时一起备份档案中的 profile.jkr 和 meta.jkr, 读取时一起恢复
+        self.snapshot_companions = config.get('snapshot_companions', True)
+        # 自动存档存储方式: blob 为完整备份去重, chain 为增量快照链
+        self.auto_save_storage = config.get('auto_save_storage', "blob")
+        self.snapshot_keyframe_interval = config.get('snapshot_keyframe_interval', 16)
+        # 截图存储格式和分辨率
+        self.screenshot_policy = ScreenshotPolicy.from_config(config)
+        # 自动存档保留策略, 默认不清理
+        self.retention_enabled = config.get('retention_enabled', False)
+        self.retention_policy = RetentionPolicy.from_config(config)
+        # 回收站中的存档保留的小时数, 之后由后台清理彻底删除
+        self.trash_retention_hours = config.get('trash_retention_hours', TRASH_RETENTION_HOURS)
+        # 读取存档的方式, 见 safe_restore.LINK_MODES
+        self.restore_link_mode = config.get('restore_link_mode', "auto")
+        # 画面和游戏存档都与上一个自动存档几乎相同时跳过
+        self.auto_save_skip_similar = config.get('auto_save_skip_similar', False)
+        self.similar_hash_distance = config.get('similar_hash_distance', SIMILAR_HASH_DISTANCE)
+        # 后台完整性校验的资源预算, 校验或读取时发现损坏的文件移到隔离目录
+        self.scrub_policy = ScrubPolicy.from_config(config)
+        self.scrub_quarantine = config.get('scrub_quarantine', True)
+        # 记录保存、读取、删除和预览各步骤的耗时
+        self.timing_enabled = config.get('timing_enabled', False)
+        tracer.enabled = self.timing_enabled
+        if missing:
+            self.save_config()
+
+    def save_config(self):
+        """保存配置(先写临时文件再替换)"""
+        config = dict(self.config)
+        config.update({
+            'game_save_path': self.game_save_path,
+            'tracked_profiles': self.tracked_profiles,
+            'snapshot_companions': self.snapshot_companions,
+            'auto_save_storage': self.auto_save_storage,
+            'snapshot_keyframe_interval': self.snapshot_keyframe_interval,
+            'restore_link_mode': self.restore_link_mode,
+            'trash_retention_hours': self.trash_retention_hours,
+            'auto_save_skip_similar': self.auto_save_skip_similar,
+            'similar_hash_distance': self.similar_hash_distance,
+            'scrub_quarantine': self.scrub_quarantine,
+            'timing_enabled': self.timing_enabled
+        })
+        config.update(self.scrub_policy.to_config())
+        config.update(self.screenshot_policy.to_config())
+        config['retention_enabled'] = self.retention_enabled
+        config.update(self.retention_policy.to_config())
+        self.config = config
+        tmp_path = self.config_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4)
+        os.replace(tmp_path, self.config_path)
+
+    def primary_profile(self):
+        """game_save_path 所在的档案"""
+        return profile_name(self.game_save_path)
+
+    def profiles(self):
+        """备份的全部档案, game_save_path 所在的档案在前"""
+        return list(dict.fromkeys([self.primary_profile()] + self.tracked_profiles))
+
+    def profile_path(self, profile=None):
+        """档案中游戏存档的路径, profile 为None时为 game_save_path"""
+        if profile is None or profile == self.primary_profile():
+            return self.game_save_path
+        return profile_save_path(self.game_save_path, profile)
+
+    def read_game_save(self, profile=None):
+        """读取游戏存档内容"""
+        try:
+            with tracer.span("save.read_game_save"), open(self.profile_path(profile), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise SaveStoreError("找不到游戏存档文件！")
+
+    def read_snapshot(self, profile=None):
+        """读取档案的一致快照, 返回 (游戏存档, {附属文件名: 内容})
+
+        snapshot_companions 关闭时只读取游戏存档
+        """
+        if not self.snapshot_companions:
+            return self.read_game_save(profile), {}
+        game_path = self.profile_path(profile)
+        with tracer.span("save.read_game_save"):
+            contents = read_files(profile_files(game_path))
+        game_data = contents.pop(os.path.basename(game_path), None)
+        if game_data is None:
+            raise SaveStoreError("找不到游戏存档文件！")
+        return game_data, contents
+
+    def encode_screenshot(self, name, screenshot):
+        """按存储策略编码截图并生成预览缩略图, 返回截图路径"""
+        policy = self.screenshot_policy
+        with tracer.span("save.prepare_screenshot"):
+            screenshot = policy.prepare(screenshot)
+        screenshot_path = os.path.join(self.screenshots_dir, f"{name}{policy.extension}")
+        with tracer.span("save.encode_screenshot"):
+            policy.encode_to(screenshot, screenshot_path)
+        with tracer.span("save.thumbnails"):
+            make_thumbnails(screenshot, name, self.thumbs_dir)
+        return screenshot_path
+
+    def is_similar_auto_save(self, game_data, phash, profile=None):
+        """画面和游戏存档是否都与该档案上一个自动存档几乎相同
+
+        截图哈希的汉明距离不超过 similar_hash_distance, 且解压后的游戏存档
+        改动不超过 SIMILAR_SAVE_BYTES 字节(增量编码超出时提前结束, 不会比较整个存档)
+        """
+        last = self.last_auto_saves.get(profile or self.primary_profile())
+        if last is None or phash is None or last[1] is None:
+            return False
+        from perceptual_hash import hamming
+        if hamming(phash, last[1]) > self.similar_hash_distance:
+            return False
+        if game_data == last[0]:
+            return True
+        try:
+            base = decompress_jkr(last[0])
+            target = decompress_jkr(game_data)
+        except ValueError:
+            return False
+        return encode_delta(base, target, max_literal=SIMILAR_SAVE_BYTES) is not None
+
+    def commit(self, name, game_data, screenshot_path=None, timestamp=None, auto=False, run=None, phash=None,
+               companions=None, profile=None):
+        """写入游戏存档备份和存档信息, 返回存档信息
+
+        同名存档会被覆盖. phash 为截图的感知哈希, companions 为档案附属文件 {文件名: 内容},
+        profile 为所属档案(默认为 game_save_path 所在的档案).
+        多个线程同时提交时需要由调用方保证顺序
+        """
+        profile = profile or self.primary_profile()
+        # 覆盖时先记下旧存档引用的blob, 回收站中的同名存档也会被覆盖
+        old_data = self.catalog.get(name, include_trashed=True)
+
+        save_data = {
+            "name": name,
+            "timestamp": timestamp or datetime.now().strftime(TIMESTAMP_FORMAT),
+            "screenshot": screenshot_path,
+            "auto": auto,
+            "size": len(game_data) + (os.path.getsize(screenshot_path) if screenshot_path else 0),
+            "profile": profile
+        }
+        if phash is not None:
+            save_data["phash"] = format(phash, "016x")
+        if screenshot_path:
+            # 截图的校验和, 后台校验时用于发现损坏的截图
+            with tracer.span("save.checksum"):
+                save_data["screenshot_hash"] = hash_file(screenshot_path)
+
+        # 解析对局信息(种子、底注、金钱等)用于显示和搜索
+        try:
+            with tracer.span("save.read_metadata"):
+                save_data["meta"] = read_metadata(game_data)
+        except ValueError:
+            save_data["meta"] = {}
+
+        if auto and run:
+            # 记录所属的局, 保留策略不会删除一局的首尾存档; 换了种子就是新的一局
+            if profile != self.primary_profile():
+                run = f"{run}_p{profile}"
+            if save_data["meta"].get("seed"):
+                run = f"{run}_{save_data['meta']['seed']}"
+            save_data["run"] = run
+
+        # 自动存档可以保存为同一局内的增量快照
+        if auto and run and self.auto_save_storage == "chain":
+            try:
+                save_data["chain"] = save_data["run"]
+                with tracer.span("save.store_game_save"):
+                    save_data["chain_index"] = self.snapshot_chains.append(save_data["run"], game_data)
+            except ValueError:
+                # 无法解压的存档退回到普通存储
+                del save_data["chain"]
+
+        # 按内容哈希存储游戏存档和附属文件, 内容相同时不会重复写入;
+        # 附属文件很少变化, 通常只增加一次引用
+        companion_names = sorted(companions or ())
+        blobs = [companions[file_name] for file_name in companion_names]
+        if "chain" not in save_data:
+            blobs.append(game_data)
+        # 从写入 blob 到写入索引之间持有锁, 清理不会删除刚被这个存档引用的 blob
+        with self.blob_store.lock:
+            blob_sizes = {}
+            if blobs:
+                with tracer.span("save.store_game_save"):
+                    digests = self.blob_store.put_many(blobs)
+                blob_sizes = dict(zip(digests, (len(data) for data in blobs)))
+                if companion_names:
+                    save_data["companions"] = dict(zip(companion_names, digests))
+                if "chain" not in save_data:
+                    save_data["game_save"] = self.blob_store.path_for(digests[-1])
+                    save_data["game_save_hash"] = digests[-1]
+
+            if old_data:
+                # 截图可能已经改变, 画廊联系表中重新加入
+                self.catalog.drop_atlas_tiles([name])
+            with tracer.span("save.catalog_put"):
+                # 引用与存档信息在同一个事务中写入
+                self.catalog.put(save_data, blob_sizes)
+        if auto:
+            self.last_auto_saves[profile] = (game_data, phash)
+
+        if old_data:
+            self.release_game_save(name, old_data)
+            # 截图格式改变时删除旧截图
+            old_screenshot = old_data.get("screenshot")
+            if old_screenshot and old_screenshot != screenshot_path and os.path.exists(old_screenshot):
+                os.remove(old_screenshot)
+        return save_data
+
+    def save(self, name, screenshot=None, game_data=None, auto=False, run=None, profile=None):
+        """一次完成存档: 读取档案快照(未提供游戏存档时)、编码截图并提交"""
+        companions = None
+        if game_data is None:
+            game_data, companions = self.read_snapshot(profile)
+        screenshot_path = None
+        phash = None
+        if screenshot is not None:
+            from perceptual_hash import image_hash
+            with tracer.span("save.phash"):
+                phash = image_hash(screenshot)
+            screenshot_path = self.encode_screenshot(name, screenshot)
+        return self.commit(name, game_data, screenshot_path, auto=auto, run=run, phash=phash,
+                           companions=companions, profile=profile)
+
+    def get(self, name):
+        """读取存档信息, 不存在时返回None"""
+        return self.catalog.get(name)
+
+    def records(self):
+        """按名称排序的全部存档信息"""
+        return self.catalog.records()
+
+    def read_game_data(self, save_data):
+        """读取存档对应的 .jkr 数据"""
+        if save_data.get("chain"):
+            # 从快照链重建存档
+            try:
+                return self.snapshot_chains.read_jkr(save_data["chain"], save_data["chain_index"])
+            except FileNotFoundError:
+                raise SaveStoreError("找不到存档文件！")
+        game_save = save_data.get("game_save")
+        if not game_save or not os.path.exists(game_save):
+            raise SaveStoreError("找不到存档文件！")
+        with open(game_save, 'rb') as f:
+            return f.read()
+
+    def restore(self, name, profile=None):
+        """将存档恢复到游戏存档路径, 返回 (存档信息, 使用的恢复方式)
+
+        默认恢复到存档所属的档案, 档案附属文件一起恢复. 恢复前把这些文件的当前内容
+        记入日志, 可以用 undo_restore 撤销. 每个文件通过临时文件和 os.replace 原子替换,
+        中途失败时已替换的文件按日志恢复原状
+        """
+        save_data = self.catalog.get(name)
+        if not save_data:
+            raise SaveStoreError(f"存档不存在: {name}")
+        companions = save_data.get("companions", {})
+        for file_name, digest in companions.items():
+            if not self.blob_store.has(digest):
+                raise SaveStoreError(f"找不到档案文件: {file_name}")
+        # 覆盖游戏存档前校验备份的哈希和压缩数据, 损坏的存档不会被恢复
+        with tracer.span("restore.verify"):
+            game_data, problems, damaged = self._read_checked(save_data)
+            if game_data is None and not problems:
+                raise SaveStoreError("找不到存档文件！")
+            companion_problems, companion_damaged, _ = self._check_companions(save_data)
+        if problems or companion_problems:
+            self.mark_damaged(save_data, problems + companion_problems, damaged + companion_damaged)
+            raise SaveStoreError(f"存档已损坏, 没有恢复: {(problems + companion_problems)[0]}")
+        source = None
+        if not save_data.get("chain"):
+            # 去重存储的备份是完整文件, 可以直接克隆或链接
+            source = save_data.get("game_save")
+            game_data = None
+
+        game_path = self.profile_path(profile or save_data.get("profile"))
+        profile_dir = os.path.dirname(os.path.abspath(game_path))
+        # 只恢复存档中有的附属文件, 其余文件保持不变
+        companion_targets = [(os.path.join(profile_dir, file_name), self.blob_store.path_for(companions[file_name]))
+                             for file_name in sorted(companions)]
+        with tracer.span("restore.journal"):
+            entry = self.restore_journal.record([game_path] + [path for path, _ in companion_targets], name)
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            with tracer.span("restore.replace"):
+                used = replace_atomic(game_path, game_data, source, self.restore_link_mode)
+                for path, companion_source in companion_targets:
+                    replace_atomic(path, source=companion_source, mode=self.restore_link_mode)
+        except OSError as e:
+            if entry:
+                # 把已经替换的文件恢复原状
+                try:
+                    self.restore_journal.undo(self.restore_link_mode)
+                except OSError:
+                    pass
+            raise SaveStoreError(f"恢复存档失败: {str(e)}")
+        return save_data, used
+
+    def undo_restore(self):
+        """撤销最近一次读取存档, 返回日志记录"""
+        try:
+            entry = self.restore_journal.undo(self.restore_link_mode)
+        except OSError as e:
+            raise SaveStoreError(f"撤销读取失败: {str(e)}")
+        if entry is None:
+            raise SaveStoreError("没有可以撤销的读取")
+        return entry
+
+    def diff_source(self, save_data):
+        """读取并解压存档, 返回 (解压后的数据, 子表哈希树)
+
+        哈希树在第一次比较时建立并保存到索引库, 内容相同的存档共用
+        """
+        game_data = self.read_game_data(save_data)
+        digest = save_data.get("game_save_hash") if not save_data.get("chain") else None
+        digest = digest or hashlib.sha256(game_data).hexdigest()
+        try:
+            raw = decompress_jkr(game_data)
+            data = self.catalog.get_tree_index(digest)
+            index = load_index(data) if data is not None else None
+            if index is not None:
+                return raw, index
+            with tracer.span("diff.build_index"):
+                index = build_index(raw)
+        except ValueError:
+            raise SaveStoreError(f"无法解析存档: {save_data['name']}")
+        self.catalog.put_tree_index(save_data["name"], digest, dump_index(index))
+        return raw, index
+
+    def diff_pairs(self, pairs):
+        """依次比较多对存档, 产出 (旧存档信息, 新存档信息, 变化列表)
+
+        变化列表的格式见 save_diff.diff_tables. 最近用过的存档保留在内存中,
+        比较时间线上相邻的存档时每个存档只读取一次
+        """
+        loaded = OrderedDict()
+
+        def load(name):
+            if name in loaded:
+                loaded.move_to_end(name)
+                return loaded[name]
+            save_data = self.catalog.get(name)
+            if not save_data:
+                raise SaveStoreError(f"存档不存在: {name}")
+            loaded[name] = (save_data,) + self.diff_source(save_data)
+            if len(loaded) > DIFF_CACHE_SAVES:
+                loaded.popitem(last=False)
+            return loaded[name]
+
+        for name_a, name_b in pairs:
+            save_a, raw_a, index_a = load(name_a)
+            save_b, raw_b, index_b = load(name_b)
+            try:
+                with tracer.span("diff.compare"):
+                    changes = diff_tables(raw_a, raw_b, index_a, index_b)
+            except ValueError:
+                raise SaveStoreError(f"无法解析存档: {name_a} / {name_b}")
+            yield save_a, save_b, changes
+
+    def diff(self, name_a, name_b):
+        """比较两个存档, 返回从 name_a 到 name_b 的变化列表"""
+        return next(self.diff_pairs([(name_a, name_b)]))[2]
+
+    def timeline(self, names):
+        """依次比较相邻的存档(如一局的自动存档), 产出同 diff_pairs"""
+        return self.diff_pairs(zip(names, names[1:]))
+
+    def release_game_save(self, save_name, save_data):
+        """释放存档引用的游戏存档备份和档案附属文件"""
+        self.release_game_saves([dict(save_data, name=save_name)])
+
+    def _release_backup(self, save_data):
+        """释放快照链或旧版本的完整备份(去重 blob 由调用方批量释放)"""
+        save_name = save_data["name"]
+        if save_data.get("chain"):
+            self.snapshot_chains.release(save_data["chain"], save_data["chain_index"])
+        else:
+            # 旧版本存档直接保存了完整的.jkr副本
+            game_save_backup = os.path.join(self.saves_dir, f"{save_name}.jkr")
+            if os.path.exists(game_save_backup):
+                os.remove(game_save_backup)
+
+    def release_game_saves(self, records):
+        """释放一批已从索引中删除或被覆盖的存档的游戏存档备份和档案附属文件
+
+        blob 的引用已随存档信息一起更新, 这里只删除不再被任何存档引用的 blob
+        """
+        digests = []
+        for save_data in records:
+            digests.extend(record_digests(save_data))
+            if not save_data.get("game_save_hash") or save_data.get("chain"):
+                self._release_backup(save_data)
+        with self.blob_store.lock:
+            self.blob_store.remove_many(self.catalog.unreferenced(digests))
+
+    def rebuild_blob_refs(self):
+        """从存档索引重建 blob 的引用并删除不再被引用的 blob 文件, 返回删除的文件数
+
+        首次启动时由此迁移旧版本的 refs.json, 之后可用于修复
+        """
+        def size_of(digest):
+            try:
+                return os.path.getsize(self.blob_store.path_for(digest))
+            except OSError:
+                return None
+
+        with self.blob_store.lock:
+            referenced = self.catalog.rebuild_blob_refs(size_of)
+            removed = self.blob_store.remove_many(
+                [digest for digest in self.blob_store.digests() if digest not in referenced])
+            self.blob_store.remove_legacy_refs()
+        return removed
+
+    def delete(self, save_names):
+        """把一批存档移入回收站, 返回被删除的存档信息
+
+        只在一个事务中更新索引, 文件由 purge 在之后清理, 清理前可以用 undelete 恢复
+        """
+        with tracer.span("delete.trash"):
+            return self.catalog.trash(save_names, datetime.now().strftime(TIMESTAMP_FORMAT))
+
+    def undelete(self, save_names):
+        """从回收站恢复存档, 返回被恢复的存档信息"""
+        return self.catalog.untrash(save_names)
+
+    def trashed(self, before=None):
+        """回收站中的存档信息, 按删除时间排序"""
+        return self.catalog.trashed(before)
+
+    def purge(self, save_names):
+        """彻底删除回收站中的存档及其文件, 返回被删除的存档信息"""
+        with tracer.span("delete.purge_catalog"):
+            removed = self.catalog.purge(save_names)
+        # 释放游戏存档备份, 最后一个引用删除时才删除blob
+        self.release_game_saves(removed)
+        for save_data in removed:
+            # 删除截图
+            screenshot_path = save_data.get("screenshot")
+            if screenshot_path and os.path.exists(screenshot_path):
+                os.remove(screenshot_path)
+            remove_thumbnails(save_data["name"], self.thumbs_dir)
+        return removed
+
+    def prune(self, policy=None, dry_run=False):
+        """按保留策略把自动存档移入回收站, 返回被删除(dry_run 时为将被删除)的存档信息
+
+        为满足空间预算删除的存档直接彻底删除, 不在回收站中等待
+        """
+        by_age, over_budget = (policy or self.retention_policy).select(self.catalog.records())
+        if dry_run:
+            return by_age + over_budget
+        removed = self.delete([r["name"] for r in by_age + over_budget])
+        over_budget = set(r["name"] for r in over_budget)
+        self.purge([r["name"] for r in removed if r["name"] in over_budget])
+        return removed
+
+    def _read_checked(self, save_data):
+        """读取并校验游戏存档, 返回 (数据, 问题列表, 损坏的 blob 路径)
+
+        检查哈希是否与记录的一致, 以及压缩数据是否完整(能完整解压). 文件不存在时数据为None,
+        不算作问题, 由调用方处理
+        """
+        try:
+            # 快照链在重建时已校验哈希
+            game_data = self.read_game_data(save_data)
+        except SaveStoreError:
+            return None, [], []
+        except (ValueError, OSError, zlib.error) as e:
+            return None, [f"无法读取游戏存档: {str(e)}"], []
+        digest = save_data.get("game_save_hash")
+        if digest and not save_data.get("chain") and hashlib.sha256(game_data).hexdigest() != digest:
+            return game_data, ["游戏存档哈希不一致"], [save_data["game_save"]]
+        try:
+            decompress_jkr(game_data)
+        except ValueError as e:
+            return game_data, [f"游戏存档无法解压: {str(e)}"], []
+        return game_data, [], []
+
+    def _check_companions(self, save_data):
+        """校验档案附属文件, 返回 (问题列表, 损坏的 blob 路径, 读取的字节数)"""
+        missing = []
+        damaged = []
+        size = 0
+        for file_name, digest in sorted(save_data.get("companions", {}).items()):
+            path = self.blob_store.path_for(digest)
+            if not self.blob_store.has(digest) or not os.path.exists(path):
+                missing.append(file_name)
+                continue
+            size += os.path.getsize(path)
+            if hash_file(path) != digest:
+                missing.append(file_name)
+                damaged.append(path)
+        problems = [f"档案文件缺失或损坏: {', '.join(missing)}"] if missing else []
+        return problems, damaged, size
+
+    def check_save(self, save_data):
+        """校验一个存档的全部文件, 返回 (问题列表, 损坏的文件路径, 读取的字节数)
+
+        游戏存档: 哈希和压缩数据; 档案附属文件: 哈希; 截图: 是否存在, 有校验和时检查校验和
+        """
+        game_data, problems, damaged = self._read_checked(save_data)
+        if game_data is None and not problems:
+            problems.append("找不到游戏存档文件")
+        size = len(game_data) if game_data else 0
+        companion_problems, companion_damaged, companion_size = self._check_companions(save_data)
+        problems += companion_problems
+        damaged += companion_damaged
+        size += companion_size
+        screenshot_path = save_data.get("screenshot")
+        if screenshot_path:
+            if not os.path.exists(screenshot_path):
+                problems.append("截图不存在")
+            elif save_data.get("screenshot_hash"):
+                size += os.path.getsize(screenshot_path)
+                if hash_file(screenshot_path) != save_data["screenshot_hash"]:
+                    problems.append("截图校验和不一致")
+                    damaged.append(screenshot_path)
+        return problems, damaged, size
+
+    def verify(self, names=None):
+        """校验存档文件是否完整, 返回 [(名称, 问题)]
+
+        检查游戏存档备份能否读取、哈希是否一致、能否解压, 档案附属文件是否完整,
+        以及截图是否存在、是否与校验和一致. 只报告问题, 不修改存档
+        """
+        if names is None:
+            records = self.catalog.records()
+        else:
+            records = []
+            for name in names:
+                save_data = self.catalog.get(name)
+                if save_data:
+                    records.append(save_data)
+                else:
+                    records.append({"name": name, "missing": True})
+        problems = []
+        for save_data in records:
+            name = save_data["name"]
+            if save_data.get("missing"):
+                problems.append((name, "存档不存在"))
+                continue
+            problems.extend((name, problem) for problem in self.check_save(save_data)[0])
+        return problems
+
+    def scrub(self, name):
+        """后台校验一个存档并更新它的损坏标记, 返回 (问题列表, 读取的字节数, 隔离的文件数)
+
+        旧存档没有截图校验和时补记. 发现损坏时按 scrub_quarantine 隔离损坏的文件
+        """
+        save_data = self.catalog.get(name)
+        if not save_data:
+            return [], 0, 0
+        problems, damaged, size = self.check_save(save_data)
+        screenshot_path = save_data.get("screenshot")
+        changed = False
+        quarantined = 0
+        if screenshot_path and not save_data.get("screenshot_hash") and os.path.exists(screenshot_path):
+            save_data["screenshot_hash"] = hash_file(screenshot_path)
+            size += os.path.getsize(screenshot_path)
+            changed = True
+        if problems:
+            quarantined = self.mark_damaged(save_data, problems, damaged)
+        elif save_data.pop("damaged", None) or changed:
+            # 之前损坏的文件已经被新的相同内容修复
+            self.catalog.put(save_data)
+        return problems, size, quarantined
+
+    def mark_damaged(self, save_data, problems, damaged=()):
+        """标记存档已损坏, scrub_quarantine 开启时把损坏的文件移到隔离目录, 返回隔离的文件数
+
+        损坏的 blob 不再留在原位置, 之后内容相同的存档会重新写入正确的数据
+        """
+        quarantined = 0
+        if self.scrub_quarantine:
+            quarantine_dir = os.path.join(self.saves_dir, QUARANTINE_DIR)
+            for path in damaged:
+                if os.path.exists(path):
+                    os.makedirs(quarantine_dir, exist_ok=True)
+                    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+                    os.replace(path, os.path.join(quarantine_dir, f"{stamp}_{os.path.basename(path)}"))
+                    quarantined += 1
+        reason = "; ".join(problems)
+        if save_data.get("damaged") != reason:
+            save_data["damaged"] = reason
+            self.catalog.put(save_data)
+        return quarantined
+
+    def export(self, names, dest_dir):
+        """导出存档到目录, 返回导出的存档信息
+
+        每个存档导出为 <名称>.jkr、档案附属文件 <名称>.<文件名> 和截图,
+        saves.json 记录存档信息(路径为相对路径)
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+        exported = []
+        for name in names:
+            save_data = self.catalog.get(name)
+            if not save_data:
+                raise SaveStoreError(f"存档不存在: {name}")
+            record = dict((k, v) for k, v in save_data.items()
+                          if k not in ("game_save", "game_save_hash", "chain", "chain_index"))
+            with open(os.path.join(dest_dir, f"{name}.jkr"), 'wb') as f:
+                f.write(self.read_game_data(save_data))
+            record["game_save"] = f"{name}.jkr"
+            if save_data.get("companions"):
+                record["companions"] = {}
+                for file_name, digest in save_data["companions"].items():
+                    record["companions"][file_name] = f"{name}.{file_name}"
+                    shutil.copy2(self.blob_store.path_for(digest), os.path.join(dest_dir, record["companions"][file_name]))
+            screenshot_path = save_data.get("screenshot")
+            if screenshot_path and os.path.exists(screenshot_path):
+                record["screenshot"] = os.path.basename(screenshot_path)
+                shutil.copy2(screenshot_path, os.path.join(dest_dir, record["screenshot"]))
+            else:
+                record["screenshot"] = None
+            exported.append(record)
+        with open(os.path.join(dest_dir, EXPORT_MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(exported, f, ensure_ascii=False, indent=4)
+        return exported
+
+    def screenshot_index(self):
+        """截图哈希索引, 第一次使用时从索引库加载, 之后随存档的增删更新"""
+        if self._hash_index is None:
+            from perceptual_hash import HashIndex, parse_hash
+            index = HashIndex(self.catalog.phashes())
+
+            def on_change(op, names):
+                if op == "remove":
+                    index.remove(names)
+                    return
+                for name in names:
+                    save_data = self.catalog.get(name)
+                    if save_data and save_data.get("phash"):
+                        index.add(name, parse_hash(save_data["phash"]))
+                    else:
+                        index.remove([name])
+
+            self.catalog.add_listener(on_change)
+            self._hash_index = index
+        return self._hash_index
+
+    def similar(self, name, limit=10, max_distance=None):
+        """查找截图与指定存档相似的存档, 返回按差异排序的 [(名称, 汉明距离)]"""
+        from perceptual_hash import SIMILAR_DISTANCE
+        index = self.screenshot_index()
+        phash = index.get(name)
+        if phash is None:
+            if not self.catalog.get(name):
+                raise SaveStoreError(f"存档不存在: {name}")
+            raise SaveStoreError(f"存档没有截图哈希: {name}")
+        return index.query(phash, limit, max_distance or SIMILAR_DISTANCE, exclude=name)
+
+    def hash_screenshots(self, names=None):
+        """为还没有截图哈希的存档计算哈希(旧版本的存档), 返回处理的数量"""
+        from PIL import Image
+        from perceptual_hash import format_hash, image_hash
+        records = self.catalog.records() if names is None else \
+            [r for r in (self.catalog.get(name) for name in names) if r]
+        updated = []
+        for save_data in records:
+            screenshot_path = save_data.get("screenshot")
+            if save_data.get("phash") or not screenshot_path or not os.path.exists(screenshot_path):
+                continue
+            try:
+                with Image.open(screenshot_path) as img:
+                    # JPEG 可以在解码时直接缩小
+                    img.draft("RGB", (img.width // 8, img.height // 8))
+                    save_data["phash"] = format_hash(image_hash(img))
+            except OSError:
+                continue
+            updated.append(save_data)
+        self.catalog.put_many(updated)
+        return len(updated)
+
+    def backfill_thumbnails(self, limit=THUMBNAIL_BACKFILL_BATCH):
+        """为旧存档补生成缩略图, 每次从上次的位置继续检查 limit 个存档, 返回生成的数量
+
+        检查到最后一个存档后从头开始, 位置保存在索引中
+        """
+        cursor = self.catalog.get_meta("thumbnail_cursor")
+        names = self.catalog.names_after(cursor, limit)
+        generated = 0
+        for name in names:
+            save_data = self.catalog.get(name)
+            screenshot_path = save_data.get("screenshot") if save_data else None
+            if not screenshot_path or os.path.exists(thumbnail_path(self.thumbs_dir, name, PREVIEW_SIZE)):
+                continue
+            try:
+                if get_thumbnail(screenshot_path, name, self.thumbs_dir):
+                    generated += 1
+            except OSError:
+                continue
+        self.catalog.set_meta("thumbnail_cursor", names[-1] if len(names) == limit else None)
+        return generated
+
+    def small_thumbnail(self, name):
+        """存档的小缩略图路径(画廊使用), 没有截图时返回None"""
+        save_data = self.catalog.get(name)
+        screenshot_path = save_data.get("screenshot") if save_data else None
+        if not screenshot_path:
+            return None
+        return get_thumbnail(screenshot_path, name, self.thumbs_dir, SMALL_SIZE)
+
+    def export_archive(self, names, path, workers=None):
+        """把存档导出为一个存档包, 返回导出的存档信息
+
+        游戏存档和档案附属文件按哈希只保存一份(blobs/<哈希>.jkr), 截图保存在 screenshots/ 下,
+        存档信息中的路径都是存档包内的相对路径. 成员在多个线程中读取和压缩后按顺序写出,
+        内存中只有少量待写出的成员, 也不需要临时目录; 清单在最后写入
+        """
+        records = []
+        owners = set()
+        seen = set()
+        # 附属文件: 哈希 -> 第一个引用它的存档
+        companion_owners = {}
+        for name in names:
+            save_data = self.catalog.get(name)
+            if not save_data:
+                raise SaveStoreError(f"存档不存在: {name}")
+            # 已知哈希的游戏存档只由第一个引用它的存档读取
+            digest = save_data.get("game_save_hash")
+            if digest and digest not in seen:
+                seen.add(digest)
+                owners.add(name)
+            for companion_digest in save_data.get("companions", {}).values():
+                companion_owners.setdefault(companion_digest, name)
+            records.append(save_data)
+
+        def pack(save_data):
+            name = save_data["name"]
+            digest = save_data.get("game_save_hash")
+            game_member = None
+            if not digest or name in owners:
+                game_data = self.read_game_data(save_data)
+                digest = digest or hashlib.sha256(game_data).hexdigest()
+                game_member = compress_member(game_data)
+            screenshot_member = None
+            screenshot_path = save_data.get("screenshot")
+            if screenshot_path and os.path.exists(screenshot_path):
+                with open(screenshot_path, 'rb') as f:
+                    screenshot_member = (os.path.basename(screenshot_path), compress_member(f.read()))
+            companion_members = []
+            for companion_digest in save_data.get("companions", {}).values():
+                if companion_owners[companion_digest] == name:
+                    with open(self.blob_store.path_for(companion_digest), 'rb') as f:
+                        companion_members.append((companion_digest, compress_member(f.read())))
+            return save_data, digest, game_member, screenshot_member, companion_members
+
+        exported = []
+        written = set()
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                writer = ArchiveWriter(f)
+                for save_data, digest, game_member, screenshot_member, companion_members in \
+                        ordered_map(pack, records, workers):
+                    record = dict((k, v) for k, v in save_data.items() if k not in LOCAL_FIELDS)
+                    record["game_save"] = f"blobs/{digest}.jkr"
+                    record["game_save_hash"] = digest
+                    for member_digest, member in [(digest, game_member)] + companion_members:
+                        if member and member_digest not in written:
+                            writer.add(f"blobs/{member_digest}.jkr", *member)
+                            written.add(member_digest)
+                    if screenshot_member:
+                        record["screenshot"] = f"screenshots/{screenshot_member[0]}"
+                        writer.add(record["screenshot"], *screenshot_member[1])
+                    else:
+                        record["screenshot"] = None
+                    exported.append(record)
+                writer.close({"version": ARCHIVE_VERSION, "saves": exported})
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return exported
+
+    def import_archive(self, path, overwrite=False):
+        """导入存档包, 返回 (导入的存档信息, 跳过的存档名称)
+
+        存档包按顺序流式读取, 本地已有的游戏存档不读取数据直接跳过, 其余写入
+        saves/ 下的临时目录并校验哈希, 读到清单后在一个事务中写入索引.
+        overwrite 为 False 时跳过同名存档
+        """
+        staging = tempfile.mkdtemp(prefix="import_", dir=self.saves_dir)
+        staged_blobs = {}
+        staged_screenshots = {}
+        manifest = None
+        try:
+            try:
+                with open(path, 'rb') as f:
+                    for member, stream in read_archive(f):
+                        folder, _, file_name = member.partition("/")
+                        if member == ARCHIVE_MANIFEST:
+                            manifest = json.loads(stream.read().decode('utf-8'))
+                        elif folder == "blobs" and file_name.endswith(".jkr"):
+                            digest = file_name[:-len(".jkr")]
+                            # 先检查哈希格式, 成员名不能带有路径
+                            if not is_digest(digest):
+                                raise SaveStoreError(f"存档包已损坏: {member} 不是有效的哈希")
+                            if digest in staged_blobs or self.blob_store.has(digest):
+                                continue
+                            staged_path = os.path.join(staging, digest)
+                            if copy_stream(stream, staged_path) != digest:
+                                raise SaveStoreError(f"存档包已损坏: {member} 哈希不一致")
+                            staged_blobs[digest] = staged_path
+                        elif folder == "screenshots" and file_name and file_name == os.path.basename(file_name):
+                            staged_path = os.path.join(staging, "screenshot_" + file_name)
+                            staged_screenshots[member] = (staged_path, copy_stream(stream, staged_path))
+            except (tarfile.TarError, zlib.error, ValueError) as e:
+                raise SaveStoreError(f"无法读取存档包: {str(e)}")
+            if not manifest or manifest.get("version") != ARCHIVE_VERSION:
+                raise SaveStoreError("不是有效的存档包")
+            from perceptual_hash import is_hash_text
+            # 清单中的名称和哈希会拼接为路径, 写入任何文件前全部检查
+            for record in manifest["saves"]:
+                if not isinstance(record, dict) or not is_save_name(record.get("name")):
+                    raise SaveStoreError("存档包已损坏: 存档名称无效")
+                companions = record.get("companions") or {}
+                if not is_digest(record.get("game_save_hash")) or not isinstance(companions, dict) or \
+                        not all(is_digest(digest) for digest in companions.values()):
+                    raise SaveStoreError(f"存档包已损坏: {record['name']} 的哈希无效")
+                # 截图感知哈希和对局信息存入索引的单独列, 格式不对时写入索引会失败
+                if record.get("phash") and not is_hash_text(record["phash"]):
+                    raise SaveStoreError(f"存档包已损坏: {record['name']} 的截图哈希无效")
+                meta = record.get("meta", {})
+                if not isinstance(meta, dict) or not all(isinstance(meta.get(field), (str, int, float, type(None)))
+                                                         for field, _ in INDEXED_FIELDS):
+                    raise SaveStoreError(f"存档包已损坏: {record['name']} 的对局信息无效")
+            screenshot_extensions = set(extension for _, extension, _ in SCREENSHOT_FORMATS.values())
+
+            imported = []
+            imported_names = set()
+            skipped = []
+            replaced = []
+            digests = []
+            sizes = {}
+            # 从移入 blob 到写入索引之间持有锁, 清理不会删除刚被导入的存档引用的 blob
+            with self.blob_store.lock:
+                for record in manifest["saves"]:
+                    name = record["name"]
+                    digest = record.get("game_save_hash")
+                    if name in imported_names or (not overwrite and self.catalog.get(name)):
+                        skipped.append(name)
+                        continue
+                    if digest in staged_blobs:
+                        sizes[digest] = self.blob_store.adopt(digest, staged_blobs.pop(digest))
+                    elif not self.blob_store.has(digest):
+                        # 存档包中缺少游戏存档
+                        skipped.append(name)
+                        continue
+                    digests.append(digest)
+
+                    # 只在本机有意义的字段(快照链、回收站、损坏标记等)不从存档包导入
+                    save_data = dict((k, v) for k, v in record.items() if k not in LOCAL_FIELDS)
+                    save_data["game_save_hash"] = digest
+                    save_data.pop("screenshot_hash", None)
+                    if record.get("companions"):
+                        # 只接受已知的附属文件名, 存档包中缺少的附属文件不导入
+                        save_data["companions"] = {}
+                        for file_name, companion_digest in record["companions"].items():
+                            if file_name not in PROFILE_COMPANIONS:
+                                continue
+                            if companion_digest in staged_blobs:
+                                sizes[companion_digest] = self.blob_store.adopt(companion_digest,
+                                                                                staged_blobs.pop(companion_digest))
+                            elif not self.blob_store.has(companion_digest):
+                                continue
+                            save_data["companions"][file_name] = companion_digest
+                            digests.append(companion_digest)
+                    save_data["game_save"] = self.blob_store.path_for(digest)
+                    save_data["screenshot"] = None
+                    staged_screenshot, screenshot_hash = staged_screenshots.get(record.get("screenshot"), (None, None))
+                    extension = os.path.splitext(staged_screenshot or "")[1].lower()
+                    # 与校验和不一致或不是支持的格式的截图不导入, 存档本身仍然导入;
+                    # 与保存时相同, 截图文件名由存档名称和扩展名组成
+                    if staged_screenshot and extension in screenshot_extensions and \
+                            record.get("screenshot_hash", screenshot_hash) == screenshot_hash:
+                        save_data["screenshot"] = os.path.join(self.screenshots_dir, name + extension)
+                        save_data["screenshot_hash"] = screenshot_hash
+                        os.replace(staged_screenshot, save_data["screenshot"])
+                        remove_thumbnails(name, self.thumbs_dir)
+                        self.catalog.drop_atlas_tiles([name])
+                    old_data = self.catalog.get(name, include_trashed=True)
+                    if old_data:
+                        replaced.append((old_data, save_data["screenshot"]))
+                    imported.append(save_data)
+                    imported_names.add(name)
+
+                # 本机已有但还没有记录大小的 blob(之前没有被引用)读取文件大小
+                unknown = set(digests) - set(sizes)
+                for digest in unknown - self.catalog.known_blobs(unknown):
+                    sizes[digest] = os.path.getsize(self.blob_store.path_for(digest))
+                # 引用与存档信息在同一个事务中写入, 写入失败时没有任何引用改变
+                self.catalog.put_many(imported, sizes)
+            self.release_game_saves([old_data for old_data, _ in replaced])
+            for old_data, screenshot_path in replaced:
+                old_screenshot = old_data.get("screenshot")
+                if old_screenshot and old_screenshot != screenshot_path and os.path.exists(old_screenshot):
+                    os.remove(old_screenshot)
+            return imported, skipped
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def storage_stats(self):
+        """去重存储和快照链的统计"""
+        stats = self.catalog.blob_stats()
+        stats.update(self.snapshot_chains.stats())
+        return stats
+
+    def close(self):
+        self.catalog.close()
@@ -0,0 +1,83 @@
+import io
+
+# 格式 -> (Pillow 格式名, 扩展名, 默认压缩等级)
+FORMATS = {
+    "png": ("PNG", ".png", 1),
+    "webp": ("WEBP", ".webp", 0),
+    "jpeg": ("JPEG", ".jpg", None)
+}
+
+
+class ScreenshotPolicy:
+    """截图存储策略: 格式、压缩参数、最大分辨率和是否保留透明通道
+
+    compress_level 对 PNG 为 zlib 压缩等级(0-9), 对 WebP 为编码方法(0-6, 越大越慢越小),
+    quality 用于 WebP 和 JPEG 的有损压缩. 默认与旧版本相同保存为无损 PNG, 有损格式需要在设置中选择:
+    按 benchmarks/bench_codec.py 的结果, 1440p 截图 WebP method 0 的编码耗时约为 PNG 的1/3, 体积约为1/8
+    """
+
+    def __init__(self, format="png", quality=85, compress_level=None, max_size=None, keep_alpha=False):
+        if format not in FORMATS:
+            raise ValueError(f"不支持的截图格式: {format}")
+        self.format = format
+        self.quality = quality
+        self.compress_level = FORMATS[format][2] if compress_level is None else compress_level
+        self.max_size = tuple(max_size) if max_size else None
+        self.keep_alpha = keep_alpha
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置字典读取策略"""
+        return cls(
+            format=config.get('screenshot_format', "png"),
+            quality=config.get('screenshot_quality', 85),
+            compress_level=config.get('screenshot_compress_level'),
+            max_size=config.get('screenshot_max_size'),
+            keep_alpha=config.get('screenshot_keep_alpha', False)
+        )
+
+    def to_config(self):
+        return {
+            'screenshot_format': self.format,
+            'screenshot_quality': self.quality,
+            'screenshot_compress_level': self.compress_level,
+            'screenshot_max_size': list(self.max_size) if self.max_size else None,
+            'screenshot_keep_alpha': self.keep_alpha
+        }
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    @property
+    def keeps_alpha(self):
+        """截图是否需要透明通道, 不需要时截图后端可以直接生成 RGB 图片"""
+        return self.keep_alpha and self.format != "jpeg"
+
+    def prepare(self, image):
+        """按策略缩小分辨率并去掉不需要的透明通道"""
+        if self.max_size and (image.width > self.max_size[0] or image.height > self.max_size[1]):
+            from PIL import Image
+            image = image.copy()
+            image.thumbnail(self.max_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        # 窗口截图的透明通道没有意义, JPEG 也不支持透明
+        if image.mode == 'RGBA' and not self.keeps_alpha:
+            image = image.convert('RGB')
+        return image
+
+    def _save_options(self):
+        if self.format == "png":
+            return {"compress_level": self.compress_level}
+        if self.format == "webp":
+            return {"quality": self.quality, "method": self.compress_level}
+        return {"quality": self.quality}
+
+    def encode_to(self, image, fp):
+        """将已处理过的图片编码写入文件对象或路径"""
+        image.save(fp, format=FORMATS[self.format][0], **self._save_options())
+
+    def encode_bytes(self, image):
+        """编码为字节串"""
+        buffer = io.BytesIO()
+        self.encode_to(image, buffer)
+        return buffer.getvalue()
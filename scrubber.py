@@ -0,0 +1,117 @@
+import time
+import threading
+from datetime import datetime
+
+from errors import SaveStoreError
+
+# 默认预算: 每秒最多读取的数据量, 以及校验占用一个 CPU 核的比例
+SCRUB_IO_MB_PER_S = 2
+SCRUB_CPU_PERCENT = 10
+# 每次后台运行校验的存档数和运行间隔(分钟)
+SCRUB_BATCH = 100
+SCRUB_INTERVAL_MINUTES = 10
+# 每次从索引读取的存档名称数, 每读一批保存一次位置
+CURSOR_CHUNK = 20
+CURSOR_KEY = "scrub_cursor"
+LAST_PASS_KEY = "scrub_last_pass"
+
+
+class ScrubPolicy:
+    """后台完整性校验的开关和资源预算"""
+
+    def __init__(self, enabled=True, io_mb_per_s=SCRUB_IO_MB_PER_S, cpu_percent=SCRUB_CPU_PERCENT,
+                 batch=SCRUB_BATCH, interval_minutes=SCRUB_INTERVAL_MINUTES):
+        self.enabled = enabled
+        self.io_mb_per_s = io_mb_per_s
+        self.cpu_percent = cpu_percent
+        self.batch = batch
+        self.interval_minutes = interval_minutes
+
+    @classmethod
+    def from_config(cls, config):
+        """从配置字典读取策略"""
+        return cls(
+            enabled=config.get('scrub_enabled', True),
+            io_mb_per_s=config.get('scrub_io_mb_per_s', SCRUB_IO_MB_PER_S),
+            cpu_percent=config.get('scrub_cpu_percent', SCRUB_CPU_PERCENT),
+            batch=config.get('scrub_batch', SCRUB_BATCH),
+            interval_minutes=config.get('scrub_interval_minutes', SCRUB_INTERVAL_MINUTES)
+        )
+
+    def to_config(self):
+        return {
+            'scrub_enabled': self.enabled,
+            'scrub_io_mb_per_s': self.io_mb_per_s,
+            'scrub_cpu_percent': self.cpu_percent,
+            'scrub_batch': self.batch,
+            'scrub_interval_minutes': self.interval_minutes
+        }
+
+    def pause_after(self, elapsed, size):
+        """校验一个存档(耗时 elapsed 秒, 读取 size 字节)后需要暂停的秒数
+
+        读取速度不超过 io_mb_per_s, 计算时间占比不超过 cpu_percent, 取两者中较长的暂停
+        """
+        io_pause = size / (self.io_mb_per_s * 1024 * 1024) - elapsed if self.io_mb_per_s > 0 else 0
+        cpu_pause = elapsed * (100 / self.cpu_percent - 1) if 0 < self.cpu_percent < 100 else 0
+        return max(0.0, io_pause, cpu_pause)
+
+
+class IntegrityScrubber:
+    """在后台逐个校验全部存档, 从上次停止的位置继续
+
+    scrub(name) 校验一个存档并返回 (问题列表, 读取的字节数, 隔离的文件数). 校验位置保存在索引中,
+    程序重启后继续; 校验完最后一个存档后从头开始. 每个存档之间按预算暂停,
+    并调用 wait_idle 等待用户操作结束. 完成(包括出错中断)后调用
+    on_done(校验数量, [(名称, 问题列表, 隔离的文件数)]). 同一时间只运行一次校验
+    """
+
+    def __init__(self, catalog, scrub, policy, on_done=None, wait_idle=None, sleep=time.sleep):
+        self.catalog = catalog
+        self.scrub = scrub
+        self.policy = policy
+        self.on_done = on_done
+        self.wait_idle = wait_idle
+        self.sleep = sleep
+        self._running = threading.Lock()
+
+    def run(self, limit=None):
+        """校验最多 limit 个存档(默认为策略中的 batch), 已有校验在运行时返回None
+
+        返回 (校验数量, [(名称, 问题列表, 隔离的文件数)]). 校验一个存档时出错(如没有权限读取)
+        记为该存档损坏, 继续校验下一个
+        """
+        if not self._running.acquire(blocking=False):
+            return None
+        checked = 0
+        damaged = []
+        try:
+            limit = limit or self.policy.batch
+            cursor = self.catalog.get_meta(CURSOR_KEY)
+            while checked < limit:
+                names = self.catalog.names_after(cursor, min(CURSOR_CHUNK, limit - checked))
+                if not names:
+                    # 已经校验完一遍, 下次从头开始
+                    cursor = None
+                    self.catalog.set_meta(LAST_PASS_KEY, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                    break
+                for name in names:
+                    start = time.perf_counter()
+                    try:
+                        problems, size, quarantined = self.scrub(name)
+                    except (OSError, SaveStoreError, ValueError) as e:
+                        problems, size, quarantined = [f"校验失败: {str(e)}"], 0, 0
+                    if problems:
+                        damaged.append((name, problems, quarantined))
+                    checked += 1
+                    self.sleep(self.policy.pause_after(time.perf_counter() - start, size))
+                    if self.wait_idle:
+                        self.wait_idle()
+                cursor = names[-1]
+                self.catalog.set_meta(CURSOR_KEY, cursor)
+            self.catalog.set_meta(CURSOR_KEY, cursor)
+        finally:
+            self._running.release()
+            if self.on_done:
+                self.on_done(checked, damaged)
+        return checked, damaged
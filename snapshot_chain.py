@@ -0,0 +1,286 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import zlib
+
+from jkr_decoder import decompress_jkr
+
+BLOCK_SIZE = 32
+KEYFRAME_INTERVAL = 16
+# 增量超过原始大小的这个比例时直接写关键帧
+MAX_DELTA_RATIO = 0.5
+INDEX_FILE = "index.json"
+
+OP_COPY = 0x01
+OP_INSERT = 0x02
+
+
+def compress_jkr(raw):
+    """按游戏使用的 raw deflate 格式重新压缩存档"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _match_length(base, base_pos, target, target_pos):
+    """计算两段数据从指定位置起相同的长度"""
+    limit = min(len(base) - base_pos, len(target) - target_pos)
+    length = 0
+    # 先按大块比较, 再逐字节比较
+    step = 256
+    while length + step <= limit and \
+            base[base_pos + length:base_pos + length + step] == \
+            target[target_pos + length:target_pos + length + step]:
+        length += step
+    while length < limit and base[base_pos + length] == target[target_pos + length]:
+        length += 1
+    return length
+
+
+def encode_delta(base, target, block_size=BLOCK_SIZE, max_literal=None):
+    """生成把 base 变为 target 的二进制增量
+
+    base 按固定块建立索引, 扫描 target 时查找相同块并向前后扩展,
+    输出 COPY(偏移, 长度) 和 INSERT(数据) 指令.
+    字面数据超过 max_literal 时放弃并返回None
+    """
+    index = {}
+    for offset in range(0, len(base) - block_size + 1, block_size):
+        index.setdefault(base[offset:offset + block_size], offset)
+
+    out = bytearray()
+    literal_start = 0
+    literal_total = 0
+    pos = 0
+    end = len(target) - block_size
+
+    def flush_literal(stop):
+        nonlocal literal_total
+        if stop > literal_start:
+            out.append(OP_INSERT)
+            _write_varint(out, stop - literal_start)
+            out.extend(target[literal_start:stop])
+            literal_total += stop - literal_start
+
+    while pos <= end:
+        base_pos = index.get(target[pos:pos + block_size])
+        if base_pos is None:
+            pos += 1
+            if max_literal is not None and pos - literal_start + literal_total > max_literal:
+                return None
+            continue
+        # 向前扩展匹配, 吃掉部分待插入的字面数据
+        back = 0
+        while back < pos - literal_start and back < base_pos and \
+                base[base_pos - back - 1] == target[pos - back - 1]:
+            back += 1
+        length = back + _match_length(base, base_pos, target, pos)
+        flush_literal(pos - back)
+        out.append(OP_COPY)
+        _write_varint(out, base_pos - back)
+        _write_varint(out, length)
+        pos = pos - back + length
+        literal_start = pos
+
+    flush_literal(len(target))
+    if max_literal is not None and literal_total > max_literal:
+        return None
+    return bytes(out)
+
+
+def apply_delta(base, delta):
+    """将增量应用到 base 上, 重建目标数据"""
+    out = bytearray()
+    pos = 0
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op == OP_COPY:
+            offset, pos = _read_varint(delta, pos)
+            length, pos = _read_varint(delta, pos)
+            out.extend(base[offset:offset + length])
+        elif op == OP_INSERT:
+            length, pos = _read_varint(delta, pos)
+            out.extend(delta[pos:pos + length])
+            pos += length
+        else:
+            raise ValueError(f"无效的增量指令: {op}")
+    return bytes(out)
+
+
+class SnapshotChainStore:
+    """按局(run)组织的增量快照链
+
+    每条链保存在独立目录下, 第一个快照和每隔 keyframe_interval 个快照写入
+    完整的关键帧, 其余快照只保存与上一个快照之间的二进制增量.
+    读取任意快照最多需要从关键帧开始应用 keyframe_interval - 1 个增量
+    """
+
+    def __init__(self, root, keyframe_interval=KEYFRAME_INTERVAL):
+        self.root = root
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._lock = threading.RLock()
+        # 每条链最后一个快照的解压数据, 避免追加时重建
+        self._tails = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _chain_dir(self, chain_id):
+        return os.path.join(self.root, chain_id)
+
+    def _load_index(self, chain_id):
+        try:
+            with open(os.path.join(self._chain_dir(chain_id), INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"entries": []}
+
+    def _save_index(self, chain_id, index):
+        index_path = os.path.join(self._chain_dir(chain_id), INDEX_FILE)
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=4)
+        os.replace(tmp_path, index_path)
+
+    def append(self, chain_id, jkr_data):
+        """追加一个快照, 返回它在链中的序号
+
+        jkr_data 无法解压时抛出 ValueError
+        """
+        raw = decompress_jkr(jkr_data)
+        with self._lock:
+            chain_dir = self._chain_dir(chain_id)
+            os.makedirs(chain_dir, exist_ok=True)
+            index = self._load_index(chain_id)
+            entries = index["entries"]
+            number = len(entries)
+
+            # 距离上一个关键帧的快照数
+            since_key = 0
+            for entry in reversed(entries):
+                if entry["type"] == "key":
+                    break
+                since_key += 1
+
+            payload = None
+            if entries and not entries[-1].get("purged") and since_key + 1 < self.keyframe_interval:
+                base = self._tail_raw(chain_id, index)
+                delta = encode_delta(base, raw, max_literal=int(len(raw) * MAX_DELTA_RATIO))
+                if delta is not None:
+                    payload = zlib.compress(delta, 6)
+                    entry_type = "delta"
+            if payload is None:
+                payload = zlib.compress(raw, 6)
+                entry_type = "key"
+
+            file_name = f"{number:06d}.{entry_type}"
+            with open(os.path.join(chain_dir, file_name), 'wb') as f:
+                f.write(payload)
+            entries.append({
+                "file": file_name,
+                "type": entry_type,
+                "raw_size": len(raw),
+                "stored_size": len(payload),
+                "sha256": hashlib.sha256(raw).hexdigest(),
+                "deleted": False
+            })
+            self._save_index(chain_id, index)
+            self._tails[chain_id] = (number, raw)
+            return number
+
+    def _tail_raw(self, chain_id, index):
+        tail = self._tails.get(chain_id)
+        last = len(index["entries"]) - 1
+        if tail and tail[0] == last:
+            return tail[1]
+        return self._rebuild(chain_id, index, last)
+
+    def _rebuild(self, chain_id, index, number):
+        entries = index["entries"]
+        if number < 0 or number >= len(entries) or entries[number].get("purged"):
+            raise FileNotFoundError(f"快照不存在: {chain_id}#{number}")
+        start = number
+        while entries[start]["type"] != "key":
+            start -= 1
+        chain_dir = self._chain_dir(chain_id)
+        raw = None
+        for i in range(start, number + 1):
+            with open(os.path.join(chain_dir, entries[i]["file"]), 'rb') as f:
+                payload = zlib.decompress(f.read())
+            raw = payload if entries[i]["type"] == "key" else apply_delta(raw, payload)
+        if hashlib.sha256(raw).hexdigest() != entries[number]["sha256"]:
+            raise ValueError(f"快照校验失败: {chain_id}#{number}")
+        return raw
+
+    def read_raw(self, chain_id, number):
+        """重建指定快照的解压数据"""
+        with self._lock:
+            return self._rebuild(chain_id, self._load_index(chain_id), number)
+
+    def read_jkr(self, chain_id, number):
+        """重建指定快照并压缩为游戏可读取的 .jkr 数据"""
+        return compress_jkr(self.read_raw(chain_id, number))
+
+    def release(self, chain_id, number):
+        """删除链中的一个快照
+
+        快照之间存在依赖, 只有当一个关键帧及其后续增量全部删除后才删除文件
+        """
+        with self._lock:
+            index = self._load_index(chain_id)
+            entries = index["entries"]
+            if number >= len(entries):
+                return
+            entries[number]["deleted"] = True
+
+            # 按关键帧划分片段, 回收已全部删除的片段
+            chain_dir = self._chain_dir(chain_id)
+            segment = []
+            for i, entry in enumerate(entries + [{"type": "key"}]):
+                if entry["type"] == "key" and segment:
+                    if all(entries[j]["deleted"] for j in segment):
+                        for j in segment:
+                            if not entries[j].get("purged"):
+                                file_path = os.path.join(chain_dir, entries[j]["file"])
+                                if os.path.exists(file_path):
+                                    os.remove(file_path)
+                                entries[j]["purged"] = True
+                    segment = []
+                segment.append(i)
+
+            if all(entry["deleted"] for entry in entries):
+                shutil.rmtree(chain_dir, ignore_errors=True)
+                self._tails.pop(chain_id, None)
+            else:
+                self._save_index(chain_id, index)
+
+    def stats(self):
+        """返回所有链的原始字节数和实际存储字节数"""
+        raw_bytes = 0
+        stored_bytes = 0
+        with self._lock:
+            for chain_id in os.listdir(self.root):
+                for entry in self._load_index(chain_id)["entries"]:
+                    if not entry.get("purged"):
+                        raw_bytes += entry["raw_size"]
+                        stored_bytes += entry["stored_size"]
+        return {"raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
@@ -0,0 +1,82 @@
+"""去重存储: blob 的引用随存档信息一起写入索引, 最后一个引用删除时才删除文件"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import BlobStore, LEGACY_REFS_FILE
+from save_store import SaveStore
+from snapshot_chain import compress_jkr
+
+GAME_DATA = compress_jkr(b"return {['GAME']={['round']=1}}")
+OTHER_DATA = compress_jkr(b"return {['GAME']={['round']=2}}")
+
+
+class BlobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.base_dir = os.path.join(self.root, "store")
+        os.makedirs(self.base_dir)
+        self.store = SaveStore(self.base_dir)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_put_is_content_addressed(self):
+        blobs = BlobStore(os.path.join(self.root, "blobs"))
+        first, second = blobs.put_many([b"same", b"same"])
+        self.assertEqual(first, second)
+        self.assertEqual(blobs.digests(), [first])
+        self.assertEqual(blobs.remove_many([first, first]), 1)
+        self.assertFalse(blobs.has(first))
+
+    def test_last_reference_removes_blob(self):
+        a = self.store.commit("a", GAME_DATA)
+        self.store.commit("b", GAME_DATA)
+        digest = a["game_save_hash"]
+        self.assertEqual(self.store.blob_store.digests(), [digest])
+        stats = self.store.catalog.blob_stats()
+        self.assertEqual((stats["refs"], stats["blobs"]), (2, 1))
+        self.assertEqual(stats["logical_bytes"], 2 * len(GAME_DATA))
+
+        # 回收站中的存档仍然引用 blob
+        self.store.delete(["a", "b"])
+        self.assertTrue(self.store.blob_store.has(digest))
+        self.store.purge(["a"])
+        self.assertTrue(self.store.blob_store.has(digest))
+        self.store.undelete(["b"])
+        self.assertEqual(self.store.read_game_data(self.store.get("b")), GAME_DATA)
+        self.store.delete(["b"])
+        self.store.purge(["b"])
+        self.assertFalse(self.store.blob_store.has(digest))
+        self.assertEqual(self.store.catalog.blob_stats()["refs"], 0)
+
+    def test_overwrite_releases_old_blob(self):
+        old = self.store.commit("a", GAME_DATA)["game_save_hash"]
+        new = self.store.commit("a", OTHER_DATA)["game_save_hash"]
+        self.assertFalse(self.store.blob_store.has(old))
+        self.assertTrue(self.store.blob_store.has(new))
+        self.assertEqual(self.store.catalog.blob_stats()["refs"], 1)
+
+    def test_rebuild_from_catalog(self):
+        kept = self.store.commit("a", GAME_DATA)["game_save_hash"]
+        # 写入 blob 后、写入索引前中断留下的文件, 以及旧版本的引用计数表
+        orphan = self.store.blob_store.put_bytes(OTHER_DATA)
+        with open(os.path.join(self.store.blob_store.root, LEGACY_REFS_FILE), 'w') as f:
+            f.write("{}")
+        with self.store.catalog.conn:
+            self.store.catalog.conn.execute("DELETE FROM blob_refs")
+        self.assertEqual(self.store.rebuild_blob_refs(), 1)
+        self.assertEqual(self.store.blob_store.digests(), [kept])
+        self.assertEqual(self.store.catalog.blob_stats()["refs"], 1)
+        self.assertFalse(self.store.blob_store.has(orphan))
+        self.assertFalse(os.path.exists(os.path.join(self.store.blob_store.root, LEGACY_REFS_FILE)))
+
+
+if __name__ == '__main__':
+    unittest.main()
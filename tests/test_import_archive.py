@@ -0,0 +1,165 @@
+"""导入存档包的安全检查: 构造的存档包被拒绝, 且不留下任何文件"""
+import os
+import sys
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_archive import ARCHIVE_VERSION, ArchiveWriter
+from save_store import SaveStore, SaveStoreError
+
+GAME_DATA = b"return {}"
+PNG = (b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_archive(path, members, saves):
+    with open(path, 'wb') as f:
+        writer = ArchiveWriter(f)
+        for name, data in members:
+            writer.add(name, data)
+        writer.close({"version": ARCHIVE_VERSION, "saves": saves})
+
+
+def list_files(root):
+    return sorted(os.path.relpath(os.path.join(folder, name), root)
+                  for folder, _, names in os.walk(root) for name in names)
+
+
+class ImportArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.base_dir = os.path.join(self.root, "store")
+        os.makedirs(self.base_dir)
+        self.store = SaveStore(self.base_dir)
+        self.archive = os.path.join(self.root, "crafted.smartsl")
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def assert_rejected(self, members, saves):
+        write_archive(self.archive, members, saves)
+        before = list_files(self.root)
+        with self.assertRaises(SaveStoreError):
+            self.store.import_archive(self.archive)
+        after = [path for path in list_files(self.root) if not path.endswith(("-wal", "-shm"))]
+        self.assertEqual(after, [path for path in before if not path.endswith(("-wal", "-shm"))])
+        self.assertEqual(self.store.catalog.count(), 0)
+
+    def test_traversal_member_rejected(self):
+        prefix = "../../../pwned_"
+        name = prefix + "0" * (64 - len(prefix))
+        self.assert_rejected([(f"blobs/{name}.jkr", b"owned")], [])
+        # 暂存目录为 store/saves/import_*/, 穿越后会落在 self.root 下
+        self.assertFalse(os.path.exists(os.path.join(self.root, name[len("../../../"):])))
+
+    def test_bad_manifest_digest_rejected(self):
+        digest = sha256(GAME_DATA)
+        for bad in ("../../outside", "A" * 64, digest[:63]):
+            self.assert_rejected([(f"blobs/{digest}.jkr", GAME_DATA)],
+                                 [{"name": "save", "game_save_hash": bad}])
+        self.assert_rejected([(f"blobs/{digest}.jkr", GAME_DATA)],
+                             [{"name": "save", "game_save_hash": digest,
+                               "companions": {"profile.jkr": "../profile"}}])
+
+    def test_bad_save_name_rejected(self):
+        digest = sha256(GAME_DATA)
+        self.assert_rejected([(f"blobs/{digest}.jkr", GAME_DATA)],
+                             [{"name": "../evil", "game_save_hash": digest}])
+
+    def test_bad_phash_or_meta_rejected(self):
+        # 写入索引时才会出错的字段在移入任何文件前检查, 引用计数不变
+        digest = sha256(GAME_DATA)
+        for bad in ({"phash": "not hex"}, {"phash": "1" * 17}, {"meta": []}, {"meta": {"seed": {"x": 1}}}):
+            self.assert_rejected([(f"blobs/{digest}.jkr", GAME_DATA)],
+                                 [dict({"name": "save", "game_save_hash": digest}, **bad)])
+            self.assertEqual(self.store.catalog.blob_stats()["refs"], 0)
+
+    def test_hash_mismatch_rejected(self):
+        self.assert_rejected([(f"blobs/{sha256(b'other')}.jkr", GAME_DATA)],
+                             [{"name": "save", "game_save_hash": sha256(b'other')}])
+
+    def test_screenshot_named_after_save(self):
+        # 清单中的截图路径指向另一个存档的截图时, 不会覆盖它
+        self.store.commit("local", b"local data")
+        other = os.path.join(self.store.screenshots_dir, "local.png")
+        with open(other, 'wb') as f:
+            f.write(b"local screenshot")
+        digest = sha256(GAME_DATA)
+        write_archive(self.archive, [(f"blobs/{digest}.jkr", GAME_DATA), ("screenshots/local.png", PNG)],
+                      [{"name": "imported", "game_save_hash": digest, "screenshot": "screenshots/local.png",
+                        "screenshot_hash": sha256(PNG)}])
+        imported, skipped = self.store.import_archive(self.archive)
+        self.assertEqual([r["name"] for r in imported], ["imported"])
+        self.assertEqual(imported[0]["screenshot"], os.path.join(self.store.screenshots_dir, "imported.png"))
+        with open(other, 'rb') as f:
+            self.assertEqual(f.read(), b"local screenshot")
+
+    def test_local_fields_not_imported(self):
+        # 快照链、回收站和损坏标记只在本机有意义, 拒绝的截图不保留清单中的截图哈希
+        digest = sha256(GAME_DATA)
+        write_archive(self.archive, [(f"blobs/{digest}.jkr", GAME_DATA)],
+                      [{"name": "imported", "game_save_hash": digest, "chain": "../../outside", "chain_index": 0,
+                        "deleted_at": "2000-01-01 00:00:00", "damaged": ["x"], "screenshot": "screenshots/x.png",
+                        "screenshot_hash": sha256(PNG)}])
+        imported, _ = self.store.import_archive(self.archive)
+        record = self.store.catalog.get("imported")
+        for field in ("chain", "chain_index", "deleted_at", "damaged", "screenshot_hash"):
+            self.assertNotIn(field, record)
+        self.assertEqual(record["game_save_hash"], digest)
+        self.assertEqual(self.store.read_game_data(record), GAME_DATA)
+        # 删除时释放的是去重存储中的 blob, 引用不会泄漏
+        self.store.delete(["imported"])
+        self.store.purge(["imported"])
+        self.assertFalse(self.store.blob_store.has(digest))
+
+    def test_export_import_round_trip(self):
+        # 导出后导入到另一个存储: 存档、附属文件和截图一致, 共享的 blob 只保存一份
+        screenshot = os.path.join(self.root, "shot.png")
+        with open(screenshot, 'wb') as f:
+            f.write(PNG)
+        self.store.commit("first", GAME_DATA, screenshot_path=screenshot, phash=0x1234,
+                          companions={"profile.jkr": b"profile"})
+        self.store.commit("second", GAME_DATA, companions={"profile.jkr": b"profile"})
+        self.store.export_archive(["first", "second"], self.archive)
+
+        other_dir = os.path.join(self.root, "other")
+        os.makedirs(other_dir)
+        other = SaveStore(other_dir)
+        try:
+            imported, skipped = other.import_archive(self.archive)
+            self.assertEqual(sorted(r["name"] for r in imported), ["first", "second"])
+            self.assertEqual(skipped, [])
+            for name in ("first", "second"):
+                record = other.catalog.get(name)
+                self.assertEqual(other.read_game_data(record), GAME_DATA)
+                self.assertEqual(record["companions"], {"profile.jkr": sha256(b"profile")})
+            first = other.catalog.get("first")
+            self.assertEqual(first["phash"], format(0x1234, "016x"))
+            self.assertEqual(first["screenshot"], os.path.join(other.screenshots_dir, "first.png"))
+            self.assertEqual(first["screenshot_hash"], sha256(PNG))
+            with open(first["screenshot"], 'rb') as f:
+                self.assertEqual(f.read(), PNG)
+            stats = other.catalog.blob_stats()
+            self.assertEqual(stats["refs"], 4)
+            self.assertEqual(sorted(other.blob_store.digests()), sorted([sha256(GAME_DATA), sha256(b"profile")]))
+
+            # 再次导入时同名存档被跳过, 引用计数不变
+            imported, skipped = other.import_archive(self.archive)
+            self.assertEqual(imported, [])
+            self.assertEqual(sorted(skipped), ["first", "second"])
+            self.assertEqual(other.catalog.blob_stats()["refs"], 4)
+        finally:
+            other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
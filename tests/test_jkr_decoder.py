@@ -0,0 +1,70 @@
+"""按需读取存档元数据: 与完整解析结果一致, 正确处理 %q 转义和需要跳过的子表"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jkr_decoder import JkrParseError, decode_table, read_metadata
+from snapshot_chain import compress_jkr
+
+# 按 STR_PACK 的输出格式构造: 键排序不固定, 字符串为 %q 格式,
+# 跳过的子表中的字符串含有括号和转义引号
+SAMPLE = (
+    b'return {'
+    b'["cardAreas"]={'
+    b'["deck"]={["cards"]={[1]={["save_fields"]={["center"]="c_base"},["label"]="a}{b"}}},'
+    b'["jokers"]={["config"]={["card_limit"]=5},["cards"]={'
+    b'[2]={["save_fields"]={["center"]="j_blueprint"},["ability"]={["extra"]={["x"]=1.5}}},'
+    b'[10]={["save_fields"]={["center"]="j_brainstorm"}},'
+    b'[1]={["save_fields"]={["center"]="j_joker"},["label"]="\\"{\\\\"}}}},'
+    b'["BACK"]={["name"]="Red \\"Deck\\"",["key"]="b_red"},'
+    b'["GAME"]={'
+    b'["pseudorandom"]={["seed"]="AB12CD34",["hashed_seed"]=0.123},'
+    b'["round_resets"]={["ante"]=3,["blind_states"]={["Small"]="Defeated"}},'
+    b'["round"]=7,["dollars"]=-2.5,["stake"]=1,'
+    b'["won"]=false,["banner"]="line1\\\nline2\\t\\065"'
+    b'}}'
+)
+
+
+class ReadMetadataTest(unittest.TestCase):
+
+    def test_sample_fields(self):
+        metadata = read_metadata(compress_jkr(SAMPLE))
+        self.assertEqual(metadata, {
+            "seed": "AB12CD34",
+            "ante": 3,
+            "round": 7,
+            "money": -2.5,
+            "stake": 1,
+            "deck": 'Red "Deck"',
+            # 按位置排序, 数字键按数值而非文本排序
+            "jokers": ["j_joker", "j_blueprint", "j_brainstorm"],
+        })
+
+    def test_matches_full_decode(self):
+        table = decode_table(compress_jkr(SAMPLE))
+        metadata = read_metadata(compress_jkr(SAMPLE))
+        self.assertEqual(metadata["seed"], table["GAME"]["pseudorandom"]["seed"])
+        self.assertEqual(metadata["deck"], table["BACK"]["name"])
+        cards = table["cardAreas"]["jokers"]["cards"]
+        self.assertEqual(metadata["jokers"],
+                         [cards[k]["save_fields"]["center"] for k in sorted(cards)])
+        self.assertEqual(table["GAME"]["banner"], "line1\nline2\tA")
+        self.assertEqual(cards[1]["label"], '"{\\')
+        self.assertIs(table["GAME"]["won"], False)
+
+    def test_missing_fields_are_omitted(self):
+        raw = b'return {["GAME"]={["round"]=1},["cardAreas"]={["jokers"]={["cards"]={}}}}'
+        self.assertEqual(read_metadata(compress_jkr(raw)), {"round": 1})
+
+    def test_corrupt_data_raises(self):
+        with self.assertRaises(ValueError):
+            read_metadata(b"not a save")
+        with self.assertRaises(JkrParseError):
+            read_metadata(compress_jkr(b'return {["GAME"]={["round"]=1}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""保留策略: 为满足空间预算删除的自动存档立即彻底删除, 不在回收站中等待"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retention import RetentionPolicy, RetentionWorker
+from save_store import SaveStore
+from snapshot_chain import compress_jkr
+
+
+class RetentionBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.base_dir = os.path.join(self.root, "store")
+        os.makedirs(self.base_dir)
+        self.store = SaveStore(self.base_dir)
+        start = datetime(2024, 1, 1)
+        # 10 个内容不同的自动存档, 每个相隔一分钟, 都在同一个小时内
+        for i in range(10):
+            timestamp = (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+            self.store.commit(f"auto_{i}", compress_jkr(f"return {{['i']={i}}}".encode()),
+                              timestamp=timestamp, auto=True)
+        self.now = start + timedelta(minutes=30)
+        self.size = self.store.get("auto_0")["size"]
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_select_splits_over_budget(self):
+        policy = RetentionPolicy(keep_last=2, max_bytes=self.size * 4)
+        by_age, over_budget = policy.select(self.store.records(), self.now)
+        # 同一小时内只保留最新的一个, 之后从最旧的开始删除到预算以内
+        self.assertEqual([r["name"] for r in by_age], [f"auto_{i}" for i in range(7)])
+        self.assertEqual(over_budget, [])
+        policy = RetentionPolicy(keep_last=5, max_bytes=self.size * 3)
+        by_age, over_budget = policy.select(self.store.records(), self.now)
+        self.assertEqual([r["name"] for r in by_age], [f"auto_{i}" for i in range(4)])
+        self.assertEqual([r["name"] for r in over_budget], ["auto_4"])
+
+    def test_worker_purges_over_budget(self):
+        # 全部存档都在按天保留的范围内, 与运行测试的时间无关
+        policy = RetentionPolicy(keep_last=5, hourly_hours=0, daily_days=100000, max_bytes=self.size * 3)
+        done = []
+        worker = RetentionWorker(self.store.catalog.records, self.store.delete,
+                                 lambda removed, record_bytes: done.append((removed, record_bytes)),
+                                 pause=0, purge=self.store.purge)
+        self.assertTrue(worker.run(policy))
+        self.assertEqual(done, [(5, self.size * 5)])
+        trashed = [r["name"] for r in self.store.trashed()]
+        self.assertEqual(sorted(trashed), [f"auto_{i}" for i in range(4)])
+        self.assertIsNone(self.store.catalog.get("auto_4", include_trashed=True))
+        self.assertEqual(self.store.catalog.blob_stats()["refs"], 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
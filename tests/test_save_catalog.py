@@ -0,0 +1,93 @@
+"""存档索引: 回收站、恢复和彻底删除在一个事务中完成, 查询不包含回收站中的存档"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_catalog import SaveCatalog
+
+
+def record(name, timestamp, seed="SEED", ante=1, **fields):
+    return dict({"name": name, "timestamp": timestamp, "meta": {"seed": seed, "ante": ante}}, **fields)
+
+
+class SaveCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.catalog = SaveCatalog(os.path.join(self.root, "catalog.db"))
+        self.changes = []
+        self.catalog.add_listener(lambda op, names: self.changes.append((op, sorted(names))))
+        self.catalog.put_many([record("a", "2024-01-01 00:00:00"), record("b", "2024-01-02 00:00:00", ante=2),
+                               record("c", "2024-01-03 00:00:00", seed="OTHER")])
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_put_and_query(self):
+        self.assertEqual(self.changes, [("add", ["a", "b", "c"])])
+        self.catalog.put(record("a", "2024-01-04 00:00:00"))
+        self.assertEqual(self.changes[-1], ("update", ["a"]))
+        self.assertEqual(self.catalog.names(), ["a", "b", "c"])
+        self.assertEqual([r["name"] for r in self.catalog.find(seed="SEED")], ["b", "a"])
+        self.assertEqual([r["name"] for r in self.catalog.find(ante=2)], ["b"])
+        self.assertEqual(self.catalog.names_after("a", 1), ["b"])
+
+    def test_trash_untrash_purge(self):
+        removed = self.catalog.trash(["a", "b", "missing"], "2024-02-01 00:00:00")
+        self.assertEqual([r["name"] for r in removed], ["a", "b"])
+        self.assertEqual(self.changes[-1], ("remove", ["a", "b"]))
+        # 回收站中的存档不出现在普通查询中
+        self.assertEqual(self.catalog.names(), ["c"])
+        self.assertEqual(self.catalog.count(), 1)
+        self.assertIsNone(self.catalog.get("a"))
+        self.assertEqual(self.catalog.get("a", include_trashed=True)["deleted_at"], "2024-02-01 00:00:00")
+        self.assertEqual(self.catalog.find(seed="SEED"), [])
+        # 已在回收站中的存档不会再次移入
+        self.assertEqual(self.catalog.trash(["a"], "2024-03-01 00:00:00"), [])
+
+        self.assertEqual([r["name"] for r in self.catalog.untrash(["b", "c"])], ["b"])
+        self.assertEqual(self.changes[-1], ("add", ["b"]))
+        self.assertEqual(self.catalog.names(), ["b", "c"])
+
+        # 只能彻底删除回收站中的存档
+        self.assertEqual([r["name"] for r in self.catalog.purge(["a", "b"])], ["a"])
+        self.assertIsNone(self.catalog.get("a", include_trashed=True))
+        self.assertEqual(self.catalog.trashed(), [])
+        self.assertEqual(self.catalog.names(), ["b", "c"])
+
+    def test_trashed_before(self):
+        self.catalog.trash(["a"], "2024-02-01 00:00:00")
+        self.catalog.trash(["b"], "2024-02-03 00:00:00")
+        self.assertEqual([r["name"] for r in self.catalog.trashed()], ["a", "b"])
+        self.assertEqual([r["name"] for r in self.catalog.trashed("2024-02-02 00:00:00")], ["a"])
+
+    def test_overwrite_trashed_save(self):
+        # 同名存档在回收站中时保存新的存档会直接覆盖它
+        self.catalog.trash(["a"], "2024-02-01 00:00:00")
+        self.catalog.put(record("a", "2024-03-01 00:00:00"))
+        self.assertEqual(self.catalog.get("a")["timestamp"], "2024-03-01 00:00:00")
+        self.assertEqual(self.catalog.trashed(), [])
+
+    def test_import_legacy_once(self):
+        saves_dir = os.path.join(self.root, "saves")
+        os.makedirs(saves_dir)
+        with open(os.path.join(saves_dir, "old.json"), 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": "2023-01-01 00:00:00"}, f)
+        catalog = SaveCatalog(os.path.join(self.root, "legacy.db"))
+        try:
+            self.assertEqual(catalog.import_legacy(saves_dir), 1)
+            self.assertEqual(catalog.names(), ["old"])
+            self.assertTrue(os.path.exists(os.path.join(saves_dir, "legacy_json", "old.json")))
+            self.assertEqual(catalog.import_legacy(saves_dir), 0)
+        finally:
+            catalog.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
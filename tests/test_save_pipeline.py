@@ -0,0 +1,110 @@
+"""存档流水线: 编码并行, 写入按提交顺序串行, 回调回到主线程执行"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_pipeline import SaveJob, SavePipeline
+
+
+class FakeRoot:
+    """代替 Tk 根窗口: after 只记下回调, 由测试在主线程中调用 run_pending"""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, delay, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, job_id):
+        self.callbacks.pop(job_id, None)
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, {}
+        for callback in callbacks.values():
+            callback()
+
+
+def job(name):
+    return SaveJob(name, None, name.encode(), "2024-01-01 00:00:00")
+
+
+class SavePipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.committed = []
+
+    def make_pipeline(self, encode, commit=None, **kwargs):
+        def default_commit(job, encoded):
+            self.committed.append((job.name, encoded))
+            return job.name
+        pipeline = SavePipeline(self.root, encode, commit or default_commit, **kwargs)
+        self.addCleanup(pipeline.shutdown)
+        return pipeline
+
+    def wait_idle(self, pipeline):
+        deadline = time.monotonic() + 5
+        while pipeline.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pipeline.pending(), 0)
+
+    def test_commit_in_submit_order(self):
+        # 先提交的存档编码最慢, 仍然先写入
+        delays = {"a": 0.2, "b": 0.1, "c": 0}
+        encoded_order = []
+
+        def encode(job):
+            time.sleep(delays[job.name])
+            encoded_order.append(job.name)
+            return job.name.upper()
+
+        pipeline = self.make_pipeline(encode, workers=3)
+        done = []
+        for name in "abc":
+            self.assertTrue(pipeline.submit(job(name), done.append))
+        self.wait_idle(pipeline)
+        self.assertEqual(encoded_order, ["c", "b", "a"])
+        self.assertEqual(self.committed, [("a", "A"), ("b", "B"), ("c", "C")])
+        # 完成回调在主线程轮询时才执行
+        self.assertEqual(done, [])
+        self.root.run_pending()
+        self.assertEqual(done, ["a", "b", "c"])
+
+    def test_error_goes_to_on_error(self):
+        def commit(job, encoded):
+            if job.name == "bad":
+                raise OSError("disk full")
+            self.committed.append((job.name, encoded))
+            return job.name
+
+        pipeline = self.make_pipeline(lambda job: None, commit)
+        done, errors = [], []
+        pipeline.submit(job("bad"), done.append, errors.append)
+        pipeline.submit(job("good"), done.append, errors.append)
+        self.wait_idle(pipeline)
+        self.root.run_pending()
+        self.assertEqual(done, ["good"])
+        self.assertEqual([str(e) for e in errors], ["disk full"])
+
+    def test_full_queue_rejects_without_blocking(self):
+        release = threading.Event()
+        pipeline = self.make_pipeline(lambda job: release.wait(5), max_pending=2)
+        self.assertTrue(pipeline.submit(job("a")))
+        self.assertTrue(pipeline.submit(job("b")))
+        self.assertFalse(pipeline.submit(job("c")))
+        release.set()
+        self.wait_idle(pipeline)
+        self.assertTrue(pipeline.submit(job("d")))
+        self.wait_idle(pipeline)
+        self.assertEqual([name for name, _ in self.committed], ["a", "b", "d"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""后台校验: 单个存档校验出错时记为损坏并继续, 完成回调总会被调用"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from save_store import SaveStore
+from scrubber import CURSOR_KEY, IntegrityScrubber, ScrubPolicy
+from snapshot_chain import compress_jkr
+
+
+class ScrubberTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = SaveStore(self.root)
+        for i in range(5):
+            self.store.commit(f"save_{i}", compress_jkr(f"return {{money = {i}}}".encode()))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_error_recorded_and_pass_continues(self):
+        def scrub(name):
+            if name == "save_1":
+                raise PermissionError("拒绝访问")
+            return self.store.scrub(name)
+
+        done = []
+        scrubber = IntegrityScrubber(self.store.catalog, scrub, ScrubPolicy(io_mb_per_s=0, cpu_percent=0),
+                                     on_done=lambda checked, damaged: done.append((checked, damaged)),
+                                     sleep=lambda seconds: None)
+        checked, damaged = scrubber.run(10)
+        self.assertEqual(checked, 5)
+        self.assertEqual([(name, count) for name, _, count in damaged], [("save_1", 0)])
+        self.assertIn("拒绝访问", damaged[0][1][0])
+        self.assertEqual(done, [(checked, damaged)])
+        # 一遍校验完成, 下次从头开始而不是停在出错的存档上
+        self.assertIsNone(self.store.catalog.get_meta(CURSOR_KEY))
+
+    def test_on_done_called_when_pass_aborts(self):
+        done = []
+
+        def names_after(after, limit):
+            raise OSError("索引不可用")
+
+        self.store.catalog.names_after = names_after
+        scrubber = IntegrityScrubber(self.store.catalog, self.store.scrub, ScrubPolicy(),
+                                     on_done=lambda checked, damaged: done.append(checked))
+        with self.assertRaises(OSError):
+            scrubber.run(10)
+        self.assertEqual(done, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""增量快照链: 增量编码可以还原, 关键帧片段全部删除后才删除文件"""
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshot_chain import SnapshotChainStore, apply_delta, compress_jkr, encode_delta
+
+
+def game_save(round_number, seed="ABCD1234"):
+    # 相邻两局只有回合数和一张牌不同, 与连续的自动存档相似
+    cards = ",".join(f"[{i}]={{['id']='c_{i * 7 % 52}',['level']={round_number if i == 10 else i % 5}}}"
+                     for i in range(60))
+    return f"return {{['GAME']={{['round']={round_number},['seed']='{seed}'}},['deck']={{{cards}}}}}".encode()
+
+
+class DeltaTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        base = game_save(1)
+        targets = (game_save(2), base, b"", base[:100], base + b"tail", bytes(rng.randrange(256) for _ in range(500)))
+        for target in targets:
+            self.assertEqual(apply_delta(base, encode_delta(base, target)), target)
+
+    def test_similar_save_is_small(self):
+        base, target = game_save(1), game_save(2)
+        self.assertLess(len(encode_delta(base, target)), len(target) // 2)
+
+    def test_max_literal(self):
+        self.assertIsNone(encode_delta(game_save(1), os.urandom(2000), max_literal=256))
+
+
+class SnapshotChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.chains = SnapshotChainStore(os.path.join(self.root, "chains"), keyframe_interval=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def files(self, chain_id="run"):
+        return sorted(f for f in os.listdir(os.path.join(self.chains.root, chain_id)) if f != "index.json")
+
+    def test_read_back_every_snapshot(self):
+        for i in range(7):
+            self.assertEqual(self.chains.append("run", compress_jkr(game_save(i))), i)
+        # 每 3 个快照一个关键帧
+        self.assertEqual(self.files(), ["000000.key", "000001.delta", "000002.delta", "000003.key",
+                                        "000004.delta", "000005.delta", "000006.key"])
+        # 不使用追加时缓存的最后一个快照
+        reopened = SnapshotChainStore(self.chains.root, keyframe_interval=3)
+        for i in range(7):
+            self.assertEqual(reopened.read_raw("run", i), game_save(i))
+
+    def test_release_purges_whole_segments(self):
+        for i in range(6):
+            self.chains.append("run", compress_jkr(game_save(i)))
+        # 片段中还有快照被引用时不删除文件, 后面的增量依赖前面的快照
+        self.chains.release("run", 0)
+        self.chains.release("run", 1)
+        self.assertIn("000000.key", self.files())
+        self.assertEqual(self.chains.read_raw("run", 2), game_save(2))
+        self.chains.release("run", 2)
+        self.assertEqual(self.files(), ["000003.key", "000004.delta", "000005.delta"])
+        with self.assertRaises(FileNotFoundError):
+            self.chains.read_raw("run", 1)
+        self.assertEqual(self.chains.read_raw("run", 5), game_save(5))
+        # 全部删除后删除整条链
+        for i in range(3, 6):
+            self.chains.release("run", i)
+        self.assertFalse(os.path.exists(os.path.join(self.chains.root, "run")))
+
+
+if __name__ == '__main__':
+    unittest.main()
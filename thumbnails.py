@@ -0,0 +1,62 @@
+import os
+
+# 预览区域大小(主窗口1000x600, 去掉左侧面板和边距)
+PREVIEW_SIZE = (770, 570)
+# 缩略图列表/画廊使用的小尺寸
+SMALL_SIZE = (192, 144)
+THUMBNAIL_SIZES = (PREVIEW_SIZE, SMALL_SIZE)
+
+
+def thumbnail_path(thumbs_dir, save_name, size):
+    """返回存档指定尺寸缩略图的路径"""
+    return os.path.join(thumbs_dir, f"{save_name}_{size[0]}x{size[1]}.png")
+
+
+def make_thumbnails(image, save_name, thumbs_dir, sizes=THUMBNAIL_SIZES):
+    """从截图生成各尺寸的缩略图, 返回 {尺寸: 路径}
+
+    从大到小依次缩放, 小尺寸直接由上一级缩略图生成
+    """
+    from PIL import Image
+    os.makedirs(thumbs_dir, exist_ok=True)
+    paths = {}
+    current = image
+    for size in sorted(sizes, key=lambda s: s[0] * s[1], reverse=True):
+        current = current.copy()
+        current.thumbnail(size, Image.Resampling.LANCZOS)
+        path = thumbnail_path(thumbs_dir, save_name, size)
+        tmp_path = path + ".tmp"
+        current.save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, path)
+        paths[size] = path
+    return paths
+
+
+def get_thumbnail(source_path, save_name, thumbs_dir, size=PREVIEW_SIZE):
+    """返回可用的缩略图路径
+
+    旧存档没有缩略图或截图比缩略图新时, 从截图重新生成全部尺寸.
+    截图不存在时返回None
+    """
+    path = thumbnail_path(thumbs_dir, save_name, size)
+    try:
+        source_mtime = os.path.getmtime(source_path)
+    except OSError:
+        return path if os.path.exists(path) else None
+    try:
+        if os.path.getmtime(path) >= source_mtime:
+            return path
+    except OSError:
+        pass
+    from PIL import Image
+    with Image.open(source_path) as image:
+        image.load()
+        return make_thumbnails(image, save_name, thumbs_dir)[size]
+
+
+def remove_thumbnails(save_name, thumbs_dir, sizes=THUMBNAIL_SIZES):
+    """删除存档的全部缩略图"""
+    for size in sizes:
+        path = thumbnail_path(thumbs_dir, save_name, size)
+        if os.path.exists(path):
+            os.remove(path)
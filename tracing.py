@@ -0,0 +1,119 @@
+import os
+import csv
+import json
+import time
+import threading
+from collections import deque
+
+# 内存中最多保留的耗时记录数
+TRACE_CAPACITY = 5000
+PERCENTILES = (50, 90, 99)
+CSV_FIELDS = ("name", "start", "ms", "thread")
+
+
+class _NullSpan:
+    """关闭记录时使用的空计时段, 进入和退出都不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算百分位数, sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Tracer:
+    """各步骤耗时的轻量记录
+
+    用 with tracer.span("save.encode"): 包住一个步骤, 退出时把 (名称, 开始时间, 耗时, 线程)
+    写入固定容量的环形缓冲区, 旧记录自动丢弃. 关闭时 span() 直接返回一个共享的空对象,
+    只多一次属性判断. 可以在多个线程中使用
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY, enabled=False):
+        self.enabled = enabled
+        self.records = deque(maxlen=capacity)
+        # 记录的开始时间相对于这个时刻
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        """直接记录一段耗时(perf_counter 的开始和结束时间)"""
+        with self._lock:
+            self.records.append((name, round(start - self.origin, 6), (end - start) * 1000,
+                                 threading.current_thread().name))
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+    def snapshot(self):
+        """当前全部记录的副本, 从旧到新"""
+        with self._lock:
+            return list(self.records)
+
+    def stats(self):
+        """按名称汇总: {名称: {count, total, mean, p50, p90, p99, max}}, 单位毫秒"""
+        durations = {}
+        for name, _, ms, _ in self.snapshot():
+            durations.setdefault(name, []).append(ms)
+        stats = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            entry = {"count": len(values), "total": sum(values), "mean": sum(values) / len(values),
+                     "max": values[-1]}
+            for p in PERCENTILES:
+                entry[f"p{p}"] = percentile(values, p)
+            stats[name] = entry
+        return stats
+
+    def export(self, path):
+        """导出全部记录和汇总, 按扩展名选择 CSV(只有记录) 或 JSON"""
+        records = self.snapshot()
+        tmp_path = path + ".tmp"
+        if os.path.splitext(path)[1].lower() == ".csv":
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+                for name, start, ms, thread in records:
+                    writer.writerow((name, start, f"{ms:.3f}", thread))
+        else:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"stats": self.stats(),
+                           "records": [dict(zip(CSV_FIELDS, record)) for record in records]},
+                          f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+        return len(records)
+
+
+# 整个程序共用的记录器, 由配置项 timing_enabled 打开
+tracer = Tracer()
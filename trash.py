@@ -0,0 +1,72 @@
+import time
+import threading
+from datetime import datetime, timedelta
+
+from retention import record_size
+
+TRASH_RETENTION_HOURS = 24
+PURGE_BATCH_SIZE = 50
+PURGE_PAUSE = 0.2  # 秒, 批次之间让出磁盘
+
+
+def purge_before(retention_hours, now=None):
+    """回收站中早于这个时间删除的存档可以彻底删除, 返回与 deleted_at 相同格式的时间"""
+    now = now or datetime.now()
+    return (now - timedelta(hours=retention_hours)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class TrashPurger:
+    """在后台线程中分批彻底删除回收站中的存档
+
+    list_trashed(before) 返回回收站中早于 before 删除的存档信息, purge(names) 删除一批存档的
+    文件并返回被删除的记录. 每批之间暂停 pause 秒, 避免大量删除时占满磁盘.
+    完成后调用 on_done(删除数量, 存档记录的大小之和). 去重的内容仍被其他存档引用时不会删除,
+    实际释放的空间可能更少. 同一时间只运行一次清理.
+    wait_idle 在每批之间调用, 用于等待用户操作结束
+    """
+
+    def __init__(self, list_trashed, purge, on_done=None, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE,
+                 wait_idle=None):
+        self.list_trashed = list_trashed
+        self.purge = purge
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.pause = pause
+        self.wait_idle = wait_idle
+        self._running = threading.Lock()
+
+    def run(self, retention_hours=TRASH_RETENTION_HOURS, names=None):
+        """在当前线程清理(由调度器调用), 已有清理在运行时返回 False"""
+        if not self._running.acquire(blocking=False):
+            return False
+        self._run(retention_hours, names)
+        return True
+
+    def run_async(self, retention_hours=TRASH_RETENTION_HOURS, names=None):
+        """开始一次后台清理, 已有清理在运行时返回 False
+
+        names 为空时清理超过保留时间的存档, 否则立即清理指定的存档
+        """
+        if not self._running.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._run, args=(retention_hours, names),
+                         name="trash-purger", daemon=True).start()
+        return True
+
+    def _run(self, retention_hours, names):
+        removed = 0
+        record_bytes = 0
+        try:
+            if names is None:
+                names = [r["name"] for r in self.list_trashed(purge_before(retention_hours))]
+            for start in range(0, len(names), self.batch_size):
+                for record in self.purge(names[start:start + self.batch_size]):
+                    removed += 1
+                    record_bytes += record_size(record)
+                time.sleep(self.pause)
+                if self.wait_idle:
+                    self.wait_idle()
+        finally:
+            self._running.release()
+            if self.on_done:
+                self.on_done(removed, record_bytes)
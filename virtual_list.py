@@ -0,0 +1,324 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk, font as tkfont
+
+SORT_BY_TIME = "time"
+SORT_BY_NAME = "name"
+# 前缀查找时的上界
+_PREFIX_END = "\uffff"
+
+
+class SaveListIndex:
+    """存档列表的内存索引
+
+    按名称和按时间各维护一个有序数组, 前缀过滤通过二分查找得到区间,
+    排序和过滤都不需要读取磁盘或逐条扫描
+    """
+
+    def __init__(self, entries=()):
+        self.timestamps = {}
+        self._by_name = []  # [(小写名称, 名称)]
+        self._by_time = []  # [(时间, 名称)]
+        self.reset(entries)
+
+    def reset(self, entries):
+        """用 [(名称, 时间)] 重建索引"""
+        self.timestamps = dict((name, timestamp or "") for name, timestamp in entries)
+        self._by_name = sorted((name.lower(), name) for name in self.timestamps)
+        self._by_time = sorted((timestamp, name) for name, timestamp in self.timestamps.items())
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, name, timestamp):
+        if name in self.timestamps:
+            self.remove([name])
+        timestamp = timestamp or ""
+        self.timestamps[name] = timestamp
+        bisect.insort(self._by_name, (name.lower(), name))
+        bisect.insort(self._by_time, (timestamp, name))
+
+    def extend(self, entries):
+        """批量加入 [(名称, 时间)], 分批加载时比逐条插入快"""
+        entries = [(name, timestamp or "") for name, timestamp in entries]
+        if any(name in self.timestamps for name, _ in entries):
+            self.remove([name for name, _ in entries])
+        self.timestamps.update(entries)
+        # 两段有序数据的合并, timsort 接近线性
+        self._by_name.extend(sorted((name.lower(), name) for name, _ in entries))
+        self._by_name.sort()
+        self._by_time.extend(sorted((timestamp, name) for name, timestamp in entries))
+        self._by_time.sort()
+
+    def remove(self, names):
+        for name in names:
+            timestamp = self.timestamps.pop(name, None)
+            if timestamp is None:
+                continue
+            for array, key in ((self._by_name, (name.lower(), name)), (self._by_time, (timestamp, name))):
+                index = bisect.bisect_left(array, key)
+                if index < len(array) and array[index] == key:
+                    del array[index]
+
+    @staticmethod
+    def _prefix_range(array, prefix):
+        start = bisect.bisect_left(array, (prefix,))
+        end = bisect.bisect_left(array, (prefix + _PREFIX_END,))
+        return array[start:end]
+
+    def query(self, prefix="", sort=SORT_BY_TIME, descending=True):
+        """返回名称或时间以 prefix 开头的存档名称列表
+
+        不区分大小写地匹配名称前缀, 或匹配时间前缀(如 2024-01-05)
+        """
+        if not prefix:
+            array = self._by_time if sort == SORT_BY_TIME else self._by_name
+            names = [name for _, name in array]
+        else:
+            matched = [name for _, name in self._prefix_range(self._by_name, prefix.lower())]
+            matched_time = [name for _, name in self._prefix_range(self._by_time, prefix)]
+            # 通常只有一种前缀能匹配, 两种都匹配时才需要合并
+            if sort == SORT_BY_NAME:
+                names = self._ordered(set(matched) | set(matched_time), self._by_name) if matched_time else matched
+            else:
+                names = self._ordered(set(matched) | set(matched_time), self._by_time) if matched else matched_time
+        if descending:
+            names.reverse()
+        return names
+
+    def _ordered(self, names, array):
+        """按 array 的顺序排列 names"""
+        if len(names) * 8 > len(array):
+            # 匹配的条目很多时直接按有序数组筛选
+            return [name for _, name in array if name in names]
+        if array is self._by_name:
+            return sorted(names, key=lambda n: (n.lower(), n))
+        return sorted(names, key=lambda n: (self.timestamps[n], n))
+
+
+class VirtualListView(ttk.Frame):
+    """只绘制可见行的存档列表
+
+    接口与 tk.Listbox 的常用部分一致(curselection/get/size/see),
+    支持多选(Ctrl/Shift)、键盘和滚轮, 选择变化时产生 <<ListboxSelect>> 事件.
+    选择按名称记录, 过滤和排序变化后仍然保留
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.font = tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 4
+        self.canvas = tk.Canvas(self, highlightthickness=1, background="white", takefocus=1)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.items = []
+        self._positions = None  # 名称 -> 行号, 需要时才建立
+        self.selected = set()
+        self.anchor = None
+        self.active = 0
+        self.top = 0
+        self._rows = []  # 复用的 (背景矩形, 文字) 画布对象
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Control-Button-1>", lambda e: self._on_click(e, toggle=True))
+        self.canvas.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-e.delta // 120 * 3))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll(3))
+        self.canvas.bind("<Up>", lambda e: self._move(-1, e))
+        self.canvas.bind("<Down>", lambda e: self._move(1, e))
+        self.canvas.bind("<Prior>", lambda e: self._move(-self.visible_rows(), e))
+        self.canvas.bind("<Next>", lambda e: self._move(self.visible_rows(), e))
+        self.canvas.bind("<Home>", lambda e: self._move(-len(self.items), e))
+        self.canvas.bind("<End>", lambda e: self._move(len(self.items), e))
+        self.canvas.bind("<Control-a>", self._select_all)
+
+    # Listbox 兼容接口
+    def size(self):
+        return len(self.items)
+
+    def get(self, index):
+        return self.items[index]
+
+    def curselection(self):
+        if not self.selected:
+            return ()
+        if self._positions is None:
+            self._positions = dict((name, i) for i, name in enumerate(self.items))
+        return tuple(sorted(self._positions[name] for name in self.selected))
+
+    def selection_clear(self):
+        self.selected.clear()
+        self.redraw()
+
+    def see(self, index):
+        rows = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self.redraw()
+
+    def set_items(self, items):
+        """替换显示的条目, 保留仍然存在的选择"""
+        self.items = items
+        self._positions = None
+        if self.selected:
+            self.selected &= set(items)
+        self.active = min(self.active, max(0, len(items) - 1))
+        self.redraw()
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def redraw(self):
+        """只绘制当前可见的行, 画布对象按行复用"""
+        rows = self.visible_rows() + 1
+        self.top = max(0, min(self.top, len(self.items) - rows + 1))
+        width = self.canvas.winfo_width()
+        while len(self._rows) < rows:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+            text = self.canvas.create_text(4, 0, anchor=tk.NW, font=self.font)
+            self._rows.append((rect, text))
+        for row, (rect, text) in enumerate(self._rows):
+            index = self.top + row
+            y = row * self.row_height
+            if row < rows and index < len(self.items):
+                name = self.items[index]
+                selected = name in self.selected
+                self.canvas.coords(rect, 0, y, width, y + self.row_height)
+                self.canvas.itemconfigure(rect, fill="#0078d7" if selected else "white")
+                self.canvas.coords(text, 4, y + 2)
+                self.canvas.itemconfigure(text, text=name, fill="white" if selected else "black")
+            else:
+                self.canvas.coords(rect, 0, 0, 0, 0)
+                self.canvas.itemconfigure(text, text="")
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.items)
+        if total == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.top / total, min(1, (self.top + self.visible_rows()) / total))
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.top = int(float(value) * len(self.items))
+        elif action == "scroll":
+            step = self.visible_rows() if unit == "pages" else 1
+            self.top += int(value) * step
+        self.redraw()
+
+    def scroll(self, rows):
+        self.top += rows
+        self.redraw()
+
+    def _notify(self):
+        self.redraw()
+        self.event_generate("<<ListboxSelect>>")
+
+    def _on_click(self, event, toggle=False, extend=False):
+        self.canvas.focus_set()
+        index = self.top + event.y // self.row_height
+        if index >= len(self.items):
+            return
+        self._select(index, toggle, extend)
+
+    def _select(self, index, toggle=False, extend=False):
+        name = self.items[index]
+        if extend and self.anchor is not None:
+            start, end = sorted((self.anchor, index))
+            self.selected = set(self.items[start:end + 1])
+        elif toggle:
+            self.selected ^= {name}
+            self.anchor = index
+        else:
+            self.selected = {name}
+            self.anchor = index
+        self.active = index
+        self.see(index)
+        self._notify()
+
+    def _move(self, delta, event):
+        if not self.items:
+            return
+        index = max(0, min(len(self.items) - 1, self.active + delta))
+        self._select(index, extend=bool(event.state & 0x0001))
+
+    def _select_all(self, event):
+        self.selected = set(self.items)
+        self._notify()
+        return "break"
+
+
+class FilterableSaveList(ttk.Frame):
+    """带前缀过滤和排序切换的虚拟存档列表"""
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.index = SaveListIndex()
+        self.sort = SORT_BY_TIME
+
+        bar = ttk.Frame(self)
+        bar.pack(fill=tk.X, pady=(0, 2))
+        self.filter_var = tk.StringVar()
+        ttk.Entry(bar, textvariable=self.filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.sort_button = ttk.Button(bar, text="按时间", width=6, command=self.toggle_sort)
+        self.sort_button.pack(side=tk.LEFT, padx=(2, 0))
+        self.view = VirtualListView(self)
+        self.view.pack(fill=tk.BOTH, expand=True)
+        self.filter_var.trace_add("write", lambda *args: self.refresh())
+
+    # 列表接口转发给虚拟列表
+    def curselection(self):
+        return self.view.curselection()
+
+    def get(self, index):
+        return self.view.get(index)
+
+    def size(self):
+        return self.view.size()
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence == "<<ListboxSelect>>":
+            return self.view.bind(sequence, func, add)
+        return super().bind(sequence, func, add)
+
+    def toggle_sort(self):
+        self.sort = SORT_BY_NAME if self.sort == SORT_BY_TIME else SORT_BY_TIME
+        self.sort_button.configure(text="按名称" if self.sort == SORT_BY_NAME else "按时间")
+        self.refresh()
+
+    def refresh(self):
+        """按当前过滤条件和排序更新显示"""
+        self.view.set_items(self.index.query(self.filter_var.get().strip(), self.sort,
+                                             descending=self.sort == SORT_BY_TIME))
+
+    def reset(self, entries):
+        self.index.reset(entries)
+        self.refresh()
+
+    def add(self, entries):
+        for name, timestamp in entries:
+            self.index.add(name, timestamp)
+        self.refresh()
+
+    def extend(self, entries):
+        """分批加载时追加一批条目"""
+        self.index.extend(entries)
+        self.refresh()
+
+    def remove(self, names):
+        self.index.remove(names)
+        self.refresh()
+
+    def select(self, name):
+        """选中并显示指定存档, 被过滤掉时先清空过滤条件"""
+        if name not in self.view.items:
+            self.filter_var.set("")
+        if name in self.view.items:
+            self.view._select(self.view.items.index(name))